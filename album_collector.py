@@ -0,0 +1,77 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Telegram albums hold at most ten items
+MAX_ALBUM_ITEMS = 10
+
+
+class AlbumCollector:
+    """
+    Group the updates of a Telegram album (same media_group_id)
+
+    Telegram delivers every photo of an album as its own update. The first
+    one starts a timer; each further item restarts it, and once no item has
+    arrived for `window` seconds (or the album is full) the handler gets all
+    of them at once. Needs a long-running process: on Lambda the container
+    is frozen after the response, so the timer would not fire.
+    """
+
+    def __init__(self, handler, window=1.0, max_items=MAX_ALBUM_ITEMS):
+        """
+        expects:
+        - handler: Callable taking (chat_id, updates) for a complete album
+        - window: Seconds of quiet after the last item before the album is handled
+        - max_items: Handle the album as soon as it has this many items
+        """
+        self.handler = handler
+        self.window = window
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._albums = {}
+
+    def add(self, chat_id, update):
+        """Add an album item; the album is handled once it is complete"""
+        group_id = update["message"]["media_group_id"]
+        with self._lock:
+            album = self._albums.setdefault(
+                group_id, {"chat_id": chat_id, "updates": [], "timer": None}
+            )
+            album["updates"].append(update)
+            if album["timer"]:
+                album["timer"].cancel()
+
+            if len(album["updates"]) < self.max_items:
+                album["timer"] = threading.Timer(
+                    self.window, self._complete, args=[group_id]
+                )
+                album["timer"].daemon = True
+                album["timer"].start()
+                return
+
+        self._complete(group_id)
+
+    def _complete(self, group_id):
+        with self._lock:
+            album = self._albums.pop(group_id, None)
+        if album is None:
+            return
+
+        updates = sorted(
+            album["updates"], key=lambda update: update["message"].get("message_id", 0)
+        )
+        try:
+            self.handler(album["chat_id"], updates)
+        except Exception as e:
+            logger.error(f"Error handling album {group_id}: {e}")
+
+    def flush(self):
+        """Handle every album still waiting for its window to pass"""
+        with self._lock:
+            group_ids = list(self._albums)
+            for group_id in group_ids:
+                if self._albums[group_id]["timer"]:
+                    self._albums[group_id]["timer"].cancel()
+        for group_id in group_ids:
+            self._complete(group_id)
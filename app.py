@@ -1,20 +1,28 @@
-import json
 import os
 import logging
 import base64
-import io
-from datetime import datetime
+import threading
+import time
+from datetime import date, datetime, timedelta
 from zoneinfo import ZoneInfo
 from flask import Flask, request, jsonify
-import google.generativeai as genai
-import requests
-from PIL import Image
-import matplotlib
-
-matplotlib.use("Agg")  # Use non-interactive backend
-import matplotlib.pyplot as plt
-from sheets_integration import SheetsManager
-
+from sheets_integration import get_sheets_manager, invalidate_sheets_manager
+from sheets_scope import request_scope
+from update_queue import UpdateQueue
+from dedup_store import DedupStore, update_keys
+from telegram_client import TelegramClient
+from receipt_image import choose_photo_size, prepare_receipt_image
+from extraction_cache import ExtractionCache
+from text_parser import parse_expense_text, split_expense_lines
+from album_collector import AlbumCollector
+from chart_renderer import ChartRenderer
+import metrics
+from expense_json import (
+    expense_batch_schema,
+    expense_schema,
+    parse_expense_json,
+    read_streamed_json,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,62 +35,377 @@ TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 GOOGLE_SHEETS_ID = os.environ.get("GOOGLE_SHEETS_ID")
 GOOGLE_CREDENTIALS_JSON = os.environ.get("GOOGLE_CREDENTIALS_JSON")
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+TELEGRAM_CONNECT_TIMEOUT = float(os.environ.get("TELEGRAM_CONNECT_TIMEOUT", "3.05"))
+TELEGRAM_READ_TIMEOUT = float(os.environ.get("TELEGRAM_READ_TIMEOUT", "10"))
+
+# Seconds all attempts of one Bot API call may take together, well below the
+# Lambda timeout
+TELEGRAM_DEADLINE = float(os.environ.get("TELEGRAM_DEADLINE", "15"))
+
+# "inline" processes updates before replying to Telegram, "thread" hands them
+# to a local worker pool, "lambda" re-invokes the function asynchronously
+UPDATE_MODE = os.environ.get("UPDATE_MODE", "inline").lower()
+UPDATE_WORKERS = int(os.environ.get("UPDATE_WORKERS", "4"))
+UPDATE_QUEUE_SIZE = int(os.environ.get("UPDATE_QUEUE_SIZE", "100"))
+UPDATE_PER_CHAT = int(os.environ.get("UPDATE_PER_CHAT", "1"))
+
+# Receipt images are downscaled to this longer side before going to Gemini
+RECEIPT_MAX_SIDE = int(os.environ.get("RECEIPT_MAX_SIDE", "1280"))
+
+# Also convert re-encoded receipts to grayscale and trim their background;
+# off until bench_receipt_images.py shows no accuracy loss on labelled receipts
+RECEIPT_GRAYSCALE = os.environ.get("RECEIPT_GRAYSCALE", "false").lower() == "true"
+RECEIPT_AUTOCROP = os.environ.get("RECEIPT_AUTOCROP", "false").lower() == "true"
+
+# Processed update_ids / message_ids remembered to drop Telegram redeliveries
+DEDUP_CAPACITY = int(os.environ.get("DEDUP_CAPACITY", "10000"))
+DEDUP_DB_PATH = os.environ.get("DEDUP_DB_PATH")
+
+# Album photos arriving within this window share one Gemini call and Sheets
+# write (not on Lambda, where no timer survives the response)
+ALBUM_WINDOW_MS = float(os.environ.get("ALBUM_WINDOW_MS", "1000"))
+EXTRACTION_BATCH_SIZE = int(os.environ.get("EXTRACTION_BATCH_SIZE", "10"))
+
+# Extraction results reused for resent receipts and repeated texts
+EXTRACTION_CACHE_SIZE = int(os.environ.get("EXTRACTION_CACHE_SIZE", "1000"))
+EXTRACTION_CACHE_TTL = int(os.environ.get("EXTRACTION_CACHE_TTL", "86400"))
+EXTRACTION_CACHE_PATH = os.environ.get("EXTRACTION_CACHE_PATH")
+
+# Structured-output mode: schema-constrained JSON, streamed and read until the
+# object is complete. 2.5 models count thinking tokens toward the limit.
+GEMINI_JSON_MODE = os.environ.get("GEMINI_JSON_MODE", "true").lower() == "true"
+GEMINI_MAX_OUTPUT_TOKENS = int(os.environ.get("GEMINI_MAX_OUTPUT_TOKENS", "1024"))
+GEMINI_PARSE_RETRIES = int(os.environ.get("GEMINI_PARSE_RETRIES", "1"))
+
+# Text expenses the local parser is at least this sure about skip Gemini
+# (set above 1 to send everything to the model)
+LOCAL_PARSER_MIN_CONFIDENCE = float(
+    os.environ.get("LOCAL_PARSER_MIN_CONFIDENCE", "0.8")
+)
+
+# Chart size profile (large, telegram, small) and number of cached chart PNGs
+CHART_PROFILE = os.environ.get("CHART_PROFILE", "telegram").lower()
+CHART_CACHE_SIZE = int(os.environ.get("CHART_CACHE_SIZE", "32"))
+
+# "matplotlib" or "pil" (Pillow only, no matplotlib import), and "pie" or "donut"
+CHART_BACKEND = os.environ.get("CHART_BACKEND", "matplotlib").lower()
+CHART_STYLE = os.environ.get("CHART_STYLE", "pie").lower()
+
+# Months compared by /trend
+TREND_MONTHS = int(os.environ.get("TREND_MONTHS", "6"))
 
 
 def get_malaysia_time():
     return datetime.now(ZoneInfo("Asia/Kuala_Lumpur"))
 
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+def recent_months(today, count):
+    """The `count` months ending with today's, oldest first, as "YYYY-MM" """
+    year, month = today.year, today.month
+    months = []
+    for _ in range(count):
+        months.append(f"{year}-{month:02d}")
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return months[::-1]
+
+
+# Report lines per category, in sheet column order
+CATEGORY_LABELS = [
+    ("food", "🍔 Food"),
+    ("transport", "🚗 Transport"),
+    ("utilities", "⚡ Utilities"),
+    ("shopping", "🛍️ Shopping"),
+    ("entertainment", "🎬 Entertainment"),
+    ("healthcare", "🏥 Healthcare"),
+    ("other", "📋 Other"),
+]
+
+
+def compare_periods(today):
+    """
+    This month so far and the same days of last month
+    returns:
+    - ((start, end), (start, end)) dates; the previous period is cut at the
+      end of a shorter month
+    """
+    start = today.replace(day=1)
+    previous_month_end = start - timedelta(days=1)
+    previous_start = previous_month_end.replace(day=1)
+    previous_end = previous_start.replace(day=min(today.day, previous_month_end.day))
+    return (start, today), (previous_start, previous_end)
+
+
+def format_change(current, previous):
+    """Percentage change for reports, e.g. "+12%" """
+    if not previous:
+        return "new" if current else "-"
+    return f"{(current - previous) / previous * 100:+.0f}%"
+
+
+def format_range_summary(title, summary):
+    """Report message of one date range summary"""
+    days = (
+        date.fromisoformat(summary["end"]) - date.fromisoformat(summary["start"])
+    ).days + 1
+    lines = [
+        f"📊 <b>{title}</b>",
+        f"📅 {summary['start']} to {summary['end']}",
+        "",
+        f"💰 <b>Total:</b> ${summary['total']:.2f} (${summary['total'] / days:.2f}/day)",
+        "",
+        "<b>By Category:</b>",
+    ]
+    lines += [f"{label}: ${summary[key]:.2f}" for key, label in CATEGORY_LABELS]
+    return "\n".join(lines)
+
+
+def format_comparison(current, previous):
+    """Report message comparing two date range summaries"""
+    lines = [
+        "📊 <b>This month vs last month</b>",
+        f"📅 {current['start']} to {current['end']} vs "
+        f"{previous['start']} to {previous['end']}",
+        "",
+        f"💰 <b>Total:</b> ${current['total']:.2f} vs ${previous['total']:.2f} "
+        f"({format_change(current['total'], previous['total'])})",
+        "",
+        "<b>By Category:</b>",
+    ]
+    for key, label in CATEGORY_LABELS:
+        if current[key] or previous[key]:
+            lines.append(
+                f"{label}: ${current[key]:.2f} vs ${previous[key]:.2f} "
+                f"({format_change(current[key], previous[key])})"
+            )
+    return "\n".join(lines)
 
 
 class ExpenseTracker:
     def __init__(self):
         if not GEMINI_API_KEY:
             logger.warning("GEMINI_API_KEY not found - AI features disabled")
-            self.model = None
-        else:
-            self.model = genai.GenerativeModel("gemini-2.5-flash-preview-05-20")
+        self._model = None
+        self.local_parses = 0
+        self.model_stats = {
+            "calls": 0,
+            "parse_failures": 0,
+            "prompt_tokens": 0,
+            "output_tokens": 0,
+        }
+        self.extraction_cache = ExtractionCache(
+            capacity=EXTRACTION_CACHE_SIZE,
+            ttl=EXTRACTION_CACHE_TTL,
+            path=EXTRACTION_CACHE_PATH,
+        )
+        self.chart_renderer = ChartRenderer(
+            CHART_PROFILE,
+            CHART_CACHE_SIZE,
+            backend=CHART_BACKEND,
+            donut=CHART_STYLE == "donut",
+        )
 
-        self._sheets_manager = None
+    @property
+    def model(self):
+        """Gemini model, created (and google.generativeai imported) on first use"""
+        if self._model is None and GEMINI_API_KEY:
+            import google.generativeai as genai
+
+            genai.configure(api_key=GEMINI_API_KEY)
+            self._model = genai.GenerativeModel("gemini-2.5-flash-preview-05-20")
+        return self._model
 
     @property
     def sheets_manager(self):
-        """Lazy initialization of SheetsManager"""
-        if (
-            self._sheets_manager is None
-            and GOOGLE_CREDENTIALS_JSON
-            and GOOGLE_SHEETS_ID
-        ):
-            try:
-                self._sheets_manager = SheetsManager(
-                    credentials_json=GOOGLE_CREDENTIALS_JSON,
-                    spreadsheet_id=GOOGLE_SHEETS_ID,
-                )
-            except Exception as e:
-                logger.error(f"Failed to initialize SheetsManager: {e}")
-        return self._sheets_manager
+        """Process-wide SheetsManager, rebuilt when the Sheets config changes"""
+        if not (GOOGLE_CREDENTIALS_JSON and GOOGLE_SHEETS_ID):
+            return None
+
+        try:
+            return get_sheets_manager(
+                credentials_json=GOOGLE_CREDENTIALS_JSON,
+                spreadsheet_id=GOOGLE_SHEETS_ID,
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize SheetsManager: {e}")
+            return None
 
     def extract_expense_data(self, text_content=None, image_data=None):
         """
-        Extract expense information using Gemini 2.5 Flash
+        Extract expense information, parsing simple texts locally and
+        sending the rest to Gemini 2.5 Flash
         expects:
         - text_content: Optional text content of the expense
         - image_data: Optional bytes data of the receipt image
         returns:
         - Dictionary with extracted expense data or error message
         """
+        if text_content and not image_data:
+            expense_data = self._parse_locally(text_content)
+            if expense_data:
+                return expense_data
+
+        return self._extract_with_model([(text_content, image_data)])[0]
+
+    def extract_expense_batch(self, text_lines=None, images=None):
+        """
+        Extract one expense per text line or receipt image with one Gemini call
+        expects:
+        - text_lines: Optional list of expense texts
+        - images: Optional list of preprocessed receipt image bytes
+        returns:
+        - List with one expense dictionary (or error) per input, in order
+        """
+        inputs = [(text, None) for text in text_lines or []]
+        inputs += [(None, image) for image in images or []]
+
+        results = [self._parse_locally(text) if text else None for text, _ in inputs]
+        todo = [i for i, result in enumerate(results) if result is None]
+        for start in range(0, len(todo), EXTRACTION_BATCH_SIZE):
+            chunk = todo[start : start + EXTRACTION_BATCH_SIZE]
+            extracted = self._extract_with_model([inputs[i] for i in chunk])
+            for i, expense_data in zip(chunk, extracted):
+                results[i] = expense_data
+        return results
+
+    def _parse_locally(self, text_content):
+        """Expense from the local text parser, or None if it is not sure enough"""
+        today = get_malaysia_time().date()
+        history = self.history_index(build=False)
+        expense_data, confidence = parse_expense_text(text_content, today, history)
+        if expense_data and confidence < LOCAL_PARSER_MIN_CONFIDENCE:
+            # Past expenses may know the merchant the keyword table does not
+            if history is None:
+                history = self.history_index()
+                if history:
+                    expense_data, confidence = parse_expense_text(
+                        text_content, today, history
+                    )
+        if expense_data and confidence >= LOCAL_PARSER_MIN_CONFIDENCE:
+            self.local_parses += 1
+            return expense_data
+        return None
+
+    def _extract_with_model(self, inputs):
+        """
+        Extract expenses with Gemini, in one call for all cache misses
+        expects:
+        - inputs: List of (text_content, image_data) pairs
+        returns:
+        - One expense dictionary (or error) per input
+        """
         if not self.model:
-            return {"error": "AI service not available"}
+            return [{"error": "AI service not available"} for _ in inputs]
 
         current_date = get_malaysia_time().strftime("%Y-%m-%d")
+        cache_keys = [
+            self.extraction_cache.key_for(
+                current_date, text_content=text, image_data=image
+            )
+            for text, image in inputs
+        ]
+        results = [self.extraction_cache.get(key) for key in cache_keys]
+        todo = [i for i, result in enumerate(results) if result is None]
+        if not todo:
+            return results
+
+        # A category settled by the user's history is not asked of the model
+        history = self.history_index(build=False)
+        known = {
+            i: history.lookup(inputs[i][0]) if history and inputs[i][0] else None
+            for i in todo
+        }
+
+        try:
+            started = time.perf_counter()
+            if len(todo) == 1:
+                prompt = self._expense_prompt(current_date, known[todo[0]])
+                schema = expense_schema(not known[todo[0]])
+                reply = self._generate_json(
+                    self._model_contents(prompt, [inputs[todo[0]]]),
+                    schema,
+                    lambda result: isinstance(result, dict),
+                )
+                replies = None if reply is None else [reply]
+            else:
+                prompt = self._expense_prompt(current_date, count=len(todo))
+                replies = self._generate_json(
+                    self._model_contents(prompt, [inputs[i] for i in todo]),
+                    expense_batch_schema(),
+                    lambda result: isinstance(result, list)
+                    and len(result) == len(todo)
+                    and all(isinstance(item, dict) for item in result),
+                )
+                if replies is None:
+                    # Fall back to one call per expense
+                    for i in todo:
+                        results[i] = self._extract_with_model([inputs[i]])[0]
+                    return results
+
+            if replies is None:
+                results[todo[0]] = {"error": "Failed to parse AI response"}
+                return results
+
+            elapsed = (time.perf_counter() - started) / len(todo)
+            for i, expense_data in zip(todo, replies):
+                if expense_data.get("error"):
+                    expense_data = {"error": expense_data["error"]}
+                else:
+                    expense_data.pop("error", None)
+                    self._apply_history(expense_data, known[i])
+                self.extraction_cache.put(cache_keys[i], expense_data, elapsed)
+                results[i] = expense_data
+            return results
+
+        except Exception as e:
+            logger.error(f"Error processing with Gemini: {e}")
+            for i in todo:
+                results[i] = {"error": f"Processing failed: {str(e)}"}
+            return results
+
+    def _expense_prompt(self, current_date, known=None, count=1):
+        """
+        Extraction prompt for one expense, or a numbered batch of them
+        expects:
+        - current_date: Today's date in "YYYY-MM-DD" format
+        - known: History match that settles the category of a single expense
+        - count: Number of expenses in the request
+        """
+        if GEMINI_JSON_MODE:
+            # Fields and the category enum travel in the response schema
+            if count == 1:
+                subject, invalid = "this receipt/expense", "this is"
+            else:
+                subject = (
+                    f"each of the {count} numbered receipts/expenses, "
+                    "as a JSON array in the same order"
+                )
+                invalid = "one is"
+            return f"""
+        Extract the expense from {subject}.
+        date: YYYY-MM-DD, use {current_date} (today) if not clear from the content.
+        description: brief description; merchant: store/company name if available.
+        If {invalid} not a valid expense or receipt, set error to "Not a valid expense".
+        """
 
-        prompt = f"""
+        category_field = (
+            ""
+            if known
+            else '\n          "category": "one of: food, transport, utilities, shopping, entertainment, healthcare, other",'
+        )
+        batch_note = (
+            ""
+            if count == 1
+            else f"""
+        There are {count} numbered expenses below: return a JSON array with one
+        such object per expense, in the same order.
+        """
+        )
+
+        return f"""
         Analyze this receipt/expense and extract the following information in JSON format:
         {{
-          "amount": float (just the number),
-          "category": "one of: food, transport, utilities, shopping, entertainment, healthcare, other",
+          "amount": float (just the number),{category_field}
           "description": "brief description of the expense",
           "date": "YYYY-MM-DD format, use {current_date} if not clear from the content",
           "merchant": "store/company name if available"
@@ -91,40 +414,113 @@ class ExpenseTracker:
         Current date today is: {current_date}
         
         If this is not a valid expense or receipt, return: {{"error": "Not a valid expense"}}
-        """
+        {batch_note}"""
 
-        try:
+    def _model_contents(self, prompt, inputs):
+        """generate_content parts for the prompt and (text, image) inputs"""
+
+        def image_part(image_data):
+            return {
+                "mime_type": "image/jpeg",
+                "data": base64.b64encode(image_data).decode(),
+            }
+
+        if len(inputs) == 1:
+            text_content, image_data = inputs[0]
             if image_data:
-                image_part = {
-                    "mime_type": "image/jpeg",
-                    "data": base64.b64encode(image_data).decode(),
-                }
+                return [prompt, image_part(image_data)]
+            return f"{prompt}\n\nText: {text_content}"
+
+        if not any(image for _, image in inputs):
+            lines = [f"Expense {n}: {text}" for n, (text, _) in enumerate(inputs, 1)]
+            return prompt + "\n\n" + "\n".join(lines)
 
-                response = self.model.generate_content([prompt, image_part])
+        parts = [prompt]
+        for n, (text_content, image_data) in enumerate(inputs, 1):
+            if image_data:
+                parts += [f"Expense {n}:", image_part(image_data)]
             else:
-                response = self.model.generate_content(
-                    f"{prompt}\n\nText: {text_content}"
-                )
+                parts.append(f"Expense {n}: {text_content}")
+        return parts
 
-            if not response or not hasattr(response, "text") or not response.text:
-                logger.error("Empty response from Gemini API")
-                return {"error": "No response from AI"}
+    def _generate_json(self, contents, schema, valid):
+        """
+        Call Gemini, retrying replies that do not parse, and read its JSON
+        expects:
+        - contents: Parts for generate_content
+        - schema: Response schema used in JSON mode
+        - valid: Callable telling whether a parsed reply has the expected shape
+        returns:
+        - The parsed reply, or None if no attempt produced a valid one
+        """
+        for attempt in range(GEMINI_PARSE_RETRIES + 1):
+            self.model_stats["calls"] += 1
+            try:
+                with metrics.span("gemini.generate"):
+                    if GEMINI_JSON_MODE:
+                        response = self.model.generate_content(
+                            contents,
+                            generation_config={
+                                "response_mime_type": "application/json",
+                                "response_schema": schema,
+                                "max_output_tokens": GEMINI_MAX_OUTPUT_TOKENS,
+                                "temperature": 0,
+                            },
+                            stream=True,
+                        )
+                        # Stop reading as soon as the JSON value is complete;
+                        # the usage on that chunk may miss the last few
+                        # output tokens, so streamed counts are approximate
+                        result, last_chunk = read_streamed_json(response)
+                        self._count_tokens(last_chunk)
+                    else:
+                        response = self.model.generate_content(contents)
+                        self._count_tokens(response)
+                        result = parse_expense_json(response.text)
+            except ValueError as e:
+                logger.error(f"JSON parsing error: {e}")
+                result = None
+
+            if result is not None and valid(result):
+                return result
+            self.model_stats["parse_failures"] += 1
+        return None
 
-            # Extract JSON from response
-            response_text = response.text.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:-3]
-            elif response_text.startswith("```"):
-                response_text = response_text[3:-3]
+    def _count_tokens(self, response):
+        """Add a response's token usage to model_stats"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            self.model_stats["prompt_tokens"] += usage.prompt_token_count or 0
+            self.model_stats["output_tokens"] += usage.candidates_token_count or 0
 
-            return json.loads(response_text)
+    def history_index(self, build=True):
+        """
+        Index of past merchant/description -> category decisions
+        expects:
+        - build: Read the Expenses sheet if the index does not exist yet
+        returns:
+        - HistoryIndex, or None if Sheets is not configured, the index is not
+          built and build is False, or reading it failed
+        """
+        if not self.sheets_manager:
+            return None
 
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {e}")
-            return {"error": "Failed to parse AI response"}
+        try:
+            return self.sheets_manager.get_history_index(build=build)
         except Exception as e:
-            logger.error(f"Error processing with Gemini: {e}")
-            return {"error": f"Processing failed: {str(e)}"}
+            logger.error(f"Error building expense history index: {e}")
+            return None
+
+    def _apply_history(self, expense_data, known):
+        """Categorize a model result the way this user categorized it before"""
+        if not known and expense_data.get("merchant"):
+            history = self.history_index()
+            match = history.lookup(expense_data["merchant"]) if history else None
+            if match and match["merchant"]:
+                known = match
+
+        if known:
+            expense_data["category"] = known["category"]
 
     def log_to_sheets(self, expense_data):
         """Log expense to Google Sheets"""
@@ -133,11 +529,25 @@ class ExpenseTracker:
             return False
 
         try:
-            return self.sheets_manager.log_expense(expense_data)
+            with metrics.span("sheets.log_expense"):
+                return self.sheets_manager.log_expense(expense_data)
         except Exception as e:
             logger.error(f"Error logging to sheets: {e}")
             return False
 
+    def log_many_to_sheets(self, expenses):
+        """Log several expenses to Google Sheets in one write; one flag each"""
+        if not self.sheets_manager:
+            logger.warning("Sheets not configured")
+            return [False] * len(expenses)
+
+        try:
+            with metrics.span("sheets.log_expenses"):
+                return self.sheets_manager.log_expenses(expenses)
+        except Exception as e:
+            logger.error(f"Error logging to sheets: {e}")
+            return [False] * len(expenses)
+
     def get_monthly_summary(self, month_str=None):
         """Get monthly expense summary"""
         try:
@@ -146,6 +556,20 @@ class ExpenseTracker:
             logger.error(f"Error getting monthly summary: {e}")
             return None
 
+    def get_range_summaries(self, ranges):
+        """
+        Get expense summaries of date ranges from the daily rollup
+        expects:
+        - ranges: List of (start, end) dates, both days included
+        returns:
+        - List of summaries, or None if daily totals are unavailable
+        """
+        try:
+            return self.sheets_manager.get_range_totals(ranges)
+        except Exception as e:
+            logger.error(f"Error getting range summaries: {e}")
+            return None
+
     def recalculate_monthly_totals(self):
         """Recalculate all monthly totals based on current expenses"""
         if not self.sheets_manager:
@@ -176,67 +600,74 @@ class ExpenseTracker:
             if not summary or summary.get("total", 0) == 0:
                 return None
 
-            # Prepare data for pie chart
-            categories = []
-            amounts = []
-            colors = [
-                "#FF6B6B",
-                "#4ECDC4",
-                "#45B7D1",
-                "#96CEB4",
-                "#FFEAA7",
-                "#DDA0DD",
-                "#98D8C8",
-            ]
-
-            category_data = [
-                ("Food", summary.get("food", 0)),
-                ("Transport", summary.get("transport", 0)),
-                ("Utilities", summary.get("utilities", 0)),
-                ("Shopping", summary.get("shopping", 0)),
-                ("Entertainment", summary.get("entertainment", 0)),
-                ("Healthcare", summary.get("healthcare", 0)),
-                ("Other", summary.get("other", 0)),
-            ]
-
-            # Only include categories with non-zero amounts
-            for category, amount in category_data:
-                if amount > 0:
-                    categories.append(f"{category}\n${amount:.2f}")
-                    amounts.append(amount)
-
-            if not categories:
-                return None
+            with metrics.span("chart.render"):
+                return self.chart_renderer.monthly_pie(summary)
 
-            # Create pie chart
-            plt.figure(figsize=(10, 8))
-            plt.pie(
-                amounts,
-                labels=categories,
-                autopct="%1.1f%%",
-                colors=colors[: len(categories)],
-                startangle=90,
-            )
-            plt.title(
-                f'Expenses Breakdown - {summary["month"]}',
-                fontsize=16,
-                fontweight="bold",
-            )
-            plt.axis("equal")
+        except Exception as e:
+            logger.error(f"Error creating monthly chart: {e}")
+            return None
+
+    def create_trend_chart(self, months=TREND_MONTHS):
+        """
+        Create a stacked bar chart comparing recent months
+        expects:
+        - months: Number of months up to and including the current one
+        returns:
+        - Bytes data of the bar chart image or None if no data
+        """
 
-            # Save to bytes
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format="png", dpi=150, bbox_inches="tight")
-            img_buffer.seek(0)
-            plt.close()
+        if not self.sheets_manager:
+            logger.warning("Sheets not configured")
+            return None
 
-            return img_buffer.getvalue()
+        try:
+            summaries = self.sheets_manager.get_monthly_totals(
+                recent_months(get_malaysia_time(), months)
+            )
+            with metrics.span("chart.render"):
+                return self.chart_renderer.monthly_bars(summaries)
 
         except Exception as e:
-            logger.error(f"Error creating monthly chart: {e}")
+            logger.error(f"Error creating trend chart: {e}")
             return None
 
 
+_tracker = None
+_tracker_lock = threading.Lock()
+_telegram_client = None
+
+
+def get_tracker():
+    """Get the process-wide ExpenseTracker, creating it on first use"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ExpenseTracker()
+        return _tracker
+
+
+def reset_tracker():
+    """Drop the shared ExpenseTracker and SheetsManager (e.g. after a config change)"""
+    global _tracker
+    with _tracker_lock:
+        _tracker = None
+    invalidate_sheets_manager()
+
+
+def get_telegram_client():
+    """Get the process-wide Telegram client, creating it on first use"""
+    global _telegram_client
+    if _telegram_client is None:
+        _telegram_client = TelegramClient(
+            TELEGRAM_BOT_TOKEN,
+            base_url=TELEGRAM_API_URL,
+            connect_timeout=TELEGRAM_CONNECT_TIMEOUT,
+            read_timeout=TELEGRAM_READ_TIMEOUT,
+            deadline=TELEGRAM_DEADLINE,
+        )
+    return _telegram_client
+
+
 def send_telegram_message(chat_id, text):
     """
     Send message back to Telegram user
@@ -246,11 +677,9 @@ def send_telegram_message(chat_id, text):
     returns:
     - JSON response from Telegram API
     """
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    data = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
     try:
-        response = requests.post(url, json=data)
-        return response.json()
+        with metrics.span("telegram.send_message"):
+            return get_telegram_client().send_message(chat_id, text)
     except Exception as e:
         logger.error(f"Error sending Telegram message: {e}")
         return None
@@ -266,40 +695,29 @@ def send_telegram_photo(chat_id, photo_data, caption=None):
     returns:
     - JSON response from Telegram API
     """
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendPhoto"
+    try:
+        with metrics.span("telegram.send_photo"):
+            return get_telegram_client().send_photo(chat_id, photo_data, caption)
+    except Exception as e:
+        logger.error(f"Error sending Telegram photo: {e}")
+        return None
 
-    files = {"photo": ("chart.png", io.BytesIO(photo_data), "image/png")}
-    data = {"chat_id": chat_id}
-    if caption:
-        data["caption"] = caption
-        data["parse_mode"] = "HTML"
 
+def send_chat_action(chat_id, action="typing"):
+    """Show "typing..." (or another action) while a reply is being prepared"""
     try:
-        response = requests.post(url, files=files, data=data)
-        return response.json()
+        with metrics.span("telegram.send_chat_action"):
+            return get_telegram_client().send_chat_action(chat_id, action)
     except Exception as e:
-        logger.error(f"Error sending Telegram photo: {e}")
+        logger.error(f"Error sending Telegram chat action: {e}")
         return None
 
 
 def download_telegram_file(file_id):
     """Download file from Telegram"""
     try:
-        # Get file path
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getFile"
-        response = requests.get(url, params={"file_id": file_id})
-        file_info = response.json()
-
-        if not file_info.get("ok"):
-            return None
-
-        file_path = file_info["result"]["file_path"]
-
-        # Download file
-        file_url = f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}"
-        file_response = requests.get(file_url)
-
-        return file_response.content
+        with metrics.span("telegram.download"):
+            return get_telegram_client().download_file(file_id)
     except Exception as e:
         logger.error(f"Error downloading Telegram file: {e}")
         return None
@@ -312,92 +730,281 @@ def health_check():
     return jsonify({"status": "OK", "message": "Finance Tracker Bot is running"}), 200
 
 
-@app.route("/webhook", methods=["POST"])
-def telegram_webhook():
-    """Main webhook endpoint for Telegram"""
+def collect_counters():
+    """
+    (name, help, value) of the counters the tracker and Telegram client keep,
+    for /metrics; they are read at scrape time and cost nothing per update
+    """
+    counters = []
+    if _tracker is not None:
+        stats = _tracker.model_stats
+        cache = _tracker.extraction_cache
+        counters += [
+            ("gemini_calls_total", "Gemini requests", stats["calls"]),
+            (
+                "gemini_parse_failures_total",
+                "Gemini replies without a valid expense",
+                stats["parse_failures"],
+            ),
+            (
+                "gemini_prompt_tokens_total",
+                "Gemini prompt tokens",
+                stats["prompt_tokens"],
+            ),
+            (
+                "gemini_output_tokens_total",
+                "Gemini output tokens (approximate when streamed)",
+                stats["output_tokens"],
+            ),
+            (
+                "local_parses_total",
+                "Texts parsed without Gemini",
+                _tracker.local_parses,
+            ),
+            ("extraction_cache_hits_total", "Extraction cache hits", cache.hits),
+            (
+                "extraction_cache_misses_total",
+                "Extraction cache misses",
+                cache.misses,
+            ),
+            (
+                "chart_cache_hits_total",
+                "Charts served from the render cache",
+                _tracker.chart_renderer.hits,
+            ),
+        ]
+    if _telegram_client is not None:
+        counters.append(
+            (
+                "telegram_retries_total",
+                "Telegram API requests retried",
+                _telegram_client.retries,
+            )
+        )
+    return counters
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Span histograms and counters in the Prometheus text format"""
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"error": "Metrics disabled"}), 404
+    return (
+        metrics.render(collect_counters()),
+        200,
+        {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+def extract_from_image(tracker, chat_id, file_id, kind="image"):
+    """
+    Download, preprocess and extract an expense from a photo or image document
+    expects:
+    - tracker: ExpenseTracker to run the extraction
+    - chat_id: Telegram chat ID for error replies
+    - file_id: Telegram file ID of the image
+    - kind: "image" or "document", used in error messages
+    returns:
+    - Extracted expense data, or None after replying with an error
+    """
+    send_chat_action(chat_id)
+    file_content = download_telegram_file(file_id)
+    if not file_content:
+        send_telegram_message(chat_id, f"❌ Failed to download {kind}")
+        return None
+
     try:
-        if not TELEGRAM_BOT_TOKEN:
-            logger.error("TELEGRAM_BOT_TOKEN not configured")
-            return jsonify({"error": "Bot not configured"}), 500
+        with metrics.span("receipt.prepare"):
+            image_data = prepare_receipt_image(
+                file_content,
+                max_side=RECEIPT_MAX_SIDE,
+                grayscale=RECEIPT_GRAYSCALE,
+                autocrop=RECEIPT_AUTOCROP,
+            )
+        return tracker.extract_expense_data(image_data=image_data)
+    except Exception as e:
+        logger.error(f"Error processing {kind}: {e}")
+        send_telegram_message(chat_id, f"❌ Failed to process {kind}")
+        return None
 
-        data = request.get_json()
 
-        if not data or "message" not in data:
-            logger.info("Not a message event or invalid data")
-            return jsonify({"status": "OK"}), 200
+def album_file_id(message):
+    """File ID of an album item's image, or None if it is not an image"""
+    if "photo" in message:
+        return choose_photo_size(message["photo"], RECEIPT_MAX_SIDE)["file_id"]
+    document = message.get("document", {})
+    if document.get("mime_type", "").startswith("image/"):
+        return document["file_id"]
+    return None
+
 
+def process_album(tracker, chat_id, messages):
+    """
+    Extract every receipt of an album with one Gemini call and log them together
+    expects:
+    - tracker: ExpenseTracker to run the extraction
+    - chat_id: Telegram chat ID for the reply
+    - messages: The album's messages, in order
+    """
+    send_chat_action(chat_id)
+    results = [{"error": "Not an image"} for _ in messages]
+    images, positions = [], []
+    for n, message in enumerate(messages):
+        file_id = album_file_id(message)
+        if not file_id:
+            continue
+
+        file_content = download_telegram_file(file_id)
+        if not file_content:
+            results[n] = {"error": "Failed to download image"}
+            continue
+
+        try:
+            with metrics.span("receipt.prepare"):
+                images.append(
+                    prepare_receipt_image(
+                        file_content,
+                        max_side=RECEIPT_MAX_SIDE,
+                        grayscale=RECEIPT_GRAYSCALE,
+                        autocrop=RECEIPT_AUTOCROP,
+                    )
+                )
+            positions.append(n)
+        except Exception as e:
+            logger.error(f"Error processing album image: {e}")
+            results[n] = {"error": "Failed to process image"}
+
+    if images:
+        extracted = tracker.extract_expense_batch(images=images)
+        for n, expense_data in zip(positions, extracted):
+            results[n] = expense_data
+    reply_with_expenses(tracker, chat_id, results)
+
+
+def reply_with_expenses(tracker, chat_id, results):
+    """
+    Log the valid expenses of a batch in one Sheets write and reply once
+    expects:
+    - tracker: ExpenseTracker to log with
+    - chat_id: Telegram chat ID for the reply
+    - results: Extracted expense data (or errors), in message order
+    """
+    valid = [r for r in results if r and "error" not in r]
+    logged = iter(tracker.log_many_to_sheets(valid) if valid else [])
+
+    lines = []
+    for n, expense_data in enumerate(results, 1):
+        if not expense_data or "error" in expense_data:
+            error = (expense_data or {}).get("error", "Could not process")
+            lines.append(f"❌ {n}. {error}")
+        elif next(logged):
+            lines.append(
+                f"✅ {n}. ${expense_data.get('amount', 'N/A')} "
+                f"{expense_data.get('category', 'N/A').title()} - "
+                f"{expense_data.get('description', 'N/A')}"
+            )
+        else:
+            lines.append(f"❌ {n}. Failed to log expense")
+
+    count = sum(line.startswith("✅") for line in lines)
+    send_telegram_message(
+        chat_id,
+        f"<b>{count} of {len(results)} expenses logged</b>\n\n" + "\n".join(lines),
+    )
+
+
+def reply_with_range_report(tracker, chat_id, command, args):
+    """Answer /range, /compare or /year from the daily rollup"""
+    today = get_malaysia_time().date()
+    if command == "/range":
+        try:
+            start, end = sorted(date.fromisoformat(arg) for arg in args)
+        except ValueError:
+            send_telegram_message(
+                chat_id,
+                "📅 Usage: /range YYYY-MM-DD YYYY-MM-DD (e.g. /range 2025-06-01 2025-06-07)",
+            )
+            return
+        ranges = [(start, end)]
+    elif command == "/compare":
+        ranges = list(compare_periods(today))
+    else:
+        ranges = [(today.replace(month=1, day=1), today)]
+
+    summaries = tracker.get_range_summaries(ranges)
+    if summaries is None:
+        send_telegram_message(
+            chat_id, "❌ Daily totals unavailable - run /setup, then /refresh"
+        )
+    elif command == "/compare":
+        send_telegram_message(chat_id, format_comparison(*summaries))
+    elif command == "/year":
+        send_telegram_message(
+            chat_id, format_range_summary(f"{today.year} Year to Date", summaries[0])
+        )
+    else:
+        send_telegram_message(chat_id, format_range_summary("Expenses", summaries[0]))
+
+
+def process_update(data):
+    """
+    Handle one Telegram update: download, extract, log and reply
+    expects:
+    - data: Telegram update dictionary containing a "message"
+    Sheets reads are memoized for the duration of the update, and the number
+    of Sheets API calls it made is logged.
+    """
+    chat_id = data.get("message", {}).get("chat", {}).get("id")
+    with metrics.update_context(data.get("update_id"), chat_id):
+        with metrics.span("update"), request_scope() as scope:
+            _process_update(data)
+    metrics.add("sheets_reads_coalesced_total", scope.hits)
+    if scope.calls:
+        logger.info(
+            f"Update {data.get('update_id')} made {scope.calls} Sheets calls "
+            f"({scope.hits} reads coalesced)"
+        )
+
+
+def _process_update(data):
+    try:
         message = data.get("message", {})
         chat_id = message.get("chat", {}).get("id")
 
-        if not chat_id:
-            logger.warning("No chat_id found in message")
-            return jsonify({"status": "OK"}), 200
-
-        # Initialize tracker
-        tracker = ExpenseTracker()
+        # Reuse the process-wide tracker across webhook calls
+        tracker = get_tracker()
         expense_data = None
 
+        # Album items grouped by the AlbumCollector
+        if len(data.get("album", [])) > 1:
+            process_album(tracker, chat_id, data["album"])
+            return
+
         # Handle different message types
         if "photo" in message:
-            photo = message["photo"][-1]
-            file_content = download_telegram_file(photo["file_id"])
-
-            if file_content:
-                # Convert to JPEG format if needed
-                try:
-                    image = Image.open(io.BytesIO(file_content))
-                    # Convert to RGB if necessary (for PNG with transparency)
-                    if image.mode in ("RGBA", "LA", "P"):
-                        image = image.convert("RGB")
-
-                    # Save as JPEG bytes
-                    img_byte_arr = io.BytesIO()
-                    image.save(img_byte_arr, format="JPEG", quality=85)
-                    img_byte_arr = img_byte_arr.getvalue()
-
-                    expense_data = tracker.extract_expense_data(image_data=img_byte_arr)
-                except Exception as e:
-                    logger.error(f"Error processing image: {e}")
-                    send_telegram_message(chat_id, "❌ Failed to process image")
-                    return jsonify({"status": "OK"}), 200
-            else:
-                send_telegram_message(chat_id, "❌ Failed to download image")
-                return jsonify({"status": "OK"}), 200
+            photo = choose_photo_size(message["photo"], RECEIPT_MAX_SIDE)
+            expense_data = extract_from_image(tracker, chat_id, photo["file_id"])
+            if expense_data is None:
+                return
 
         elif "document" in message:
             document = message["document"]
             if document["mime_type"].startswith("image/"):
-                file_content = download_telegram_file(document["file_id"])
-                if file_content:
-                    try:
-                        image = Image.open(io.BytesIO(file_content))
-                        # Convert to RGB if necessary
-                        if image.mode in ("RGBA", "LA", "P"):
-                            image = image.convert("RGB")
-
-                        # Save as JPEG bytes
-                        img_byte_arr = io.BytesIO()
-                        image.save(img_byte_arr, format="JPEG", quality=85)
-                        img_byte_arr = img_byte_arr.getvalue()
-
-                        expense_data = tracker.extract_expense_data(
-                            image_data=img_byte_arr
-                        )
-                    except Exception as e:
-                        logger.error(f"Error processing document image: {e}")
-                        send_telegram_message(chat_id, "❌ Failed to process document")
-                        return jsonify({"status": "OK"}), 200
-                else:
-                    send_telegram_message(chat_id, "❌ Failed to download document")
-                    return jsonify({"status": "OK"}), 200
+                expense_data = extract_from_image(
+                    tracker, chat_id, document["file_id"], kind="document"
+                )
+                if expense_data is None:
+                    return
             else:
                 send_telegram_message(chat_id, "📄 Please send an image file")
-                return jsonify({"status": "OK"}), 200
+                return
 
         elif "text" in message:
             text_content = message["text"]
 
             if text_content.startswith("/"):
+                command, *args = text_content.split()
+
                 if text_content == "/start":
                     welcome_msg = """
 🤖 <b>Finance Tracker Bot</b>
@@ -410,8 +1017,13 @@ Send me:
 <b>Commands:</b>
 /summary - Current month summary
 /chart - Visual pie chart of expenses
+/trend - Bar chart of recent months
+/range YYYY-MM-DD YYYY-MM-DD - Totals between two dates
+/compare - This month vs the same days of last month
+/year - Year to date totals
 /setup - Setup Google Sheets
 /refresh - Recalculate monthly totals
+/migrate - Split Expenses into one sheet per year
                     """
                     send_telegram_message(chat_id, welcome_msg)
 
@@ -468,11 +1080,41 @@ Send me:
                             chat_id, "❌ Google Sheets not configured"
                         )
 
+                elif text_content == "/migrate":
+                    if not tracker.sheets_manager:
+                        send_telegram_message(
+                            chat_id, "❌ Google Sheets not configured"
+                        )
+                    elif not tracker.sheets_manager.expenses_by_year:
+                        send_telegram_message(
+                            chat_id, "❌ Set EXPENSES_BY_YEAR=true before migrating"
+                        )
+                    else:
+                        send_chat_action(chat_id)
+                        copied = tracker.sheets_manager.migrate_to_year_sheets()
+                        if copied is None:
+                            send_telegram_message(
+                                chat_id, "❌ Failed to split Expenses by year"
+                            )
+                        elif not copied:
+                            send_telegram_message(chat_id, "✅ Nothing to migrate")
+                        else:
+                            sheets = "\n".join(
+                                f"📄 {title}: {count} expenses"
+                                for title, count in sorted(copied.items())
+                            )
+                            send_telegram_message(
+                                chat_id,
+                                f"✅ Expenses split by year:\n{sheets}\n"
+                                "The Expenses sheet is kept as a backup.",
+                            )
+
                 elif text_content == "/chart" or text_content == "/graph":
                     if tracker.sheets_manager:
                         send_telegram_message(
                             chat_id, "📊 Creating your expense chart..."
                         )
+                        send_chat_action(chat_id, "upload_photo")
                         chart_data = tracker.create_monthly_chart()
                         if chart_data:
                             summary = tracker.get_monthly_summary()
@@ -487,7 +1129,40 @@ Send me:
                             chat_id, "❌ Google Sheets not configured"
                         )
 
-                return jsonify({"status": "OK"}), 200
+                elif text_content == "/trend":
+                    if tracker.sheets_manager:
+                        send_chat_action(chat_id, "upload_photo")
+                        chart_data = tracker.create_trend_chart()
+                        if chart_data:
+                            caption = f"📊 <b>Expenses - last {TREND_MONTHS} months</b>"
+                            send_telegram_photo(chat_id, chart_data, caption)
+                        else:
+                            send_telegram_message(
+                                chat_id, "📊 No expense data found for recent months"
+                            )
+                    else:
+                        send_telegram_message(
+                            chat_id, "❌ Google Sheets not configured"
+                        )
+
+                elif command in ("/range", "/compare", "/year"):
+                    if tracker.sheets_manager:
+                        reply_with_range_report(tracker, chat_id, command, args)
+                    else:
+                        send_telegram_message(
+                            chat_id, "❌ Google Sheets not configured"
+                        )
+
+                return
+
+            send_chat_action(chat_id)
+
+            # One expense per line goes out as one batch
+            lines = split_expense_lines(text_content, get_malaysia_time().date())
+            if len(lines) > 1:
+                results = tracker.extract_expense_batch(text_lines=lines)
+                reply_with_expenses(tracker, chat_id, results)
+                return
 
             expense_data = tracker.extract_expense_data(text_content=text_content)
 
@@ -515,6 +1190,118 @@ Send me:
         else:
             send_telegram_message(chat_id, "❌ Could not process your message")
 
+    except Exception as e:
+        logger.error(f"Error processing update: {e}")
+
+
+_update_queue = None
+_dedup_store = None
+_album_collector = None
+
+
+def get_dedup_store():
+    """Get the process-wide dedup store, creating it on first use"""
+    global _dedup_store
+    if _dedup_store is None:
+        _dedup_store = DedupStore(capacity=DEDUP_CAPACITY, path=DEDUP_DB_PATH)
+    return _dedup_store
+
+
+def get_update_queue():
+    """Get the process-wide worker pool, creating it on first use"""
+    global _update_queue
+    if _update_queue is None:
+        _update_queue = UpdateQueue(
+            process_update,
+            workers=UPDATE_WORKERS,
+            max_pending=UPDATE_QUEUE_SIZE,
+            per_chat=UPDATE_PER_CHAT,
+        )
+    return _update_queue
+
+
+def dispatch_album(chat_id, updates):
+    """Dispatch a complete album as one update carrying all its messages"""
+    data = dict(updates[0], album=[update["message"] for update in updates])
+    if not dispatch_update(chat_id, data):
+        logger.error(f"Update queue full, dropping album of {len(updates)} items")
+
+
+def get_album_collector():
+    """Get the process-wide album collector, creating it on first use"""
+    global _album_collector
+    if _album_collector is None:
+        _album_collector = AlbumCollector(dispatch_album, window=ALBUM_WINDOW_MS / 1000)
+    return _album_collector
+
+
+def dispatch_update(chat_id, data):
+    """
+    Run or enqueue an update according to UPDATE_MODE
+    returns:
+    - False if the update could not be accepted (queue full)
+    """
+    if UPDATE_MODE == "lambda" and os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+        from zappa.asynchronous import run
+
+        run(process_update, args=[data])
+        return True
+
+    # Off Lambda the local worker pool stands in for async invocation
+    if UPDATE_MODE in ("thread", "lambda"):
+        return get_update_queue().submit(chat_id, data)
+
+    process_update(data)
+    return True
+
+
+@app.route("/webhook", methods=["POST"])
+def telegram_webhook():
+    """Main webhook endpoint for Telegram"""
+    with metrics.span("webhook"):
+        return _telegram_webhook()
+
+
+def _telegram_webhook():
+    try:
+        if not TELEGRAM_BOT_TOKEN:
+            logger.error("TELEGRAM_BOT_TOKEN not configured")
+            return jsonify({"error": "Bot not configured"}), 500
+
+        data = request.get_json()
+
+        if not data or "message" not in data:
+            logger.info("Not a message event or invalid data")
+            return jsonify({"status": "OK"}), 200
+
+        message = data.get("message", {})
+        chat_id = message.get("chat", {}).get("id")
+
+        if not chat_id:
+            logger.warning("No chat_id found in message")
+            return jsonify({"status": "OK"}), 200
+
+        # Drop Telegram redeliveries before any download or AI work
+        keys = update_keys(data)
+        if get_dedup_store().check_and_add(keys):
+            logger.info(f"Dropping duplicate update {data.get('update_id')}")
+            metrics.add("updates_duplicate_total")
+            return jsonify({"status": "OK"}), 200
+
+        # Hold album items until the whole album has arrived
+        if (
+            message.get("media_group_id")
+            and ALBUM_WINDOW_MS > 0
+            and not os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+        ):
+            get_album_collector().add(chat_id, data)
+            return jsonify({"status": "OK"}), 200
+
+        if not dispatch_update(chat_id, data):
+            logger.warning("Update queue full, asking Telegram to retry later")
+            get_dedup_store().discard(keys)
+            return jsonify({"status": "busy"}), 503
+
         return jsonify({"status": "OK"}), 200
 
     except Exception as e:
@@ -535,9 +1322,7 @@ def set_webhook():
         return jsonify({"error": "webhook_url required"}), 400
 
     try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/setWebhook"
-        response = requests.post(url, json={"url": webhook_url})
-        result = response.json()
+        result = get_telegram_client().set_webhook(webhook_url)
 
         if result.get("ok"):
             return (
@@ -0,0 +1,130 @@
+"""
+Expense aggregation: typed columns vs row-by-row dictionaries
+
+Builds synthetic Expenses rows as Sheets returns them (all strings) at
+10k, 100k and 1M rows, loads them into ExpenseColumns, and times group-bys
+by month, day, category, merchant and month x category (mean) with NumPy
+bincount and with the pure-Python column loop, against the previous
+per-row dictionary loop for the monthly totals. Also reports the memory
+held by the columns vs the list of rows. Every variant must produce the
+same monthly totals as the dictionary loop.
+
+Usage: python benchmarks/bench_aggregation.py [--sizes 10000,100000,1000000]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+from common import synthetic_expenses
+
+import expense_columns
+from expense_columns import ExpenseColumns
+from sheets_integration import CATEGORIES
+
+GROUP_BYS = [
+    ("month", "sum"),
+    ("day", "sum"),
+    ("category", "sum"),
+    ("merchant", "count"),
+    (("month", "category"), "mean"),
+]
+
+
+def legacy_totals(rows):
+    """Monthly totals the way the Expenses scans used to compute them"""
+    monthly_data = {}
+    for row in rows:
+        if len(row) >= 6 and row[5]:
+            month = row[5]
+            amount = float(row[1]) if row[1] else 0
+            category = row[2].lower() if row[2] else "other"
+            if month not in monthly_data:
+                monthly_data[month] = {"total": 0}
+                monthly_data[month].update({c: 0 for c in CATEGORIES})
+            monthly_data[month]["total"] += amount
+            if category in monthly_data[month]:
+                monthly_data[month][category] += amount
+            else:
+                monthly_data[month]["other"] += amount
+    return {
+        month: [totals["total"]] + [totals[c] for c in CATEGORIES]
+        for month, totals in monthly_data.items()
+    }
+
+
+def traced_mb(build):
+    """Memory still held by build()'s result, in MB"""
+    tracemalloc.start()
+    result = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, held / 1024 / 1024
+
+
+def ms(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run(size):
+    rows, rows_mb = traced_mb(
+        lambda: [
+            [str(value) for value in row]
+            for row in synthetic_expenses(size, per_day=20)
+        ]
+    )
+    columns, load_ms = ms(lambda: ExpenseColumns(rows))
+    _, columns_mb = traced_mb(lambda: ExpenseColumns(rows))
+    expected, legacy_ms = ms(lambda: legacy_totals(rows))
+
+    print(
+        f"{size} rows: load {load_ms:.0f} ms, columns {columns_mb:.1f} MB "
+        f"vs rows {rows_mb:.1f} MB, dictionary loop totals {legacy_ms:.0f} ms"
+    )
+    print(f"  {'group by':<22}{'agg':>6}{'groups':>8}{'numpy ms':>10}{'loop ms':>10}")
+
+    failures = []
+    engines = {"numpy": None, "loop": False}
+    for keys, agg in GROUP_BYS + [("totals_by", None)]:
+        timings = {}
+        for engine, state in engines.items():
+            expense_columns._numpy = state
+            if state is None and not expense_columns._np():
+                timings[engine] = None
+                continue
+            if agg is None:
+                result, timings[engine] = ms(columns.totals_by)
+                if result != expected:
+                    failures.append(f"{size} rows: {engine} totals differ")
+            else:
+                result, timings[engine] = ms(lambda: columns.group_by(keys, agg))
+
+        label = keys if isinstance(keys, str) else " x ".join(keys)
+        numpy_ms = "n/a" if timings["numpy"] is None else f"{timings['numpy']:.1f}"
+        print(
+            f"  {label:<22}{agg or '':>6}{len(result):>8}"
+            f"{numpy_ms:>10}{timings['loop']:>10.1f}"
+        )
+    expense_columns._numpy = None
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    args = parser.parse_args()
+
+    failures = []
+    for size in map(int, args.sizes.split(",")):
+        failures += run(size)
+
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("OK: every engine matches the dictionary loop's monthly totals")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Albums and multi-line texts: one model call and one Sheets write per batch
+
+Sends a five-photo album and a five-line text through /webhook (inline mode,
+Telegram stubbed, FakeSheetsService behind SheetsManager, FakeGeminiModel
+with a fixed latency plus decode time per output token) with batching off
+(ALBUM_WINDOW_MS=0, one line per message) and on, and counts model calls,
+Sheets calls, replies and the time until every expense is logged.
+
+A message is split when every line carries its own amount. Lines the local
+parser is sure of are logged without the model and the rest go to it in one
+call, which can reject the ones that are not expenses. Exits non-zero if a
+mixed message (two local lines, one the parser does not know) does not log
+three expenses with one model call and one reply, or numbered notes take
+more than one model call.
+
+Usage: python benchmarks/bench_batch_extraction.py [--items N] [--model-latency-ms MS]
+"""
+
+import argparse
+import io
+import sys
+import time
+
+from common import seeded_sheets
+from fake_gemini import FakeGeminiModel
+
+from PIL import Image
+
+import app
+
+# Lines the local parser handles, alternating with ones it leaves to the model
+LINES = [
+    "Grab 12.50",
+    "Birthday cake 60",
+    "Lunch RM15",
+    "Haircut 25",
+    "Coffee 5.50",
+    "Tailor 45",
+    "Netflix 54.90",
+    "Parking 3",
+]
+
+# Two lines the local parser handles and one it leaves to the model
+MIXED = "Nasi lemak 8\nParking 3\nAli birthday cake 60"
+
+# Numbers, but not expenses: the model is asked once and may reject them
+NOTES = "Meeting at 10\nNotes 2"
+
+
+def receipt_jpeg():
+    buffer = io.BytesIO()
+    Image.new("L", (900, 1400), 255).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def setup(model_latency_ms):
+    service, manager = seeded_sheets(2000)
+    model = FakeGeminiModel(model_latency_ms, ms_per_output_token=10)
+    replies = []
+
+    app.TELEGRAM_BOT_TOKEN = "bench-token"
+    app.GEMINI_API_KEY = "bench-key"
+    app.GOOGLE_CREDENTIALS_JSON = app.GOOGLE_SHEETS_ID = "bench"
+    app.UPDATE_MODE = "inline"
+    app.EXTRACTION_CACHE_SIZE = 0
+    app.get_sheets_manager = lambda **kwargs: manager
+    app.send_telegram_message = lambda chat_id, text: replies.append(text) or {
+        "ok": True
+    }
+    app.send_chat_action = lambda chat_id, action="typing": {"ok": True}
+    image = receipt_jpeg()
+    app.download_telegram_file = lambda file_id: image
+    return service, model, replies
+
+
+def run(label, updates, service, model, replies, album=False):
+    app.reset_tracker()
+    app.get_tracker()._model = model
+    model.reset()
+    service.reset_counters()
+    replies.clear()
+
+    client = app.app.test_client()
+    start = time.perf_counter()
+    for update in updates:
+        client.post("/webhook", json=update)
+    if album:
+        app.get_album_collector().flush()
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {label:<22} {model.calls:>3} model calls {service.calls:>3} Sheets "
+        f"calls {len(replies):>3} replies {elapsed * 1000:>8.0f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--model-latency-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    service, model, replies = setup(args.model_latency_ms)
+    next_id = iter(range(1, 10**6))
+
+    def message(**fields):
+        update_id = next(next_id)
+        return {
+            "update_id": update_id,
+            "message": dict(message_id=update_id, chat={"id": 42}, **fields),
+        }
+
+    photo = [{"file_id": "receipt", "width": 1280, "height": 1707}]
+    print(f"album of {args.items} receipts")
+    app.ALBUM_WINDOW_MS = 0
+    run(
+        "one update per photo",
+        [message(photo=photo, media_group_id="a1") for _ in range(args.items)],
+        service,
+        model,
+        replies,
+    )
+    app.ALBUM_WINDOW_MS = 1000
+    run(
+        "album batched",
+        [message(photo=photo, media_group_id="a2") for _ in range(args.items)],
+        service,
+        model,
+        replies,
+        album=True,
+    )
+
+    lines = (LINES * args.items)[: args.items]
+    print(f"text with {args.items} lines")
+    run(
+        "one message per line",
+        [message(text=line) for line in lines],
+        service,
+        model,
+        replies,
+    )
+    run("multi-line batched", [message(text="\n".join(lines))], service, model, replies)
+
+    # A fresh sheet: the fake model's merchant above is "Kedai Makan Ali"
+    service, model, replies = setup(args.model_latency_ms)
+    print("text with local and model lines")
+    run("mixed", [message(text=MIXED)], service, model, replies)
+    if model.calls != 1 or len(replies) != 1 or "3 of 3" not in replies[0]:
+        sys.exit(f"FAIL: a mixed message did not log three expenses: {replies}")
+
+    print("text with numbered notes")
+    run("notes", [message(text=NOTES)], service, model, replies)
+    if model.calls != 1 or len(replies) != 1:
+        sys.exit("FAIL: numbered notes took more than one model call")
+    print("OK: every line is logged, unsure lines in one model call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Chart backends: matplotlib vs PIL.ImageDraw
+
+For each backend a fresh child process imports the app's chart module with
+Pillow already loaded (as it is for receipts), then draws a monthly pie, a
+donut and a six-month bar chart. Reports the cold time to the first chart
+(imports, font loading and drawing), the warm render latency of each chart
+kind, PNG sizes, and the peak RSS the backend adds over the Pillow baseline.
+Also lists the installed size of the packages only matplotlib needs.
+
+Usage: python benchmarks/bench_chart_backends.py [--renders N] [--profile NAME]
+"""
+
+import argparse
+import importlib.metadata
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import peak_rss_kb
+
+# Installed only for matplotlib (Pillow is shared with the receipt pipeline)
+MATPLOTLIB_PACKAGES = (
+    "matplotlib",
+    "numpy",
+    "contourpy",
+    "fonttools",
+    "kiwisolver",
+    "cycler",
+    "pyparsing",
+    "python-dateutil",
+    "packaging",
+)
+
+
+def package_mb(names):
+    """Installed size of the given distributions in MB"""
+    total = 0
+    for name in names:
+        try:
+            files = importlib.metadata.distribution(name).files or []
+        except importlib.metadata.PackageNotFoundError:
+            continue
+        for path in files:
+            try:
+                total += os.path.getsize(path.locate())
+            except OSError:
+                pass
+    return total / 1024 / 1024
+
+
+def run_child(backend, profile, renders):
+    import PIL.Image  # noqa: F401  Loaded by the receipt pipeline anyway
+
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    from chart_renderer import ChartRenderer
+
+    from bench_chart_render import summaries
+
+    months = summaries(renders + 6)
+    pie = ChartRenderer(profile, cache_size=0, backend=backend)
+    first = pie.monthly_pie(months[0])
+    cold = time.perf_counter() - start
+
+    donut = ChartRenderer(profile, cache_size=0, backend=backend, donut=True)
+    kinds = {
+        "pie": lambda i: pie.monthly_pie(months[i]),
+        "donut": lambda i: donut.monthly_pie(months[i]),
+        "bars": lambda i: pie.monthly_bars(months[i : i + 6]),
+    }
+    result = {"cold_ms": cold * 1000, "pie_kb": len(first) / 1024}
+    for kind, render in kinds.items():
+        samples = []
+        for index in range(renders):
+            start = time.perf_counter()
+            png = render(index)
+            samples.append(time.perf_counter() - start)
+        result[f"{kind}_ms"] = statistics.median(samples) * 1000
+        result[f"{kind}_kb"] = len(png) / 1024
+    result["peak_mb"] = (peak_rss_kb() - baseline) / 1024
+    print(json.dumps(result))
+
+
+def child(backend, profile, renders):
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", backend, profile, str(renders)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--renders", type=int, default=10)
+    parser.add_argument("--profile", default="telegram")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        backend, profile, renders = args.child
+        return run_child(backend, profile, int(renders))
+
+    print(f"chart backends, {args.profile} profile, {args.renders} renders each")
+    print(
+        f"  {'backend':<12}{'cold ms':>9}{'pie ms':>8}{'donut ms':>10}"
+        f"{'bars ms':>9}{'pie KB':>8}{'bars KB':>9}{'peak +MB':>10}"
+    )
+    for backend in ("matplotlib", "pil"):
+        result = child(backend, args.profile, args.renders)
+        print(
+            f"  {backend:<12}{result['cold_ms']:>9.0f}{result['pie_ms']:>8.1f}"
+            f"{result['donut_ms']:>10.1f}{result['bars_ms']:>9.1f}"
+            f"{result['pie_kb']:>8.1f}{result['bars_kb']:>9.1f}"
+            f"{result['peak_mb']:>10.1f}"
+        )
+    print(
+        f"  packages needed only by matplotlib: "
+        f"{package_mb(MATPLOTLIB_PACKAGES):.1f} MB installed"
+    )
+
+
+if __name__ == "__main__":
+    main()
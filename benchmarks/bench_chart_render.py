@@ -0,0 +1,163 @@
+"""
+Monthly chart rendering: pyplot state machine vs the cached Figure renderer
+
+Renders pie charts for synthetic monthly summaries with the old pyplot code
+(plt.figure / plt.pie / plt.savefig at 150 dpi) and with ChartRenderer in
+each size profile. Reports the median render time of a new chart, the time
+of a repeated /chart for an unchanged month, PNG size and pixel dimensions,
+and how far peak RSS rises while drawing the charts in a fresh child process
+(after matplotlib is imported and one chart has been drawn). A threaded run
+checks that charts rendered concurrently match the ones rendered one at a
+time.
+
+Usage: python benchmarks/bench_chart_render.py [--charts N] [--threads N]
+"""
+
+import argparse
+import io
+import json
+import random
+import statistics
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from common import peak_rss_kb, reset_peak_rss, timed
+
+from chart_renderer import CHART_PROFILES, COLORS, ChartRenderer
+from sheets_integration import CATEGORIES
+
+
+def summaries(count, seed=0):
+    """Monthly summaries with a few empty categories, one month each"""
+    rng = random.Random(seed)
+    result = []
+    for index in range(count):
+        summary = {"month": f"{2020 + index // 12}-{index % 12 + 1:02d}"}
+        for category in CATEGORIES:
+            summary[category] = 0 if rng.random() < 0.2 else rng.uniform(5, 900)
+        summary["total"] = sum(summary[category] for category in CATEGORIES)
+        result.append(summary)
+    return result
+
+
+def legacy_chart(summary):
+    """The previous create_monthly_chart drawing code"""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    categories = []
+    amounts = []
+    for category in CATEGORIES:
+        amount = summary.get(category, 0)
+        if amount > 0:
+            categories.append(f"{category.capitalize()}\n${amount:.2f}")
+            amounts.append(amount)
+
+    plt.figure(figsize=(10, 8))
+    plt.pie(
+        amounts,
+        labels=categories,
+        autopct="%1.1f%%",
+        colors=COLORS[: len(categories)],
+        startangle=90,
+    )
+    plt.title(
+        f'Expenses Breakdown - {summary["month"]}', fontsize=16, fontweight="bold"
+    )
+    plt.axis("equal")
+    img_buffer = io.BytesIO()
+    plt.savefig(img_buffer, format="png", dpi=150, bbox_inches="tight")
+    plt.close()
+    return img_buffer.getvalue()
+
+
+def render_function(variant):
+    if variant == "pyplot":
+        return legacy_chart
+    return ChartRenderer(variant, cache_size=1000).monthly_pie
+
+
+def png_size(png):
+    from PIL import Image
+
+    return Image.open(io.BytesIO(png)).size
+
+
+def run_child(variant, charts):
+    render = render_function(variant)
+    render(summaries(1, seed=99)[0])  # Import matplotlib and load fonts
+    reset_peak_rss()
+    baseline = peak_rss_kb()
+    for summary in summaries(charts):
+        render(summary)
+    print(json.dumps({"peak_kb": peak_rss_kb() - baseline}))
+
+
+def child_rss_kb(variant, charts):
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", variant, str(charts)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output)["peak_kb"]
+
+
+def concurrent_mismatches(variant, months, threads):
+    """Charts that differ when rendered from several threads at once"""
+    render = render_function(variant)
+    expected = [render(summary) for summary in months]
+    render = render_function(variant)
+    with ThreadPoolExecutor(threads) as pool:
+        futures = [pool.submit(render, summary) for summary in months]
+    mismatches = 0
+    for future, png in zip(futures, expected):
+        try:
+            mismatches += future.result() != png
+        except Exception:
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--charts", type=int, default=12)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child[0], int(args.child[1]))
+
+    months = summaries(args.charts)
+    print(f"{args.charts} monthly pie charts")
+    print(
+        f"  {'variant':<10}{'new ms':>9}{'repeat ms':>11}{'PNG KB':>9}"
+        f"{'pixels':>12}{'peak +KB':>10}{'threaded diff':>15}"
+    )
+    for variant in ["pyplot"] + list(CHART_PROFILES):
+        render = render_function(variant)
+        render(summaries(1, seed=99)[0])  # Warm up imports and font cache
+
+        new = []
+        for summary in months:
+            png, elapsed = timed(render, summary)
+            new.append(elapsed)
+        repeat = [timed(render, summary)[1] for summary in months]
+
+        width, height = png_size(png)
+        peak = child_rss_kb(variant, args.charts)
+        mismatches = concurrent_mismatches(variant, months, args.threads)
+        print(
+            f"  {variant:<10}{statistics.median(new) * 1000:>9.1f}"
+            f"{statistics.median(repeat) * 1000:>11.3f}{len(png) / 1024:>9.1f}"
+            f"{f'{width}x{height}':>12}{peak:>10.0f}"
+            f"{f'{mismatches}/{len(months)}':>15}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Date-range reports: daily rollup prefix sums vs rescanning Expenses
+
+Seeds FakeSheetsService with synthetic Expenses of several sizes (and the
+Monthly_Totals/Daily_Totals a /refresh writes), then answers the /range,
+/compare and /year queries two ways: by reading Expenses!A:F and summing
+the matching rows, and from SheetsManager's DailyRollup. Reports Sheets
+calls, bytes received and time for the cold rollup load and for each query
+(the first one also builds the prefix sums), with a simulated per-call
+latency. Both must agree to the cent.
+
+Usage: python benchmarks/bench_daily_rollup.py [--sizes 10000,100000,200000] [--latency-ms MS]
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+from common import seeded_sheets
+
+from sheets_integration import CATEGORIES, SheetsManager
+
+# Inside the synthetic sheet's date range (20 rows a day from 2023-01-01)
+TODAY = date(2024, 3, 31)
+
+QUERIES = {
+    "/range 7 days": [(TODAY - timedelta(days=6), TODAY)],
+    "/compare": [(date(2024, 3, 1), TODAY), (date(2024, 2, 1), date(2024, 2, 29))],
+    "/year": [(date(2024, 1, 1), TODAY)],
+}
+
+
+def scan_totals(manager, ranges):
+    """The alternative without a rollup: read every expense and sum the ranges"""
+    result = (
+        manager.sheet.values()
+        .get(spreadsheetId=manager.spreadsheet_id, range="Expenses!A:F")
+        .execute()
+    )
+    bounds = [(start.isoformat(), end.isoformat()) for start, end in ranges]
+    totals = [[0.0] * (len(CATEGORIES) + 1) for _ in ranges]
+    for row in result.get("values", [])[1:]:
+        if len(row) < 6 or not row[5]:
+            continue
+        amount = float(row[1]) if row[1] else 0
+        category = row[2].lower() if row[2] else "other"
+        if category not in CATEGORIES:
+            category = "other"
+        column = CATEGORIES.index(category) + 1
+        for index, (start, end) in enumerate(bounds):
+            if start <= row[0] <= end:
+                totals[index][0] += amount
+                totals[index][column] += amount
+    return totals
+
+
+def rollup_totals(manager, ranges):
+    summaries = manager.get_range_totals(ranges)
+    return [
+        [summary["total"]] + [summary[c] for c in CATEGORIES] for summary in summaries
+    ]
+
+
+def measure(service, func, *args):
+    service.reset_counters()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = (time.perf_counter() - start) * 1000
+    return result, elapsed, service.calls, service.bytes_received / 1024
+
+
+def run(size, latency_ms):
+    service, _ = seeded_sheets(size, per_day=20)
+    service.latency = latency_ms / 1000
+    manager = SheetsManager(service=service, spreadsheet_id="bench")
+
+    _, load_ms, load_calls, load_kb = measure(service, manager.get_daily_rollup)
+    print(
+        f"{size} rows: cold rollup load {load_ms:.0f} ms, {load_calls} call, "
+        f"{load_kb:.0f} KB"
+    )
+    print(
+        f"  {'query':<16}{'scan ms':>9}{'calls':>7}{'KB':>8}"
+        f"{'rollup ms':>11}{'calls':>7}{'KB':>6}"
+    )
+
+    failures = []
+    for label, ranges in QUERIES.items():
+        expected, scan_ms, scan_calls, scan_kb = measure(
+            service, scan_totals, manager, ranges
+        )
+        totals, rollup_ms, rollup_calls, rollup_kb = measure(
+            service, rollup_totals, manager, ranges
+        )
+        print(
+            f"  {label:<16}{scan_ms:>9.1f}{scan_calls:>7}{scan_kb:>8.0f}"
+            f"{rollup_ms:>11.3f}{rollup_calls:>7}{rollup_kb:>6.0f}"
+        )
+        for want, got in zip(expected, totals):
+            if any(abs(a - b) >= 0.005 for a, b in zip(want, got)):
+                failures.append(f"{size} rows {label}: rollup {got} != scan {want}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,100000,200000")
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    print(f"{args.latency_ms:.0f} ms per API call")
+    failures = []
+    for size in map(int, args.sizes.split(",")):
+        failures += run(size, args.latency_ms)
+
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("OK: rollup totals match the Expenses scan")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Cost of the update dedup check and its effect on redelivered updates
+
+Measures check_and_add latency for the in-memory LRU and the SQLite-backed
+store, and replays a stream with redeliveries through /webhook to count how
+many extraction calls reach the (stubbed) model.
+
+Usage: python benchmarks/bench_dedup.py [--checks N] [--redeliver-rate R]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+from common import print_table, summarize, timed
+
+import app
+from dedup_store import DedupStore
+
+
+def check_samples(store, checks):
+    return [
+        timed(store.check_and_add, [f"u:{i}", f"m:1:{i}"])[1] for i in range(checks)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--capacity", type=int, default=10000)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--redeliver-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = DedupStore(capacity=args.capacity)
+        backed = DedupStore(
+            capacity=args.capacity, path=os.path.join(tmp, "dedup.sqlite3")
+        )
+        print_table(
+            f"check_and_add ({args.checks} new updates, capacity {args.capacity})",
+            {
+                "memory": summarize(check_samples(memory, args.checks)),
+                "sqlite": summarize(check_samples(backed, args.checks)),
+            },
+        )
+        print(f"  keys held in memory: {len(memory._recent)}")
+
+        # A warm restart keeps the SQLite record
+        restarted = DedupStore(
+            capacity=args.capacity, path=os.path.join(tmp, "dedup.sqlite3")
+        )
+        last = args.checks - 1
+        print(
+            f"  duplicate detected after restart: "
+            f"{restarted.check_and_add([f'u:{last}'])}"
+        )
+
+    extractions = []
+    app.TELEGRAM_BOT_TOKEN = "bench-token"
+    app.UPDATE_MODE = "inline"
+    app.send_telegram_message = lambda chat_id, text: {"ok": True}
+    app.send_chat_action = lambda chat_id, action="typing": {"ok": True}
+    app.ExpenseTracker.extract_expense_data = lambda self, **kwargs: (
+        extractions.append(kwargs) or {"amount": 1, "category": "food"}
+    )
+    app.ExpenseTracker.log_to_sheets = lambda self, expense_data: True
+
+    rng = random.Random(0)
+    client = app.app.test_client()
+    deliveries = 0
+    for update_id in range(args.updates):
+        update = {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "chat": {"id": 42},
+                "text": "Coffee $5",
+            },
+        }
+        while True:
+            client.post("/webhook", json=update)
+            deliveries += 1
+            if rng.random() >= args.redeliver_rate:
+                break
+
+    print(
+        f"  webhook: {deliveries} deliveries of {args.updates} updates -> "
+        f"{len(extractions)} extraction calls"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Extraction cache: model calls and latency saved on a stream with resends
+
+Replays a stream of texts and receipt photos through
+ExpenseTracker.extract_expense_data with a stubbed Gemini model. A share of
+the messages are resends: the same text with different spacing/case, the
+same photo byte-for-byte, or the photo re-compressed at another quality and
+size (as happens when it is forwarded; only exact copies are cache hits).
+Reports model calls, hits, the cost of a cache lookup, and whether an
+on-disk cache survives a restart.
+
+Exits non-zero if a receipt is served the cached result of another receipt
+with the same layout but a different total.
+
+Usage: python benchmarks/bench_extraction_cache.py [--messages N] [--resend-rate R]
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+
+from common import print_table, summarize, timed
+from fake_gemini import FakeGeminiModel
+
+from PIL import Image, ImageDraw
+
+import app
+from extraction_cache import ExtractionCache
+
+TEXTS = ["Lunch $15", "Grab to office RM12", "Coffee 5.50", "Netflix 54.90"]
+
+
+def receipt(rng, index):
+    image = Image.new("L", (900, 1400), 255)
+    draw = ImageDraw.Draw(image)
+    for line in range(20):
+        y = 60 + line * 60
+        draw.rectangle((60, y, 60 + rng.randint(200, 780), y + 30), fill=0)
+    draw.text((60, 1320), f"RECEIPT {index}", fill=0)
+    return image
+
+
+def same_layout_receipts():
+    """Two receipts that differ only in their items and total"""
+    images = []
+    for items, total in (
+        ("2x Nasi lemak", "TOTAL 12.50"),
+        ("3x Teh tarik", "TOTAL 7.80"),
+    ):
+        image = Image.new("L", (900, 1400), 255)
+        draw = ImageDraw.Draw(image)
+        draw.text((60, 200), items, fill=0)
+        draw.text((60, 1200), total, fill=0)
+        images.append(encode(image, 85))
+    return images
+
+
+def encode(image, quality, scale=1.0):
+    if scale != 1.0:
+        image = image.resize((int(image.width * scale), int(image.height * scale)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def build_stream(rng, messages, resend_rate):
+    """(kind, kwargs, label) tuples; label is fresh/resend/recompressed"""
+    stream, seen_texts, seen_images = [], [], []
+    for index in range(messages):
+        use_image = rng.random() < 0.5
+        resend = rng.random() < resend_rate
+        if use_image:
+            if resend and seen_images:
+                image = rng.choice(seen_images)
+                if rng.random() < 0.5:
+                    data, label = encode(image, 85), "resend"
+                else:
+                    data = encode(image, rng.choice([60, 70]), rng.choice([0.8, 0.9]))
+                    label = "recompressed"
+            else:
+                image = receipt(rng, index)
+                seen_images.append(image)
+                data, label = encode(image, 85), "fresh"
+            stream.append(("image", {"image_data": data}, label))
+        else:
+            if resend and seen_texts:
+                text = rng.choice(seen_texts)
+                text, label = f"  {text.upper()} ", "resend"
+            else:
+                text = f"{rng.choice(TEXTS)} #{index}"
+                seen_texts.append(text)
+                label = "fresh"
+            stream.append(("text", {"text_content": text}, label))
+    return stream
+
+
+def replay(tracker, stream):
+    samples = []
+    for _, kwargs, _ in stream:
+        samples.append(timed(tracker.extract_expense_data, **kwargs)[1])
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--resend-rate", type=float, default=0.3)
+    parser.add_argument("--model-latency-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    app.GEMINI_API_KEY = "bench-key"
+    stream = build_stream(random.Random(0), args.messages, args.resend_rate)
+    labels = [label for _, _, label in stream]
+    print(
+        f"stream: {len(stream)} messages, {labels.count('resend')} exact resends, "
+        f"{labels.count('recompressed')} re-compressed photos"
+    )
+
+    rows = {}
+    for name, capacity in (("no cache", 0), ("cache", 1000)):
+        app.EXTRACTION_CACHE_SIZE = capacity
+        tracker = app.ExpenseTracker()
+        tracker._model = FakeGeminiModel(args.model_latency_ms)
+        rows[name] = summarize(replay(tracker, stream))
+        stats = tracker.extraction_cache.stats()
+        print(
+            f"  {name}: {tracker._model.calls} model calls, {stats['hits']} hits, "
+            f"~{stats['saved_seconds']:.1f}s model time saved"
+        )
+    print_table("extract_expense_data per message", rows)
+
+    cache = ExtractionCache()
+    image_data = stream[[k for k, _, _ in stream].index("image")][1]["image_data"]
+    print_table(
+        "cache overhead per lookup",
+        {
+            "text key": summarize(
+                [
+                    timed(cache.key_for, "2025-06-09", text_content="Lunch $15")[1]
+                    for _ in range(1000)
+                ]
+            ),
+            "image key": summarize(
+                [
+                    timed(cache.key_for, "2025-06-09", image_data=image_data)[1]
+                    for _ in range(100)
+                ]
+            ),
+        },
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "extractions.sqlite3")
+        key = ExtractionCache(path=path).key_for("2025-06-09", text_content="Lunch")
+        ExtractionCache(path=path).put(key, {"amount": 15, "category": "food"})
+        restarted = ExtractionCache(path=path)
+        print(f"  on-disk hit after restart: {restarted.get(key) is not None}")
+
+    first, second = same_layout_receipts()
+    cache.put(cache.key_for("2025-06-09", image_data=first), {"amount": 12.5})
+    if cache.get(cache.key_for("2025-06-09", image_data=second)) is not None:
+        sys.exit("FAIL: a receipt got the cached result of a different receipt")
+    print("OK: receipts with the same layout never share a cached result")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Merchant history index: build cost, lookup latency and texts kept off Gemini
+
+Builds a HistoryIndex from synthetic Expenses sheets with a few thousand
+distinct merchants and times lookups of messages naming them. Then runs the
+labelled text corpus through the local parser with and without a short
+history of this user's past categorizations, and checks that expenses logged
+through SheetsManager update the index without another Sheets read.
+
+Usage: python benchmarks/bench_history_index.py [--rows 10000,50000]
+"""
+
+import argparse
+import random
+import tracemalloc
+from datetime import date
+
+from common import print_table, seeded_sheets, summarize, timed
+
+from bench_text_parser import TODAY, correct, load_corpus
+from history_index import HistoryIndex
+from sheets_integration import CATEGORIES
+from text_parser import parse_expense_text
+
+WORDS = [
+    "kedai",
+    "restoran",
+    "mart",
+    "kopitiam",
+    "auto",
+    "optical",
+    "salon",
+    "bakery",
+    "hardware",
+    "pharmacy",
+    "studio",
+    "garage",
+    "boutique",
+]
+
+PAST_EXPENSES = [
+    ["2025-05-02", 48, "food", "Dinner", "Nando's", "2025-05"],
+    ["2025-05-16", 52, "food", "Lunch", "Nando's", "2025-05"],
+    ["2025-05-09", 25, "other", "Haircut", "", "2025-05"],
+    ["2025-04-09", 25, "other", "Haircut", "", "2025-04"],
+    ["2025-05-01", 150, "healthcare", "Gym membership", "", "2025-05"],
+    ["2025-04-01", 150, "healthcare", "Gym membership", "", "2025-04"],
+    ["2025-05-01", 1500, "other", "Rent", "", "2025-05"],
+    ["2025-04-01", 1500, "other", "Rent", "", "2025-04"],
+    ["2025-05-20", 58, "food", "Dinner", "Sushi King", "2025-05"],
+    ["2025-05-27", 61, "food", "Lunch", "Sushi King", "2025-05"],
+]
+
+
+def merchant_name(rng):
+    syllables = ["ka", "ri", "mo", "tan", "lee", "ah", "seng", "jaya", "mas", "wan"]
+    brand = "".join(rng.choice(syllables) for _ in range(3)).title()
+    return f"{brand} {rng.choice(WORDS).title()}"
+
+
+def synthetic_rows(count, merchants, seed=0):
+    rng = random.Random(seed)
+    names = list({merchant_name(rng) for _ in range(merchants)})
+    categories = {name: rng.choice(CATEGORIES) for name in names}
+    rows = []
+    for _ in range(count):
+        name = rng.choice(names)
+        rows.append(
+            [
+                "2025-01-01",
+                10.0,
+                categories[name],
+                f"{rng.choice(WORDS)} purchase",
+                f"{name} Sdn Bhd",
+                "2025-01",
+            ]
+        )
+    return rows, names
+
+
+def index_costs(sizes, merchants):
+    rows = {}
+    for size in sizes:
+        data, names = synthetic_rows(size, merchants)
+        index = HistoryIndex()
+        _, build = timed(index.add_rows, data)
+
+        tracemalloc.start()
+        probe = HistoryIndex()
+        probe.add_rows(data)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        rng = random.Random(1)
+        samples = [
+            timed(index.lookup, f"{rng.choice(names)} 12.50 yesterday")[1]
+            for _ in range(2000)
+        ]
+        rows[f"{size} rows"] = summarize(samples)
+        print(
+            f"  {size} rows: built in {build * 1000:.0f} ms, "
+            f"{memory / 1024 / 1024:.1f} MiB, {len(index._merchants)} merchants"
+        )
+    print_table("HistoryIndex.lookup", rows)
+
+
+def corpus_share():
+    corpus = load_corpus()
+    history = HistoryIndex()
+    history.add_rows(PAST_EXPENSES)
+    for label, index in (("keywords only", None), ("with history", history)):
+        handled = right = 0
+        for sample in corpus:
+            expense_data, confidence = parse_expense_text(sample["text"], TODAY, index)
+            if expense_data and confidence >= 0.8:
+                handled += 1
+                right += correct(expense_data, sample)
+        print(f"  {label}: {handled}/{len(corpus)} handled locally, {right} correct")
+
+
+def incremental_refresh():
+    service, manager = seeded_sheets(5000)
+    history = manager.get_history_index()
+    built_calls = service.calls
+    for day in (3, 4):
+        manager.log_expense(
+            {
+                "amount": 30,
+                "category": "entertainment",
+                "description": "Bowling night",
+                "date": date(2025, 6, day).isoformat(),
+                "merchant": "Cosmic Bowl",
+            }
+        )
+    service.reset_counters()
+    match, elapsed = timed(history.lookup, "Cosmic Bowl 30")
+    print(
+        f"  index built with {built_calls} Sheets call(s); after logging two "
+        f"expenses 'Cosmic Bowl 30' -> {match and match['category']} "
+        f"in {elapsed * 1000:.3f} ms with {service.calls} further calls"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", default="10000,50000")
+    parser.add_argument("--merchants", type=int, default=3000)
+    args = parser.parse_args()
+
+    index_costs([int(size) for size in args.rows.split(",")], args.merchants)
+    print("text corpus")
+    corpus_share()
+    incremental_refresh()
+
+
+if __name__ == "__main__":
+    main()
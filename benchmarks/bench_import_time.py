@@ -0,0 +1,85 @@
+"""
+Cold import time of the app module, from `python -X importtime`
+
+Runs `import app` in fresh interpreters, reports the median cumulative import
+time and the heaviest top-level imports, and exits non-zero if any module
+that must stay lazy (matplotlib, PIL, google.generativeai, googleapiclient)
+is imported at startup or the optional budget is exceeded.
+
+Usage: python benchmarks/bench_import_time.py [--runs N] [--budget-ms MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from common import ROOT
+
+# Loaded only by the code paths that need them
+DEFERRED = ("matplotlib", "PIL", "google.generativeai", "googleapiclient", "numpy")
+
+
+def import_profile(module):
+    """Return {name: (depth, cumulative us)} for one cold import"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"),
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        profile[name.strip()] = (depth, int(cumulative))
+    if module not in profile:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    profiles = [import_profile(args.module) for _ in range(args.runs)]
+    totals = [profile[args.module][1] / 1000 for profile in profiles]
+    total_ms = statistics.median(totals)
+
+    print(f"import {args.module}: median {total_ms:.1f} ms over {args.runs} runs")
+    print("  heaviest direct imports:")
+    direct = [
+        (cumulative, name)
+        for name, (depth, cumulative) in profiles[-1].items()
+        if depth == 1
+    ]
+    for cumulative, name in sorted(direct, reverse=True)[:10]:
+        print(f"    {cumulative / 1000:>8.1f} ms  {name}")
+
+    eager = sorted(
+        name
+        for name in profiles[-1]
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in DEFERRED)
+    )
+    failed = False
+    if eager:
+        roots = sorted({name.split(".")[0] for name in eager})
+        print(f"FAIL: deferred modules imported at startup: {', '.join(roots)}")
+        failed = True
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"FAIL: {total_ms:.1f} ms exceeds the {args.budget_ms:.1f} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK: no deferred module is imported at startup")
+
+
+if __name__ == "__main__":
+    main()
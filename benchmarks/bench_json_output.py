@@ -0,0 +1,91 @@
+"""
+Gemini reply parsing: free-text JSON vs structured-output mode
+
+Runs the labelled text corpus through ExpenseTracker.extract_expense_data
+(local parser and cache disabled) in three modes:
+
+- legacy: free-text prompt, fences sliced off with response_text[7:-3]
+- tolerant: free-text prompt, first JSON object found by JsonObjectReader
+- json mode: response schema, streamed and read until the object closes
+
+and reports model calls per message, parse-failure and retry rates, tokens
+per call and latency. Without GEMINI_API_KEY a FakeGeminiModel answers, whose
+free-text replies are fenced or wrapped in prose at the shares given by
+fake_gemini.DEFAULT_STYLES; with a key the real model is used.
+
+Usage: python benchmarks/bench_json_output.py [--model-latency-ms MS]
+"""
+
+import argparse
+import json
+import os
+
+from common import print_table, summarize, timed
+from fake_gemini import FakeGeminiModel
+
+import app
+from bench_text_parser import load_corpus
+
+tolerant_parse = app.parse_expense_json
+
+
+def legacy_parse(text):
+    """The fence slicing extract_expense_data used before structured output"""
+    response_text = text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:-3]
+    elif response_text.startswith("```"):
+        response_text = response_text[3:-3]
+    return json.loads(response_text)
+
+
+def run(mode, corpus, model):
+    app.GEMINI_JSON_MODE = mode == "json mode"
+    app.parse_expense_json = legacy_parse if mode == "legacy" else tolerant_parse
+    tracker = app.ExpenseTracker()
+    if model is not None:
+        model.reset()
+        tracker._model = model
+
+    samples, failed = [], 0
+    for sample in corpus:
+        result, elapsed = timed(
+            tracker.extract_expense_data, text_content=sample["text"]
+        )
+        samples.append(elapsed)
+        failed += "error" in result
+    return tracker.model_stats, summarize(samples), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model-latency-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    app.LOCAL_PARSER_MIN_CONFIDENCE = 2
+    app.EXTRACTION_CACHE_SIZE = 0
+    app.GEMINI_PARSE_RETRIES = 1
+    corpus = load_corpus()
+
+    model = None
+    if not os.environ.get("GEMINI_API_KEY"):
+        app.GEMINI_API_KEY = "bench-key"
+        model = FakeGeminiModel(args.model_latency_ms)
+
+    rows = {}
+    print(f"{len(corpus)} messages per mode")
+    for mode in ("legacy", "tolerant", "json mode"):
+        stats, rows[mode], failed = run(mode, corpus, model)
+        calls = stats["calls"] or 1
+        print(
+            f"  {mode:<10} {stats['calls'] / len(corpus):.2f} calls/message, "
+            f"{stats['parse_failures'] / calls:.1%} of calls failed to parse, "
+            f"{failed} messages failed, "
+            f"{stats['prompt_tokens'] / calls:.0f} prompt + "
+            f"{stats['output_tokens'] / calls:.0f} output tokens/call"
+        )
+    print_table("extract_expense_data per message", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Monthly total reads from Sheets vs the local SQLite ledger mirror
+
+Reports per-read latency and Sheets API calls for get_monthly_total with and
+without LEDGER_DB_PATH, plus the cost of an incremental catch-up after rows
+were appended to the sheet behind the mirror's back. Then deletes rows by
+hand, logs an expense into the gap and exits non-zero unless the mirror's
+month total matches the sheet again.
+
+Usage: python benchmarks/bench_ledger_mirror.py [--rows N] [--reads N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+from common import print_table, seeded_sheets, summarize, synthetic_expenses, timed
+
+
+def read_samples(manager, month, reads):
+    return [timed(manager.get_monthly_total, month)[1] for _ in range(reads)]
+
+
+def sheet_month_total(service, month):
+    return sum(
+        float(row[1]) for row in service.grids["Expenses"][1:] if row[5] == month
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    service, sheets_only = seeded_sheets(args.rows, latency_ms=args.latency_ms)
+    month = service.grids["Expenses"][-1][5]
+    sheets_samples = read_samples(sheets_only, month, args.reads)
+    sheets_calls = service.counters()["calls"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service, mirrored = seeded_sheets(
+            args.rows,
+            latency_ms=args.latency_ms,
+            ledger_path=os.path.join(tmp, "ledger.sqlite3"),
+        )
+        expected = sheets_only.get_monthly_total(month)
+        service.reset_counters()
+
+        mirror_samples = read_samples(mirrored, month, args.reads)
+        mirror_calls = service.counters()["calls"]
+        actual = mirrored.get_monthly_total(month)
+        assert all(
+            abs(expected[key] - actual[key]) < 0.01
+            for key in expected
+            if key != "month"
+        ), f"mirror disagrees with Sheets: {actual} != {expected}"
+
+        # Rows appended by someone else are fetched incrementally
+        new_rows = synthetic_expenses(100, start=f"{month}-01", seed=1)
+        service.grids["Expenses"].extend(new_rows)
+        service.reset_counters()
+        fetched = mirrored.sync_ledger()
+        catch_up = service.counters()
+
+        # Rows deleted by hand put new expenses at or below the cursor
+        del service.grids["Expenses"][-150:-50]
+        mirrored.log_expense(
+            {"amount": 12.5, "category": "food", "date": new_rows[-1][0]}
+        )
+        mirrored.sync_ledger()
+        after_delete = mirrored.get_monthly_total(month)["total"]
+        in_sheet = sheet_month_total(service, month)
+
+    print_table(
+        f"get_monthly_total over {args.rows} expense rows",
+        {"sheets": summarize(sheets_samples), "mirror": summarize(mirror_samples)},
+    )
+    print(f"  Sheets API calls: sheets={sheets_calls} mirror={mirror_calls}")
+    print(
+        f"  catch-up after 100 new rows: fetched={fetched} "
+        f"calls={catch_up['calls']} bytes={catch_up['bytes_received']}"
+    )
+    print(
+        f"  after deleting rows by hand: mirror={after_delete:.2f} sheet={in_sheet:.2f}"
+    )
+    if abs(after_delete - in_sheet) >= 0.01:
+        sys.exit("FAIL: the mirror missed rows logged after a hand deletion")
+    print("OK: the mirror is rebuilt once rows above its cursor change")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Sheets API cost of one log_expense call as the Expenses sheet grows
+
+Compares the incremental totals update (default) with the full-month rescan
+and checks that the incremental path's API calls stay constant and its bytes
+transferred do not grow with history size. Every size spans the same year of
+months, so only the number of Expenses rows changes.
+
+Before measuring, checks that incremental totals match a full recalculation
+for a month with a correction (negative) row and for a month that had no
+Monthly_Totals row yet.
+
+Usage: python benchmarks/bench_log_expense.py [--sizes 1000,10000,50000]
+"""
+
+import argparse
+import sys
+
+from common import seeded_sheets, timed
+
+EXPENSE = {
+    "amount": 12.5,
+    "category": "food",
+    "description": "Lunch",
+    "merchant": "McDonald's",
+}
+
+# After the synthetic sheet's last month, so it has no Monthly_Totals row
+NEW_MONTH_DATE = "2030-01-15"
+
+
+def rescan_mismatch(manager, month):
+    """Difference between the incremental totals row and a full recalculation"""
+    logged = manager.get_monthly_total(month)
+    manager.recalculate_all_monthly_totals()
+    repaired = manager.get_monthly_total(month)
+    if all(
+        abs(logged[key] - repaired[key]) < 0.01 for key in repaired if key != "month"
+    ):
+        return None
+    return f"{logged} != {repaired}"
+
+
+def check_against_rescan():
+    """Incremental totals must match what the full repair path computes"""
+    failures = []
+    service, manager = seeded_sheets(1000)
+    last_day, month = service.grids["Expenses"][-1][0], service.grids["Expenses"][-1][5]
+    correction = dict(EXPENSE, amount=-4.25, description="Refund", date=last_day)
+    assert manager.log_expense(dict(EXPENSE, date=last_day)), "log_expense failed"
+    assert manager.log_expense(correction), "log_expense of a correction failed"
+    mismatch = rescan_mismatch(manager, month)
+    if mismatch:
+        failures.append(f"month with a correction row: {mismatch}")
+
+    new_month = NEW_MONTH_DATE[:7]
+    assert not any(
+        row and row[0] == new_month for row in service.grids["Monthly_Totals"]
+    ), f"{new_month} already has a totals row"
+    assert manager.log_expense(dict(EXPENSE, date=NEW_MONTH_DATE)), "log_expense failed"
+    mismatch = rescan_mismatch(manager, new_month)
+    if mismatch:
+        failures.append(f"month without a totals row: {mismatch}")
+    return failures
+
+
+def measure(size, incremental):
+    per_day = -(-size // 365)
+    service, manager = seeded_sheets(
+        size, per_day=per_day, incremental_totals=incremental
+    )
+    # The last day already has a Daily_Totals row at every size
+    last_day, month = service.grids["Expenses"][-1][0], service.grids["Expenses"][-1][5]
+    expense = dict(EXPENSE, date=last_day)
+    ok, elapsed = timed(manager.log_expense, expense)
+    assert ok, "log_expense failed"
+    counters = service.counters()
+    counters["ms"] = elapsed * 1000
+
+    # The incremental row must match what the full repair path computes
+    mismatch = rescan_mismatch(manager, month)
+    assert not mismatch, f"totals drifted: {mismatch}"
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    failures = check_against_rescan()
+    if failures:
+        print("FAIL: incremental totals differ from a full recalculation")
+        print("\n".join(f"  {failure}" for failure in failures))
+        sys.exit(1)
+    print("OK: incremental totals match a full recalculation")
+
+    print(f"{'rows':>8} {'mode':<12}{'calls':>6}{'sent B':>10}{'recv B':>12}{'ms':>10}")
+    incremental_costs = []
+    for size in sizes:
+        for incremental in (False, True):
+            result = measure(size, incremental)
+            mode = "incremental" if incremental else "rescan"
+            print(
+                f"{size:>8} {mode:<12}{result['calls']:>6}"
+                f"{result['bytes_sent']:>10}{result['bytes_received']:>12}"
+                f"{result['ms']:>10.2f}"
+            )
+            if incremental:
+                incremental_costs.append(result)
+
+    # Calls must match exactly; bytes may only differ by the extra digits of
+    # larger monthly sums, never in proportion to the number of rows
+    calls = {result["calls"] for result in incremental_costs}
+    received = [result["bytes_received"] for result in incremental_costs]
+    if len(calls) != 1 or max(received) > 1.5 * min(received):
+        print("FAIL: incremental log_expense cost depends on history size")
+        sys.exit(1)
+    print("OK: incremental log_expense cost is independent of Expenses row count")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Span timing overhead and the /metrics page
+
+Times metrics.span() disabled, enabled, and enabled with JSON span logging
+(to a discarding handler), then posts text expenses, photo receipts and
+/chart through /webhook with every backend faked (see bench_scenarios.py)
+with metrics off and on, alternating, and compares the best p50 of each. Prints the
+/metrics page of the enabled run.
+
+Exits non-zero if a disabled span costs more than 1 µs, or /metrics lacks
+a span of the photo pipeline or the Gemini token counter.
+
+Usage: python benchmarks/bench_metrics.py [--runs N] [--rounds N] [--spans N]
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+from bench_scenarios import SCENARIOS, Harness, receipt_jpeg, run_scenario
+from common import seeded_sheets
+from fake_telegram import FakeTelegramServer
+
+import metrics
+
+# Spans one photo receipt goes through
+PHOTO_SPANS = [
+    "update",
+    "webhook",
+    "telegram.download",
+    "receipt.prepare",
+    "gemini.generate",
+    "sheets.log_expense",
+    "sheets.batchUpdate",
+    "telegram.send_message",
+]
+
+
+def span_cost_ns(count):
+    """Time per span on top of an empty loop of the same length"""
+    start = time.perf_counter()
+    for _ in range(count):
+        pass
+    loop = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(count):
+        with metrics.span("bench"):
+            pass
+    return (time.perf_counter() - start - loop) / count * 1e9
+
+
+def set_metrics(enabled, log_spans=False):
+    metrics.METRICS_ENABLED = enabled
+    metrics.METRICS_LOG_SPANS = log_spans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--spans", type=int, default=200000)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    span_log = logging.getLogger(metrics.__name__)
+    span_log.propagate = False
+    span_log.addHandler(logging.NullHandler())
+    span_log.setLevel(logging.INFO)
+
+    print(f"Cost of one span ({args.spans} spans)")
+    costs = {}
+    for label, enabled, log_spans in [
+        ("disabled", False, False),
+        ("enabled", True, False),
+        ("enabled + JSON log", True, True),
+    ]:
+        set_metrics(enabled, log_spans)
+        costs[label] = span_cost_ns(args.spans)
+        print(f"  {label:<20}{costs[label]:>8.0f} ns")
+
+    print(f"Update p50 through /webhook, metrics off vs on ({args.runs} runs)")
+    print(f"  {'scenario':<15}{'off ms':>9}{'on ms':>9}{'change':>9}")
+    with FakeTelegramServer(file_content=receipt_jpeg()) as telegram:
+        harness = Harness(telegram, model_latency_ms=0)
+        harness.use(*seeded_sheets(5000))
+        metrics.reset()
+        for label, fields, _, _ in SCENARIOS:
+            if label not in ("text expense", "photo receipt", "/chart"):
+                continue
+            # Alternate off and on so drift hits both; keep the best p50
+            p50 = {False: [], True: []}
+            for _ in range(args.rounds):
+                for enabled in (False, True):
+                    set_metrics(enabled)
+                    result = run_scenario(harness, fields, args.runs)[0]
+                    p50[enabled].append(result["p50_ms"])
+            p50 = {enabled: min(samples) for enabled, samples in p50.items()}
+            print(
+                f"  {label:<15}{p50[False]:>9.2f}{p50[True]:>9.2f}"
+                f"{p50[True] / p50[False] - 1:>+9.1%}"
+            )
+
+        page = harness.client.get("/metrics").get_data(as_text=True)
+    print("/metrics after the enabled runs:")
+    print("\n".join(f"  {line}" for line in page.splitlines() if "_bucket" not in line))
+
+    failures = []
+    if costs["disabled"] > 1000:
+        failures.append(f"a disabled span costs {costs['disabled']:.0f} ns")
+    for name in PHOTO_SPANS:
+        if f'_span_seconds_count{{span="{name}"}}' not in page:
+            failures.append(f"no {name} span")
+    if "gemini_prompt_tokens_total" not in page:
+        failures.append("no Gemini token counter")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("OK: disabled spans are negligible and /metrics covers the pipeline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Sheets API calls per Telegram update, with and without request-scoped reads
+
+Runs typical updates through process_update (Telegram stubbed,
+FakeSheetsService behind SheetsManager, a fixed local-parser text so no
+model is needed) once without a request scope and once inside one, and
+compares the Sheets calls each update makes. With --legacy the manager
+rescans Expenses after every append (incremental_totals=False), where a
+message spanning several months re-read the whole sheet once per month.
+
+Exits non-zero if an update exceeds its call budget or the scope's call
+counter disagrees with the fake service.
+
+Usage: python benchmarks/bench_read_coalescing.py [--rows N] [--legacy]
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from common import seeded_sheets
+
+import app
+import sheets_integration
+from sheets_scope import request_scope
+
+# Inside the synthetic sheet's date range
+NOW = datetime(2025, 6, 11, 12, tzinfo=ZoneInfo("Asia/Kuala_Lumpur"))
+
+# (label, message text, Sheets call budget inside a request scope)
+UPDATES = [
+    ("/summary", "/summary", 1),
+    ("/chart", "/chart", 1),
+    ("/trend", "/trend", 1),
+    ("/range", "/range 2025-05-01 2025-06-10", 1),
+    ("/compare", "/compare", 1),
+    ("/year", "/year", 1),
+    ("text expense", "Grab 12.50", 2),
+    ("3 lines, 3 months", "Grab 12.50 2025-04-02\nGrab 9 2025-05-03\nGrab 7 today", 2),
+]
+
+# The rescan path also reads and rewrites the touched Daily_Totals rows
+LEGACY_BUDGETS = {"text expense": 6, "3 lines, 3 months": 10}
+
+
+def setup(rows, legacy):
+    service, manager = seeded_sheets(rows, incremental_totals=not legacy)
+    app.TELEGRAM_BOT_TOKEN = "bench-token"
+    app.GOOGLE_CREDENTIALS_JSON = app.GOOGLE_SHEETS_ID = "bench"
+    app.UPDATE_MODE = "inline"
+    app.EXTRACTION_CACHE_SIZE = 0
+    app.get_sheets_manager = lambda **kwargs: manager
+    app.send_telegram_message = lambda chat_id, text: {"ok": True}
+    app.send_telegram_photo = lambda chat_id, photo, caption="": {"ok": True}
+    app.send_chat_action = lambda chat_id, action="typing": {"ok": True}
+    app.get_malaysia_time = sheets_integration.get_malaysia_time = lambda: NOW
+    return service
+
+
+def run(service, text, scoped):
+    data = {"update_id": 1, "message": {"message_id": 1, "chat": {"id": 42}}}
+    data["message"]["text"] = text
+    app.reset_tracker()
+    service.reset_counters()
+    if not scoped:
+        app._process_update(data)
+        return service.calls, None
+    with request_scope() as scope:
+        app._process_update(data)
+    return service.calls, scope
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    service = setup(args.rows, args.legacy)
+    mode = "rescan totals" if args.legacy else "incremental totals"
+    print(f"Sheets calls per update, {args.rows} expense rows, {mode}")
+    print(
+        f"  {'update':<20}{'unscoped':>10}{'scoped':>8}{'coalesced':>11}{'budget':>8}"
+    )
+
+    failures = []
+    for label, text, budget in UPDATES:
+        if args.legacy:
+            budget = LEGACY_BUDGETS.get(label, budget)
+        run(service, text, scoped=False)  # Warm the sheet id and month caches
+        unscoped, _ = run(service, text, scoped=False)
+        scoped, scope = run(service, text, scoped=True)
+        print(f"  {label:<20}{unscoped:>10}{scoped:>8}{scope.hits:>11}{budget:>8}")
+        if scope.calls != scoped:
+            failures.append(f"{label}: scope counted {scope.calls}, service {scoped}")
+        if scoped > budget:
+            failures.append(f"{label}: {scoped} Sheets calls, budget {budget}")
+
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("OK: every update within its Sheets call budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+recalculate_all_monthly_totals: one full read + clear/append vs paged streaming
+
+Loads a synthetic Expenses sheet (200k rows by default) into
+FakeSheetsService and recalculates Monthly_Totals with the previous
+implementation (one Expenses!A:F read into a list, clear, re-append) and
+the paged one. Reports wall time with a simulated per-call latency, API
+calls, bytes received, Python peak memory (tracemalloc, which includes the
+fake's response objects), and how many API calls left Monthly_Totals
+without a full set of months for a concurrent reader. Both must produce
+the same totals (to the cent; the paged sums add page subtotals).
+
+The paged path trades read calls and time for memory: it makes one read
+per page and also rebuilds Daily_Totals, which the previous implementation
+did not have, so expect it to use far less memory but to run somewhat
+slower.
+
+Usage: python benchmarks/bench_recalculate.py [--rows N] [--latency-ms MS] [--page-rows N]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+from common import EXPENSE_HEADER, same_totals, synthetic_expenses
+
+from fake_sheets import FakeSheetsService
+
+import sheets_integration
+from sheets_integration import CATEGORIES, SheetsManager
+
+
+def legacy_recalculate(manager):
+    """The previous implementation: read everything, clear, re-append"""
+    expense_result = (
+        manager.sheet.values()
+        .get(spreadsheetId=manager.spreadsheet_id, range="Expenses!A:F")
+        .execute()
+    )
+    expense_values = expense_result.get("values", [])
+
+    monthly_data = {}
+    for row in expense_values[1:]:
+        if len(row) >= 6 and row[5]:
+            month = row[5]
+            amount = float(row[1]) if row[1] else 0
+            category = row[2].lower() if row[2] else "other"
+            if month not in monthly_data:
+                monthly_data[month] = {"total": 0}
+                monthly_data[month].update({c: 0 for c in CATEGORIES})
+            monthly_data[month]["total"] += amount
+            if category in monthly_data[month]:
+                monthly_data[month][category] += amount
+            else:
+                monthly_data[month]["other"] += amount
+
+    manager.sheet.values().clear(
+        spreadsheetId=manager.spreadsheet_id, range="Monthly_Totals!A2:I"
+    ).execute()
+    new_rows = [
+        [month, monthly_data[month]["total"]]
+        + [monthly_data[month][c] for c in CATEGORIES]
+        for month in sorted(monthly_data)
+    ]
+    manager.sheet.values().append(
+        spreadsheetId=manager.spreadsheet_id,
+        range="Monthly_Totals!A:I",
+        valueInputOption="USER_ENTERED",
+        body={"values": new_rows},
+    ).execute()
+    return True
+
+
+def watch_totals(service, months):
+    """Record after every API call whether Monthly_Totals held all months"""
+    gaps = []
+    execute = service._execute
+
+    def recording(name, handler, payload):
+        result = execute(name, handler, payload)
+        rows = [row for row in service.grids["Monthly_Totals"][1:] if row and row[0]]
+        gaps.append(len(rows) < months)
+        return result
+
+    service._execute = recording
+    return gaps
+
+
+def run(label, recalculate, rows, latency_ms, months):
+    service = FakeSheetsService(latency_ms=latency_ms)
+    service.load("Expenses", [EXPENSE_HEADER] + rows)
+    manager = SheetsManager(service=service, spreadsheet_id="bench")
+    manager._setup_headers()
+    manager.recalculate_all_monthly_totals()  # Totals present before the run
+    service.reset_counters()
+    gaps = watch_totals(service, months)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    ok = recalculate(manager)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(
+        f"  {label:<10}{elapsed * 1000:>10.0f}{service.calls:>7}"
+        f"{service.bytes_received / 1024 / 1024:>10.1f}{peak / 1024 / 1024:>10.1f}"
+        f"{sum(gaps):>8}"
+    )
+    return ok, [list(map(str, row)) for row in service.grids["Monthly_Totals"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--page-rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    sheets_integration.RECALC_PAGE_ROWS = args.page_rows
+    rows = synthetic_expenses(args.rows, per_day=20)
+    months = len({row[5] for row in rows})
+
+    print(
+        f"{args.rows} expense rows over {months} months, "
+        f"{args.latency_ms:.0f} ms per API call, pages of {args.page_rows} rows"
+    )
+    print(
+        f"  {'variant':<10}{'ms':>10}{'calls':>7}{'MB recv':>10}"
+        f"{'peak MB':>10}{'gaps':>8}"
+    )
+    legacy_ok, legacy_totals = run(
+        "legacy", legacy_recalculate, rows, args.latency_ms, months
+    )
+    paged_ok, paged_totals = run(
+        "paged",
+        SheetsManager.recalculate_all_monthly_totals,
+        rows,
+        args.latency_ms,
+        months,
+    )
+
+    if not (legacy_ok and paged_ok) or not same_totals(legacy_totals, paged_totals):
+        sys.exit("FAIL: paged recalculation does not match the legacy totals")
+    print("OK: Monthly_Totals match to the cent")
+
+
+if __name__ == "__main__":
+    main()
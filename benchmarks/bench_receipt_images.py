@@ -0,0 +1,290 @@
+"""
+Receipt image preprocessing: legacy re-encode vs the preprocessing pipeline
+
+Builds a synthetic corpus: phone photos of receipts lying on a table, with
+Telegram's ladder of PhotoSizes, plus a PNG screenshot sent as a document
+and a small JPEG. For each sample it compares the old path (largest
+PhotoSize, full decode, JPEG q85) with choose_photo_size +
+prepare_receipt_image, as configured by default and with grayscale and
+autocrop on, and reports bytes downloaded, bytes uploaded to Gemini
+(base64), CPU time and peak RSS. Peak RSS is measured in a fresh child
+process per sample and variant, relative to a child that only loads the file.
+
+If GEMINI_API_KEY is set, every variant is also sent to Gemini and the
+extracted amount is checked against the total printed on each receipt.
+RECEIPT_GRAYSCALE and RECEIPT_AUTOCROP stay off until gray+crop matches the
+pipeline's accuracy here.
+
+Usage: python benchmarks/bench_receipt_images.py [--samples N] [--max-side PX]
+"""
+
+import argparse
+import base64
+import io
+import os
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import peak_rss_kb, reset_peak_rss, timed
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from receipt_image import choose_photo_size, prepare_receipt_image
+
+# Longer sides of the PhotoSizes Telegram generates for an uploaded photo
+TELEGRAM_SIDES = (90, 320, 800, 1280, 2560)
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def draw_receipt(rng, total):
+    """A white receipt with a few items and the given total"""
+    items = [(f"ITEM {i + 1}", rng.uniform(1, 30)) for i in range(rng.randint(3, 8))]
+    paper = Image.new("RGB", (900, 400 + 80 * len(items)), "white")
+    draw = ImageDraw.Draw(paper)
+    font = _font(42)
+    draw.text(
+        (60, 50), rng.choice(["KEDAI MAKAN ALI", "TESCO", "SHELL"]), "black", font
+    )
+    draw.text((60, 120), "2025-06-09  12:41", "black", _font(32))
+    y = 200
+    for name, price in items:
+        draw.text((60, y), name, "black", font)
+        draw.text((620, y), f"{price:6.2f}", "black", font)
+        y += 80
+    draw.text((60, y + 40), "TOTAL", "black", font)
+    draw.text((620, y + 40), f"{total:6.2f}", "black", font)
+    return paper
+
+
+def phone_photo(rng, receipt):
+    """Place the receipt on a textured table and shoot it at 3000x4000"""
+    table = Image.effect_noise((750, 1000), 40).convert("RGB")
+    table = table.resize((3000, 4000)).filter(ImageFilter.GaussianBlur(2))
+    tint = Image.new("RGB", table.size, (120, 85, 60))
+    table = Image.blend(table, tint, 0.7)
+    scale = 2200 / receipt.width
+    receipt = receipt.resize((2200, int(receipt.height * scale)))
+    receipt = receipt.rotate(rng.uniform(-4, 4), expand=True, fillcolor=(120, 85, 60))
+    table.paste(receipt, (400, max(0, (4000 - receipt.height) // 2)))
+    return table
+
+
+def jpeg(image, quality):
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
+
+
+def telegram_photo(image):
+    """Simulate the PhotoSize ladder and file storage for an uploaded photo"""
+    sizes, files = [], {}
+    for side in TELEGRAM_SIDES:
+        copy = image.copy()
+        copy.thumbnail((side, side))
+        file_id = f"photo_{side}"
+        files[file_id] = jpeg(copy, 87)
+        sizes.append(
+            {
+                "file_id": file_id,
+                "width": copy.width,
+                "height": copy.height,
+                "file_size": len(files[file_id]),
+            }
+        )
+    return sizes, files
+
+
+def build_corpus(samples, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(samples):
+        total = round(rng.uniform(5, 300), 2)
+        receipt = draw_receipt(rng, total)
+        sizes, files = telegram_photo(phone_photo(rng, receipt))
+        corpus.append(("photo", total, {"photo": sizes}, files))
+
+    total = round(rng.uniform(5, 300), 2)
+    screenshot = Image.new("RGB", (1080, 2400), "white")
+    screenshot.paste(draw_receipt(rng, total), (90, 300))
+    png = io.BytesIO()
+    screenshot.save(png, format="PNG")
+    corpus.append(
+        (
+            "document png",
+            total,
+            {"document": {"file_id": "doc"}},
+            {"doc": png.getvalue()},
+        )
+    )
+
+    total = round(rng.uniform(5, 300), 2)
+    small = draw_receipt(rng, total)
+    small.thumbnail((800, 800))
+    corpus.append(
+        (
+            "document jpeg",
+            total,
+            {"document": {"file_id": "small"}},
+            {"small": jpeg(small, 80)},
+        )
+    )
+    return corpus
+
+
+def legacy(message, files):
+    """The webhook's original handling: largest size, full decode, q85"""
+    file_id = (message.get("document") or message.get("photo", [{}])[-1])["file_id"]
+    data = files[file_id]
+    image = Image.open(io.BytesIO(data))
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGB")
+    return data, jpeg(image, 85), file_id
+
+
+def pipeline(message, files, max_side):
+    if "photo" in message:
+        file_id = choose_photo_size(message["photo"], max_side)["file_id"]
+    else:
+        file_id = message["document"]["file_id"]
+    data = files[file_id]
+    return data, prepare_receipt_image(data, max_side=max_side), file_id
+
+
+def grayscale_crop(message, files, max_side):
+    downloaded, _, file_id = pipeline(message, files, max_side)
+    prepared = prepare_receipt_image(
+        downloaded, max_side=max_side, grayscale=True, autocrop=True
+    )
+    return downloaded, prepared, file_id
+
+
+def child_peak_kb(variant, path, max_side):
+    """Peak RSS of a fresh process running one variant on one file"""
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", variant, path, str(max_side)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output)["maxrss_kb"]
+
+
+def run_child(variant, path, max_side):
+    # ru_maxrss survives exec, so track the kernel's resettable high-water mark
+    reset_peak_rss()
+    with open(path, "rb") as source:
+        data = source.read()
+    Image.open(io.BytesIO(data))  # Import the decoders in every variant
+    if variant == "legacy":
+        image = Image.open(io.BytesIO(data))
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGB")
+        jpeg(image, 85)
+    elif variant == "pipeline":
+        prepare_receipt_image(data, max_side=max_side)
+    elif variant == "grayscale_crop":
+        prepare_receipt_image(data, max_side=max_side, grayscale=True, autocrop=True)
+    print(json.dumps({"maxrss_kb": peak_rss_kb()}))
+
+
+def measure(func, message, files, tmp, *args):
+    cpu = time.process_time()
+    (downloaded, uploaded, file_id), _ = timed(func, message, files, *args)
+    cpu = time.process_time() - cpu
+
+    path = os.path.join(tmp, file_id)
+    with open(path, "wb") as target:
+        target.write(downloaded)
+    variant = func.__name__
+    max_side = args[0] if args else 0
+    peak = child_peak_kb(variant, path, max_side) - child_peak_kb("none", path, 0)
+
+    return {
+        "downloaded": len(downloaded),
+        "uploaded": len(base64.b64encode(uploaded)),
+        "cpu_ms": cpu * 1000,
+        "peak_kb": max(0, peak),
+        "image": uploaded,
+    }
+
+
+def extracted_amount(tracker, image_data):
+    result = tracker.extract_expense_data(image_data=image_data)
+    try:
+        return float(result.get("amount"))
+    except (TypeError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--max-side", type=int, default=1280)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        variant, path, max_side = args.child
+        return run_child(variant, path, int(max_side))
+
+    tracker = None
+    if os.environ.get("GEMINI_API_KEY"):
+        import app
+
+        tracker = app.ExpenseTracker()
+
+    corpus = build_corpus(args.samples)
+    tmp = tempfile.mkdtemp()
+    print(
+        f"{'sample':<15}{'variant':<10}{'down KB':>9}{'up KB':>8}"
+        f"{'cpu ms':>8}{'peak MB':>9}{'correct':>9}"
+    )
+    sums = {
+        variant: [0, 0, 0.0, 0, 0] for variant in ("legacy", "pipeline", "gray+crop")
+    }
+    for kind, total, message, files in corpus:
+        for variant, result in (
+            ("legacy", measure(legacy, message, files, tmp)),
+            ("pipeline", measure(pipeline, message, files, tmp, args.max_side)),
+            ("gray+crop", measure(grayscale_crop, message, files, tmp, args.max_side)),
+        ):
+            correct = "-"
+            if tracker:
+                amount = extracted_amount(tracker, result["image"])
+                hit = amount is not None and abs(amount - total) < 0.01
+                correct = "yes" if hit else "no"
+                sums[variant][4] += hit
+            print(
+                f"{kind:<15}{variant:<10}{result['downloaded'] / 1024:>9.1f}"
+                f"{result['uploaded'] / 1024:>8.1f}{result['cpu_ms']:>8.1f}"
+                f"{result['peak_kb'] / 1024:>9.1f}{correct:>9}"
+            )
+            totals = sums[variant]
+            totals[0] += result["downloaded"]
+            totals[1] += result["uploaded"]
+            totals[2] += result["cpu_ms"]
+            totals[3] = max(totals[3], result["peak_kb"])
+
+    shutil.rmtree(tmp)
+    print("totals")
+    for variant, (down, up, cpu, peak, hits) in sums.items():
+        accuracy = f"{hits}/{len(corpus)}" if tracker else "n/a (no GEMINI_API_KEY)"
+        print(
+            f"  {variant:<9} downloaded {down / 1024:.0f} KB, uploaded {up / 1024:.0f} KB, "
+            f"cpu {cpu:.0f} ms, max peak {peak / 1024:.1f} MB, accuracy {accuracy}"
+        )
+
+
+if __name__ == "__main__":
+    main()
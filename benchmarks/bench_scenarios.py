@@ -0,0 +1,236 @@
+"""
+End-to-end update scenarios through /webhook with every backend faked
+
+Drives /webhook through Flask's test client (inline processing) with
+FakeSheetsService behind SheetsManager, FakeGeminiModel as the tracker's
+model and FakeTelegramServer as the Bot API, for a text expense, a photo
+receipt, /summary, /chart and /refresh at several Expenses sizes. Reports
+p50/p95 latency per update, Sheets calls and bytes per update, model and
+Telegram calls, and the peak Python memory allocated while handling one
+update (tracemalloc, on an extra untimed run). The extraction and chart
+caches are off so every photo reaches the model and every /chart renders.
+
+--json writes the results to a file; --baseline prints the change against
+such a file, e.g. one written on another commit. Exits non-zero if an
+update does not log its expense or send its reply.
+
+Usage: python benchmarks/bench_scenarios.py [--sizes 1000,50000,200000] [--runs N]
+       [--sheets-latency-ms MS] [--json FILE] [--baseline FILE]
+"""
+
+import argparse
+import io
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from common import ROOT, seeded_sheets, summarize
+from fake_gemini import FakeGeminiModel
+from fake_telegram import FakeTelegramServer
+
+from PIL import Image
+
+import app
+import sheets_integration
+
+# Inside the synthetic sheet's date range at every size (5 rows a day from
+# 2023-01-01 ends in 2023-07 at 1k rows)
+NOW = datetime(2023, 7, 15, 12, tzinfo=ZoneInfo("Asia/Kuala_Lumpur"))
+
+# Telegram's PhotoSizes for a 900x1400 receipt photo
+PHOTO_SIZES = [
+    {"file_id": "receipt-s", "width": 58, "height": 90},
+    {"file_id": "receipt-m", "width": 206, "height": 320},
+    {"file_id": "receipt-x", "width": 900, "height": 1400},
+]
+
+# (label, message fields, Telegram reply method, adds an expense row)
+SCENARIOS = [
+    ("text expense", {"text": "Grab 12.50"}, "sendMessage", True),
+    ("photo receipt", {"photo": PHOTO_SIZES}, "sendMessage", True),
+    ("/summary", {"text": "/summary"}, "sendMessage", False),
+    ("/chart", {"text": "/chart"}, "sendPhoto", False),
+    ("/refresh", {"text": "/refresh"}, "sendMessage", False),
+]
+
+
+def receipt_jpeg():
+    buffer = io.BytesIO()
+    Image.new("L", (900, 1400), 255).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Harness:
+    """The app wired to the fakes, posting updates with fresh update_ids"""
+
+    def __init__(self, telegram, model_latency_ms):
+        self.telegram = telegram
+        self.model = FakeGeminiModel(model_latency_ms)
+        self.client = app.app.test_client()
+        self.update_id = 0
+
+        app.TELEGRAM_BOT_TOKEN = "bench-token"
+        app.TELEGRAM_API_URL = telegram.url
+        app._telegram_client = None
+        app.GEMINI_API_KEY = "bench-key"
+        app.GOOGLE_CREDENTIALS_JSON = app.GOOGLE_SHEETS_ID = "bench"
+        app.UPDATE_MODE = "inline"
+        app.EXTRACTION_CACHE_SIZE = 0
+        app.CHART_CACHE_SIZE = 0
+        app.get_malaysia_time = sheets_integration.get_malaysia_time = lambda: NOW
+
+    def use(self, service, manager):
+        self.service = service
+        app.get_sheets_manager = lambda **kwargs: manager
+        app.reset_tracker()
+        app.get_tracker()._model = self.model
+
+    def post(self, fields):
+        self.update_id += 1
+        message = {"message_id": self.update_id, "chat": {"id": 42}, **fields}
+        update = {"update_id": self.update_id, "message": message}
+        response = self.client.post("/webhook", json=update)
+        assert response.status_code == 200, response.get_json()
+
+    def reset_counters(self):
+        self.service.reset_counters()
+        self.model.reset()
+        self.telegram.reset()
+
+
+def run_scenario(harness, fields, runs):
+    harness.post(fields)  # Warm caches and lazy imports
+
+    tracemalloc.start()
+    harness.post(fields)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    expenses = harness.service.grids["Expenses"]
+    rows_before = len(expenses)
+    harness.reset_counters()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        harness.post(fields)
+        samples.append(time.perf_counter() - start)
+
+    counters = harness.service.counters()
+    replies = [method for method, _ in harness.telegram.calls]
+    result = summarize(samples)
+    result.update(
+        {
+            "sheets_calls": counters["calls"] / runs,
+            "sheets_kb_sent": counters["bytes_sent"] / 1024 / runs,
+            "sheets_kb_received": counters["bytes_received"] / 1024 / runs,
+            "model_calls": harness.model.calls / runs,
+            "telegram_calls": len(replies) / runs,
+            "peak_kb": peak / 1024,
+        }
+    )
+    return result, replies, len(expenses) - rows_before
+
+
+def run_size(harness, size, runs, sheets_latency_ms):
+    service, manager = seeded_sheets(size, latency_ms=sheets_latency_ms)
+    harness.use(service, manager)
+
+    results, failures = {}, []
+    for label, fields, reply, logs in SCENARIOS:
+        result, replies, added = run_scenario(harness, fields, runs)
+        results[label] = result
+        if replies.count(reply) < runs:
+            failures.append(f"{size} rows {label}: {replies.count(reply)} {reply}")
+        if logs and added != runs:
+            failures.append(f"{size} rows {label}: logged {added} of {runs}")
+    return results, failures
+
+
+def print_results(size, results, baseline):
+    print(f"{size} expense rows")
+    print(
+        f"  {'scenario':<15}{'p50 ms':>9}{'p95 ms':>9}{'sheets':>8}{'sent KB':>9}"
+        f"{'recv KB':>9}{'model':>7}{'tg':>5}{'peak KB':>10}"
+        + (f"{'p50 vs base':>13}" if baseline else "")
+    )
+    for label, r in results.items():
+        line = (
+            f"  {label:<15}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+            f"{r['sheets_calls']:>8.1f}{r['sheets_kb_sent']:>9.1f}"
+            f"{r['sheets_kb_received']:>9.1f}{r['model_calls']:>7.1f}"
+            f"{r['telegram_calls']:>5.1f}{r['peak_kb']:>10.0f}"
+        )
+        before = baseline.get(str(size), {}).get(label) if baseline else None
+        if before:
+            line += f"{r['p50_ms'] / before['p50_ms'] - 1:>+13.0%}"
+        elif baseline:
+            line += f"{'n/a':>13}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,50000,200000")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--sheets-latency-ms", type=float, default=0.0)
+    parser.add_argument("--model-latency-ms", type=float, default=0.0)
+    parser.add_argument("--telegram-latency-ms", type=float, default=0.0)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Compare with results from --json")
+    args = parser.parse_args()
+
+    # The app logs every update at INFO, which would bury the tables
+    logging.getLogger().setLevel(logging.WARNING)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        print(f"Baseline: {args.baseline}")
+
+    output = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": vars(args),
+        "results": {},
+    }
+    failures = []
+    with FakeTelegramServer(args.telegram_latency_ms, receipt_jpeg()) as telegram:
+        harness = Harness(telegram, args.model_latency_ms)
+        for size in map(int, args.sizes.split(",")):
+            results, size_failures = run_size(
+                harness, size, args.runs, args.sheets_latency_ms
+            )
+            output["results"][str(size)] = results
+            failures += size_failures
+            print_results(size, results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Wrote {args.json}")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("OK: every update logged its expense and replied")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Sheets quota pacing: a /refresh and a burst of expenses under a quota
+
+FakeSheetsService enforces read and write quotas over a shortened period
+(default 30 each per 2 s, Google's 60 per minute sped up) with a per-call
+latency. A /refresh of a sheet read in many pages starts first; while it
+runs (a quarter period in), a burst of expenses is logged from concurrent "updates" and several
+chats ask for the same monthly total at once. Variants:
+
+- unpaced: calls go out back to back, as before the scheduler
+- paced, no priority: QuotaScheduler, with /refresh not marked background
+- paced: QuotaScheduler with /refresh in the background
+- paced + 5% 503s: the same with transient server errors injected
+
+Reports 429s, retries, collapsed duplicate reads, failed expenses and
+/refresh, and the latency of the interactive calls. Exits non-zero if a
+paced run sees a 429 or loses an expense, or if the background /refresh
+does not make the expenses faster than the unprioritized one.
+
+Usage: python benchmarks/bench_sheets_quota.py [--rows N] [--quota N] [--period S]
+"""
+
+import argparse
+import contextlib
+import sys
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from common import seeded_sheets, summarize
+
+import sheets_integration
+import sheets_scope
+from sheets_integration import SheetsManager
+from sheets_quota import QuotaScheduler
+from sheets_scope import request_scope
+
+# Inside the synthetic sheet's date range (5 rows a day from 2023-01-01)
+NOW = datetime(2023, 6, 11, 12, tzinfo=ZoneInfo("Asia/Kuala_Lumpur"))
+
+EXPENSE = {
+    "amount": 12.5,
+    "category": "food",
+    "description": "Lunch",
+    "merchant": "McDonald's",
+    "date": "2023-06-11",
+}
+
+
+def run_threads(target, count):
+    samples, failures = [], []
+
+    def work():
+        start = time.perf_counter()
+        with request_scope():
+            ok = target()
+        samples.append(time.perf_counter() - start)
+        if not ok:
+            failures.append(1)
+
+    threads = [threading.Thread(target=work) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, samples, failures
+
+
+def run(args, paced, background=True, error_rate=0.0):
+    service, _ = seeded_sheets(args.rows)
+    service.latency = args.latency_ms / 1000
+    service.quotas = {"read": args.quota, "write": args.quota}
+    service.period = args.period
+    service.error_rate = error_rate
+    scheduler = None
+    if paced:
+        scheduler = QuotaScheduler(
+            args.quota, args.quota, base_delay=0.1, max_delay=1.0, period=args.period
+        )
+    manager = SheetsManager(
+        service=service, spreadsheet_id="bench", scheduler=scheduler
+    )
+    # Load the sheet ids and totals row index outside the measured window
+    manager.get_monthly_total("2023-06")
+    rows_before = len(service.grids["Expenses"])
+    service.reset_counters()
+
+    refresh = {}
+
+    def recalculate():
+        start = time.perf_counter()
+        refresh["ok"] = manager.recalculate_all_monthly_totals()
+        refresh["seconds"] = time.perf_counter() - start
+
+    # Without the background mark /refresh competes with the expenses
+    sheets_integration.background_calls = (
+        sheets_scope.background_calls if background else contextlib.nullcontext
+    )
+
+    refresher = threading.Thread(target=recalculate)
+    refresher.start()
+    # Arrive once /refresh has used up most of the read quota
+    time.sleep(args.period / 4)
+
+    loggers, log_samples, log_failures = run_threads(
+        lambda: manager.log_expense(dict(EXPENSE)), args.expenses
+    )
+    readers, read_samples, read_failures = run_threads(
+        lambda: manager.get_monthly_total("2023-06")["total"] is not None, args.readers
+    )
+    for thread in loggers + readers + [refresher]:
+        thread.join()
+
+    logged = len(service.grids["Expenses"]) - rows_before
+    return {
+        "429": service.rejected[429],
+        "503": service.rejected[503],
+        "retries": scheduler.retries if scheduler else 0,
+        "collapsed": scheduler.collapsed if scheduler else 0,
+        "logged": logged,
+        "log_failures": len(log_failures),
+        "read_failures": len(read_failures),
+        "refresh_ok": refresh["ok"],
+        "refresh_s": refresh["seconds"],
+        "log": summarize(log_samples),
+        "read": summarize(read_samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=40000)
+    parser.add_argument("--page-rows", type=int, default=1000)
+    parser.add_argument("--quota", type=int, default=30)
+    parser.add_argument("--period", type=float, default=2.0)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--expenses", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+
+    sheets_integration.RECALC_PAGE_ROWS = args.page_rows
+    sheets_integration.get_malaysia_time = lambda: NOW
+    pages = args.rows // args.page_rows + 1
+    print(
+        f"/refresh of {args.rows} rows ({pages} page reads) with {args.expenses} "
+        f"expenses and {args.readers} identical reads, quota {args.quota} reads "
+        f"and {args.quota} writes per {args.period:g} s, {args.latency_ms:g} ms "
+        f"per call"
+    )
+    print(
+        f"  {'variant':<20}{'429':>5}{'503':>5}{'retry':>6}{'joined':>7}"
+        f"{'logged':>7}{'failed':>7}{'refresh':>9}"
+        f"{'log p50/p95 ms':>17}{'read p95 ms':>12}"
+    )
+
+    variants = {
+        "unpaced": run(args, paced=False),
+        "paced, no priority": run(args, paced=True, background=False),
+        "paced": run(args, paced=True),
+        "paced + 5% 503s": run(args, paced=True, error_rate=0.05),
+    }
+    for label, r in variants.items():
+        refresh = f"{r['refresh_s']:.1f}s" if r["refresh_ok"] else "failed"
+        failed = r["log_failures"] + r["read_failures"]
+        print(
+            f"  {label:<20}{r['429']:>5}{r['503']:>5}{r['retries']:>6}"
+            f"{r['collapsed']:>7}{r['logged']:>7}{failed:>7}{refresh:>9}"
+            f"{r['log']['p50_ms']:>8.0f}/{r['log']['p95_ms']:<8.0f}"
+            f"{r['read']['p95_ms']:>12.0f}"
+        )
+
+    failures = []
+    for label in ("paced, no priority", "paced"):
+        r = variants[label]
+        if r["429"]:
+            failures.append(f"{label}: {r['429']} calls rejected with 429")
+        if r["logged"] != args.expenses or r["log_failures"] or r["read_failures"]:
+            failures.append(f"{label}: logged {r['logged']} of {args.expenses}")
+        if not r["refresh_ok"]:
+            failures.append(f"{label}: /refresh failed")
+    if variants["paced + 5% 503s"]["429"]:
+        failures.append("paced + 503s: calls rejected with 429")
+    if (
+        variants["paced"]["log"]["p95_ms"]
+        >= variants["paced, no priority"]["log"]["p95_ms"]
+    ):
+        failures.append("background /refresh did not speed up the expenses")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("OK: paced calls stay within quota and expenses go ahead of /refresh")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Per-request SheetsManager setup cost, before and after sharing one manager
+
+Before: every webhook built a new SheetsManager (JSON parse, credentials,
+discovery build) and paid a fresh OAuth token fetch on its first API call.
+After: the process-wide manager from get_sheets_manager() is reused, so only
+the first request pays for setup and the token.
+
+The OAuth token endpoint is replaced by a stub with configurable latency.
+
+Usage: python benchmarks/bench_sheets_setup.py [--requests N] [--token-ms MS]
+"""
+
+import argparse
+import json
+import time
+
+from common import make_service_account_json, print_table, summarize, timed
+
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+import sheets_integration
+
+token_fetches = 0
+
+
+def install_token_stub(latency_ms):
+    """Replace the OAuth token fetch with a local stub"""
+
+    def refresh(self, request):
+        global token_fetches
+        token_fetches += 1
+        time.sleep(latency_ms / 1000)
+        self.token = "bench-token"
+        self.expiry = None
+
+    service_account.Credentials.refresh = refresh
+
+
+def ensure_token(manager):
+    """What AuthorizedHttp does before the first API call of a request"""
+    if not manager.credentials.valid:
+        manager.credentials.refresh(None)
+
+
+def legacy_request_setup(credentials_json, spreadsheet_id):
+    """Baseline: the per-request construction the webhook used to do"""
+    credentials = service_account.Credentials.from_service_account_info(
+        json.loads(credentials_json), scopes=sheets_integration.SCOPES
+    )
+    service = build("sheets", "v4", credentials=credentials)
+    manager = type("LegacyManager", (), {})()
+    manager.credentials = credentials
+    manager.sheet = service.spreadsheets()
+    manager.spreadsheet_id = spreadsheet_id
+    ensure_token(manager)
+    return manager
+
+
+def shared_request_setup(credentials_json, spreadsheet_id):
+    """Current: reuse the process-wide manager"""
+    manager = sheets_integration.get_sheets_manager(
+        credentials_json=credentials_json, spreadsheet_id=spreadsheet_id
+    )
+    ensure_token(manager)
+    return manager
+
+
+def run(setup, credentials_json, spreadsheet_id, requests):
+    global token_fetches
+    token_fetches = 0
+    sheets_integration.invalidate_sheets_manager()
+    samples = [
+        timed(setup, credentials_json, spreadsheet_id)[1] for _ in range(requests)
+    ]
+    return summarize(samples), token_fetches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--token-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    install_token_stub(args.token_ms)
+    credentials_json = make_service_account_json()
+    spreadsheet_id = "bench-sheet"
+
+    before, before_tokens = run(
+        legacy_request_setup, credentials_json, spreadsheet_id, args.requests
+    )
+    after, after_tokens = run(
+        shared_request_setup, credentials_json, spreadsheet_id, args.requests
+    )
+
+    print_table(
+        f"Per-request Sheets setup ({args.requests} requests, "
+        f"{args.token_ms:.0f} ms token stub)",
+        {"before": before, "after": after},
+    )
+    print(f"  token fetches: before={before_tokens} after={after_tokens}")
+
+    # Changing the spreadsheet ID must rebuild the shared manager
+    first = sheets_integration.get_sheets_manager(credentials_json, spreadsheet_id)
+    second = sheets_integration.get_sheets_manager(credentials_json, "other-sheet")
+    print(f"  rebuilt on spreadsheet change: {first is not second}")
+
+
+if __name__ == "__main__":
+    main()
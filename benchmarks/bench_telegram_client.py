@@ -0,0 +1,109 @@
+"""
+Bare requests calls vs the pooled TelegramClient against a local Bot API stub
+
+Each simulated receipt makes the three calls the webhook does (getFile, the
+file download and sendMessage). By default the stub serves HTTPS with a
+throwaway self-signed certificate, so the cost of a fresh TLS handshake per
+call shows up the way it does against api.telegram.org.
+
+Usage: python benchmarks/bench_telegram_client.py [--receipts N] [--no-tls]
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+
+import requests
+
+from common import print_table, summarize, timed
+from fake_telegram import FakeTelegramServer
+
+from telegram_client import TelegramClient
+
+TOKEN = "bench-token"
+
+
+def make_certificate(directory):
+    """Self-signed localhost certificate (key and cert in one PEM file)"""
+    path = os.path.join(directory, "localhost.pem")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-keyout",
+            path,
+            "-out",
+            path + ".crt",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-addext",
+            "subjectAltName=DNS:localhost",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    with open(path, "a") as pem, open(path + ".crt") as cert:
+        pem.write(cert.read())
+    return path
+
+
+def bare_receipt(base_url):
+    """The three calls as the webhook used to make them"""
+    info = requests.get(
+        f"{base_url}/bot{TOKEN}/getFile", params={"file_id": "stub"}
+    ).json()
+    requests.get(f"{base_url}/file/bot{TOKEN}/{info['result']['file_path']}")
+    requests.post(
+        f"{base_url}/bot{TOKEN}/sendMessage",
+        json={"chat_id": 1, "text": "✅ Expense Logged!", "parse_mode": "HTML"},
+    )
+
+
+def client_receipt(client):
+    client.download_file("stub")
+    client.send_message(1, "✅ Expense Logged!")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--receipts", type=int, default=50)
+    parser.add_argument("--no-tls", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        certfile = None
+        if not args.no_tls:
+            certfile = make_certificate(tmp)
+            os.environ["REQUESTS_CA_BUNDLE"] = certfile
+
+        with FakeTelegramServer(certfile=certfile) as server:
+            bare = [timed(bare_receipt, server.url)[1] for _ in range(args.receipts)]
+            bare_connections = server.connections
+
+            server.reset()
+            client = TelegramClient(TOKEN, base_url=server.url)
+            pooled = [timed(client_receipt, client)[1] for _ in range(args.receipts)]
+            pooled_connections = server.connections
+
+            # 429s are retried after Telegram's retry_after
+            server.rate_limit(2, retry_after=0)
+            ok = client.send_message(1, "after rate limit").get("ok")
+
+    print_table(
+        f"Per receipt: getFile + download + sendMessage "
+        f"({'HTTP' if args.no_tls else 'HTTPS'} stub)",
+        {"bare": summarize(bare), "pooled": summarize(pooled)},
+    )
+    print(f"  TCP connections: bare={bare_connections} pooled={pooled_connections}")
+    print(f"  sendMessage after two 429s: ok={ok} retries={client.retries}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Local text parser: share of text expenses handled without Gemini
+
+Runs every message of benchmarks/text_corpus.jsonl (hand-labelled amount,
+category and date) through parse_expense_text and reports how many clear the
+confidence threshold, how accurate those local answers are, how long parsing
+takes, and the model latency saved. The saving uses --model-latency-ms unless
+GEMINI_API_KEY is set, in which case the corpus is also sent to Gemini to
+measure it. Exits non-zero if any local answer is wrong.
+
+Usage: python benchmarks/bench_text_parser.py [--threshold T] [--model-latency-ms MS]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from datetime import date, timedelta
+
+from common import print_table, summarize, timed
+
+import app
+from text_parser import parse_expense_text
+
+CORPUS = os.path.join(os.path.dirname(__file__), "text_corpus.jsonl")
+TODAY = date(2025, 6, 11)
+
+
+def load_corpus():
+    with open(CORPUS) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def correct(expense_data, sample):
+    expected_date = TODAY - timedelta(days=sample["days_ago"])
+    return (
+        abs(float(expense_data["amount"]) - sample["amount"]) < 0.005
+        and expense_data["category"] == sample["category"]
+        and expense_data["date"] == expected_date.strftime("%Y-%m-%d")
+    )
+
+
+def model_latency(corpus):
+    """Send the corpus to Gemini; returns (median seconds, correct answers)"""
+    app.get_malaysia_time = lambda: app.datetime(
+        TODAY.year, TODAY.month, TODAY.day, 12, tzinfo=app.ZoneInfo("Asia/Kuala_Lumpur")
+    )
+    app.LOCAL_PARSER_MIN_CONFIDENCE = 2
+    app.EXTRACTION_CACHE_SIZE = 0
+    tracker = app.ExpenseTracker()
+    samples, right = [], 0
+    for sample in corpus:
+        result, elapsed = timed(
+            tracker.extract_expense_data, text_content=sample["text"]
+        )
+        samples.append(elapsed)
+        right += "error" not in result and correct(result, sample)
+    return statistics.median(samples), right
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--model-latency-ms", type=float, default=1500.0)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    handled, right, wrong, samples = [], 0, 0, []
+    for sample in corpus:
+        for _ in range(50):
+            (expense_data, confidence), elapsed = timed(
+                parse_expense_text, sample["text"], TODAY
+            )
+            samples.append(elapsed)
+        if expense_data and confidence >= args.threshold:
+            handled.append(sample["text"])
+            if correct(expense_data, sample):
+                right += 1
+            else:
+                wrong += 1
+                print(f"  wrong local answer: {sample['text']!r} -> {expense_data}")
+
+    print_table("parse_expense_text per message", {"local": summarize(samples)})
+    share = len(handled) / len(corpus)
+    print(
+        f"  handled locally: {len(handled)}/{len(corpus)} ({share:.0%}), "
+        f"{right}/{len(handled)} correct; the rest fall back to Gemini"
+    )
+
+    latency = args.model_latency_ms / 1000
+    if os.environ.get("GEMINI_API_KEY"):
+        latency, model_right = model_latency(corpus)
+        print(f"  Gemini: median {latency * 1000:.0f} ms, {model_right} correct")
+    print(
+        f"  model time saved: {len(handled) * latency:.1f}s over the corpus, "
+        f"{share * latency * 1000:.0f} ms per text message on average"
+    )
+    if wrong:
+        sys.exit(f"FAIL: {wrong} wrong local answers")
+
+
+if __name__ == "__main__":
+    main()
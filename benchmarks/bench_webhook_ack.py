@@ -0,0 +1,84 @@
+"""
+Webhook acknowledgement latency: inline processing vs the worker pool
+
+Drives /webhook through Flask's test client with Gemini, Sheets and the
+Telegram replies stubbed out (the extraction stub sleeps to simulate a slow
+model call) and reports how long Telegram waits for the 200, plus the time
+until every update has been processed.
+
+Usage: python benchmarks/bench_webhook_ack.py [--updates N] [--chats N] [--work-ms MS]
+"""
+
+import argparse
+import time
+
+from common import print_table, summarize, timed
+
+import app
+
+
+def install_stubs(work_ms):
+    app.TELEGRAM_BOT_TOKEN = "bench-token"
+    app.send_telegram_message = lambda chat_id, text: {"ok": True}
+    app.send_chat_action = lambda chat_id, action="typing": {"ok": True}
+
+    def extract(self, text_content=None, image_data=None):
+        time.sleep(work_ms / 1000)
+        return {"amount": 5, "category": "food", "description": text_content}
+
+    app.ExpenseTracker.extract_expense_data = extract
+    app.ExpenseTracker.log_to_sheets = lambda self, expense_data: True
+
+
+def post_updates(client, updates, chats, first_id=0):
+    samples = []
+    for update_id in range(first_id, first_id + updates):
+        update = {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "chat": {"id": 1000 + update_id % chats},
+                "text": f"Coffee ${update_id % 9 + 1}",
+            },
+        }
+        response, elapsed = timed(client.post, "/webhook", json=update)
+        assert response.status_code == 200, response.get_json()
+        samples.append(elapsed)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=40)
+    parser.add_argument("--chats", type=int, default=8)
+    parser.add_argument("--work-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    install_stubs(args.work_ms)
+    client = app.app.test_client()
+
+    results = {}
+    for index, mode in enumerate(("inline", "thread")):
+        app.UPDATE_MODE = mode
+        start = time.perf_counter()
+        # Fresh update_ids per mode so the dedup store does not drop them
+        samples = post_updates(
+            client, args.updates, args.chats, first_id=index * args.updates
+        )
+        if mode == "thread":
+            app.get_update_queue().wait_idle()
+        drained = time.perf_counter() - start
+        results[mode] = summarize(samples)
+        results[mode]["drained_s"] = drained
+
+    print_table(
+        f"Webhook ack latency ({args.updates} updates, {args.chats} chats, "
+        f"{args.work_ms:.0f} ms per update, {app.UPDATE_WORKERS} workers)",
+        results,
+    )
+    for mode, stats in results.items():
+        print(f"  {mode}: all updates processed after {stats['drained_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
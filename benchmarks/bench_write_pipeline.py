@@ -0,0 +1,83 @@
+"""
+Burst of concurrent log_expense calls: API calls and latency per message
+
+Simulates a Telegram album or a burst of messages handled by concurrent
+threads against a fake Sheets service with network latency, and checks that
+the coalesced writes leave Monthly_Totals identical to a full recalculation.
+
+Usage: python benchmarks/bench_write_pipeline.py [--burst N] [--latency-ms MS]
+"""
+
+import argparse
+import threading
+
+from common import seeded_sheets, summarize, timed
+
+import sheets_integration
+
+
+def run_burst(manager, month, burst):
+    samples = [None] * burst
+    results = [None] * burst
+
+    def worker(index):
+        expense = {
+            "amount": 10 + index,
+            "category": ("food", "transport", "shopping")[index % 3],
+            "description": f"Burst {index}",
+            "merchant": "Bench",
+            "date": f"{month}-15",
+        }
+        results[index], samples[index] = timed(manager.log_expense, expense)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(burst)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results), "some writes failed"
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--window-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    print(f"{args.burst} concurrent expenses, {args.latency_ms:.0f} ms per Sheets call")
+    print(f"  {'mode':<22}{'calls':>6}{'flushes':>9}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, incremental, window_ms in (
+        ("rescan (per message)", False, 0.0),
+        ("pipeline", True, 0.0),
+        (f"pipeline +{args.window_ms:.0f}ms window", True, args.window_ms),
+    ):
+        sheets_integration.SHEETS_WRITE_WINDOW_MS = window_ms
+        service, manager = seeded_sheets(
+            args.rows, latency_ms=args.latency_ms, incremental_totals=incremental
+        )
+        month = service.grids["Expenses"][-1][5]
+        manager._get_sheet_ids()
+        service.reset_counters()
+
+        stats = summarize(run_burst(manager, month, args.burst))
+        calls = service.counters()["calls"]
+        print(
+            f"  {label:<22}{calls:>6}{manager._write_pipeline.flushes:>9}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+        )
+
+        logged = manager.get_monthly_total(month)
+        manager.recalculate_all_monthly_totals()
+        repaired = manager.get_monthly_total(month)
+        assert all(
+            abs(logged[key] - repaired[key]) < 0.01
+            for key in repaired
+            if key != "month"
+        ), f"{label}: totals drifted: {logged} != {repaired}"
+
+
+if __name__ == "__main__":
+    main()
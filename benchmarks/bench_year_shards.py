@@ -0,0 +1,142 @@
+"""
+Expenses split into yearly sheets: current-month cost as history grows
+
+For 1, 3 and 5 years of history (the same number of expenses per year) a
+single Expenses sheet is migrated into Expenses_YYYY sheets with
+migrate_to_year_sheets. Reports the Sheets calls and bytes received of one
+log_expense in the current month with the full-month rescan
+(incremental_totals=False), which reads every expense of the month's
+sheet, and with the default incremental update, for the single sheet and
+for year sheets. Then recalculates from the year sheets and checks that
+Monthly_Totals and Daily_Totals come out the same to the cent.
+
+Before measuring, logs one live expense into a year sheet (as happens once
+EXPENSES_BY_YEAR is on and the bot keeps running) and checks that /migrate
+still copies every historical row of that year and nothing twice.
+
+Exits non-zero if the migration loses rows, the totals differ, or the
+year-sheet rescan grows with the number of years.
+
+Usage: python benchmarks/bench_year_shards.py [--rows-per-year N] [--years 1,3,5]
+"""
+
+import argparse
+import sys
+
+from common import same_totals, seeded_sheets
+
+from sheets_integration import SheetsManager
+
+EXPENSE = {
+    "amount": 12.5,
+    "category": "food",
+    "description": "Lunch",
+    "merchant": "McDonald's",
+}
+
+
+def log_cost(service, manager, day):
+    service.reset_counters()
+    ok = manager.log_expense(dict(EXPENSE, date=day))
+    assert ok, "log_expense failed"
+    return service.calls, service.bytes_received
+
+
+def check_live_row():
+    """A year sheet holding a live expense must not hide that year's history"""
+    service, _ = seeded_sheets(2000)
+    expenses = service.grids["Expenses"][1:]
+    last_day = expenses[-1][0]
+    per_year = {}
+    for row in expenses:
+        title = f"Expenses_{row[5][:4]}"
+        per_year[title] = per_year.get(title, 0) + 1
+
+    sharded = SheetsManager(
+        service=service, spreadsheet_id="bench", expenses_by_year=True
+    )
+    assert sharded.log_expense(dict(EXPENSE, date=last_day)), "log_expense failed"
+    failures = []
+    copied = sharded.migrate_to_year_sheets()
+    if copied != per_year:
+        failures.append(f"live row: migrated {copied}, expected {per_year}")
+    if sharded.migrate_to_year_sheets() != {}:
+        failures.append("live row: a second migration copied rows again")
+    for title, count in per_year.items():
+        held = len(service.grids[title]) - 1
+        live = 1 if title == f"Expenses_{last_day[:4]}" else 0
+        if held != count + live:
+            failures.append(f"live row: {title} holds {held} rows, not {count + live}")
+    return failures
+
+
+def run(rows_per_year, years):
+    per_day = -(-rows_per_year // 365)
+    service, single = seeded_sheets(
+        rows_per_year * years, per_day=per_day, incremental_totals=False
+    )
+    expenses = service.grids["Expenses"]
+    last_day = expenses[-1][0]
+    totals_before = {
+        sheet: [list(map(str, row)) for row in service.grids[sheet]]
+        for sheet in ("Monthly_Totals", "Daily_Totals")
+    }
+
+    sharded = SheetsManager(
+        service=service,
+        spreadsheet_id="bench",
+        incremental_totals=False,
+        expenses_by_year=True,
+    )
+    copied = sharded.migrate_to_year_sheets()
+    failures = []
+    if copied is None or sum(copied.values()) != len(expenses) - 1:
+        failures.append(f"{years} years: migrated {copied} of {len(expenses) - 1}")
+    if sharded.migrate_to_year_sheets() != {}:
+        failures.append(f"{years} years: a second migration copied rows again")
+
+    if not sharded.recalculate_all_monthly_totals():
+        failures.append(f"{years} years: recalculation from year sheets failed")
+    for sheet, before in totals_before.items():
+        after = [list(map(str, row)) for row in service.grids[sheet]]
+        if not same_totals(after, before):
+            failures.append(f"{years} years: {sheet} differs after migration")
+
+    costs = {
+        "single rescan": log_cost(service, single, last_day),
+        "year rescan": log_cost(service, sharded, last_day),
+    }
+    single.incremental_totals = sharded.incremental_totals = True
+    costs["single incremental"] = log_cost(service, single, last_day)
+    costs["year incremental"] = log_cost(service, sharded, last_day)
+    return len(copied or {}), costs, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows-per-year", type=int, default=20000)
+    parser.add_argument("--years", default="1,3,5")
+    args = parser.parse_args()
+
+    print(f"One log_expense in the current month, {args.rows_per_year} rows per year")
+    print(f"  {'years':>5} {'sheets':>6}  {'variant':<20}{'calls':>6}{'recv KB':>10}")
+    failures, year_rescans = check_live_row(), []
+    for years in map(int, args.years.split(",")):
+        sheets, costs, run_failures = run(args.rows_per_year, years)
+        failures += run_failures
+        for variant, (calls, received) in costs.items():
+            print(
+                f"  {years:>5} {sheets:>6}  {variant:<20}{calls:>6}"
+                f"{received / 1024:>10.1f}"
+            )
+        year_rescans.append(costs["year rescan"][1])
+
+    if max(year_rescans) > 1.5 * min(year_rescans):
+        failures.append("year-sheet rescan grows with the number of years")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("OK: migration is lossless and current-month cost is flat with year sheets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Shared helpers for the offline benchmarks"""
+
+import json
+import os
+import statistics
+import sys
+import time
+
+# Make the app modules importable when running `python benchmarks/<name>.py`
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def make_service_account_json():
+    """Build a throwaway service account JSON with a freshly generated key"""
+    import rsa
+
+    _, private_key = rsa.newkeys(2048)
+    return json.dumps(
+        {
+            "type": "service_account",
+            "project_id": "bench-project",
+            "private_key_id": "bench",
+            "private_key": private_key.save_pkcs1().decode(),
+            "client_email": "bench@bench-project.iam.gserviceaccount.com",
+            "client_id": "1",
+            "token_uri": "https://oauth2.googleapis.com/token",
+        }
+    )
+
+
+def timed(func, *args, **kwargs):
+    """Run func and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def summarize(samples):
+    """Return p50/p95/mean in milliseconds for a list of second samples"""
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[p95_index] * 1000,
+    }
+
+
+def print_table(title, rows):
+    """Print {label: summary} rows as an aligned table"""
+    print(title)
+    print(f"  {'':<12}{'n':>6}{'mean ms':>12}{'p50 ms':>12}{'p95 ms':>12}")
+    for label, stats in rows.items():
+        print(
+            f"  {label:<12}{stats['n']:>6}{stats['mean_ms']:>12.3f}"
+            f"{stats['p50_ms']:>12.3f}{stats['p95_ms']:>12.3f}"
+        )
+
+
+EXPENSE_HEADER = ["Date", "Amount", "Category", "Description", "Merchant", "Month"]
+MERCHANTS = [
+    ("McDonald's", "food", "Lunch"),
+    ("Starbucks", "food", "Coffee"),
+    ("Grab", "transport", "Ride"),
+    ("Shell", "transport", "Fuel"),
+    ("TNB", "utilities", "Electricity bill"),
+    ("Unifi", "utilities", "Internet"),
+    ("Uniqlo", "shopping", "Clothes"),
+    ("Shopee", "shopping", "Online order"),
+    ("GSC", "entertainment", "Movie"),
+    ("Guardian", "healthcare", "Pharmacy"),
+    ("Misc", "other", "Stuff"),
+]
+
+
+def synthetic_expenses(count, start="2023-01-01", per_day=5, seed=0):
+    """Generate deterministic Expenses rows (without header)"""
+    import random
+    from datetime import date, timedelta
+
+    rng = random.Random(seed)
+    day = date.fromisoformat(start)
+    rows = []
+    for index in range(count):
+        if index and index % per_day == 0:
+            day += timedelta(days=1)
+        merchant, category, description = MERCHANTS[rng.randrange(len(MERCHANTS))]
+        rows.append(
+            [
+                day.isoformat(),
+                round(rng.uniform(1, 200), 2),
+                category,
+                description,
+                merchant,
+                day.strftime("%Y-%m"),
+            ]
+        )
+    return rows
+
+
+def seeded_sheets(expense_count, latency_ms=0.0, per_day=5, **kwargs):
+    """FakeSheetsService with a synthetic Expenses sheet and matching totals"""
+    from fake_sheets import FakeSheetsService
+    from sheets_integration import SheetsManager
+
+    service = FakeSheetsService(latency_ms=latency_ms)
+    service.load(
+        "Expenses",
+        [EXPENSE_HEADER] + synthetic_expenses(expense_count, per_day=per_day),
+    )
+    manager = SheetsManager(service=service, spreadsheet_id="bench", **kwargs)
+    manager._setup_headers()
+    manager.recalculate_all_monthly_totals()
+    service.reset_counters()
+    return service, manager
+
+
+def same_totals(a, b):
+    """
+    True if two totals sheets hold the same keys and amounts to the cent
+    Streamed recalculation adds page subtotals, so sums may differ from a
+    single pass in the last float digit.
+    """
+    if len(a) != len(b):
+        return False
+    for row_a, row_b in zip(a, b):
+        if len(row_a) != len(row_b) or row_a[:1] != row_b[:1]:
+            return False
+        for x, y in zip(row_a[1:], row_b[1:]):
+            try:
+                if abs(float(x or 0) - float(y or 0)) >= 0.005:
+                    return False
+            except ValueError:
+                if x != y:
+                    return False
+    return True
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak-RSS counter for this process (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_kb():
+    """Peak resident set size in kB since the last reset_peak_rss()"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
@@ -0,0 +1,165 @@
+"""
+Local stand-in for a google.generativeai GenerativeModel
+
+Answers generate_content after a configurable latency, with or without
+stream=True, and attaches usage_metadata estimated like Gemini does (about
+four characters per token, 258 tokens per image). With a JSON
+response_mime_type the reply is a compact object following the schema's
+properties; otherwise it imitates free-text replies, some of which wrap the
+JSON in fences or prose. Batched requests ("Expense 1:", "Expense 2:", ...)
+get a JSON array with one reply per item. Counts calls and tokens.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+
+IMAGE_TOKENS = 258
+
+_ITEM_LABEL = re.compile(r"Expense \d+:")
+
+# Shares of free-text replies: bare JSON, ```json fenced, "Here is..." prose,
+# and fenced JSON followed by a remark
+DEFAULT_STYLES = {"plain": 0.55, "fenced": 0.3, "prose": 0.1, "remark": 0.05}
+
+
+def default_reply(contents):
+    return {
+        "amount": 12.5,
+        "category": "food",
+        "description": "Lunch",
+        "date": "2025-06-11",
+        "merchant": "Kedai Makan Ali",
+    }
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class _Response:
+    def __init__(self, text, usage):
+        self._text = text
+        self.usage_metadata = usage
+
+    @property
+    def text(self):
+        if not self._text:
+            raise ValueError("Response has no text parts")
+        return self._text
+
+
+class FakeGeminiModel:
+    def __init__(
+        self,
+        latency_ms=0.0,
+        reply=default_reply,
+        styles=None,
+        chunk_chars=24,
+        ms_per_output_token=0.0,
+        seed=0,
+    ):
+        """
+        expects:
+        - latency_ms: Time to the complete reply (streams spread it over chunks)
+        - reply: Callable(contents) -> expense dictionary
+        - styles: Free-text reply style shares, defaults to DEFAULT_STYLES
+        - chunk_chars: Characters per streamed chunk
+        - ms_per_output_token: Extra decode time per output token
+        """
+        self.latency = latency_ms / 1000
+        self.reply = reply
+        self.styles = styles or DEFAULT_STYLES
+        self.chunk_chars = chunk_chars
+        self.token_time = ms_per_output_token / 1000
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def _prompt_tokens(self, contents):
+        parts = contents if isinstance(contents, list) else [contents]
+        tokens = 0
+        for part in parts:
+            if isinstance(part, str):
+                tokens += len(part) // 4
+            else:
+                tokens += IMAGE_TOKENS
+        return tokens
+
+    def _items(self, contents):
+        parts = contents if isinstance(contents, list) else [contents]
+        return sum(
+            len(_ITEM_LABEL.findall(part)) for part in parts if isinstance(part, str)
+        )
+
+    def _render(self, contents, generation_config):
+        items = self._items(contents)
+        data = self.reply(contents)
+        if items:
+            data = [data] * items
+
+        config = generation_config or {}
+        if config.get("response_mime_type") == "application/json":
+            schema = config.get("response_schema", {})
+            properties = schema.get("items", schema).get("properties")
+            if properties:
+
+                def keep(d):
+                    return {k: v for k, v in d.items() if k in properties}
+
+                data = [keep(d) for d in data] if items else keep(data)
+            return json.dumps(data, separators=(",", ":"))
+
+        with self.lock:
+            style = self.rng.choices(
+                list(self.styles), weights=list(self.styles.values())
+            )[0]
+        body = json.dumps(data, indent=2)
+        if style == "fenced":
+            return f"```json\n{body}\n```"
+        if style == "prose":
+            return f"Here is the extracted expense information:\n\n{body}"
+        if style == "remark":
+            return f"```json\n{body}\n```\nLet me know if anything looks off."
+        return body
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        text = self._render(contents, generation_config)
+        prompt_tokens = self._prompt_tokens(contents)
+        output_tokens = max(1, len(text) // 4)
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+
+        latency = self.latency + output_tokens * self.token_time
+        if not stream:
+            time.sleep(latency)
+            return _Response(text, _Usage(prompt_tokens, output_tokens))
+        return self._stream(text, prompt_tokens, output_tokens, latency)
+
+    def _stream(self, text, prompt_tokens, output_tokens, latency):
+        pieces = [
+            text[i : i + self.chunk_chars]
+            for i in range(0, len(text), self.chunk_chars)
+        ]
+        # Time to first token, then the rest spread evenly; the final chunk
+        # only carries the finish reason
+        steps = len(pieces) + 1
+        time.sleep(latency / 2)
+        sent = 0
+        for piece in pieces:
+            sent += len(piece)
+            yield _Response(piece, _Usage(prompt_tokens, sent // 4))
+            time.sleep(latency / 2 / steps)
+        yield _Response("", _Usage(prompt_tokens, output_tokens))
@@ -0,0 +1,347 @@
+"""
+In-memory stand-in for the Google Sheets v4 `spreadsheets()` resource
+
+Supports the calls SheetsManager makes (get, batchUpdate, values().get,
+batchGet, update, batchUpdate, append, clear) on A1 ranges, and records the
+number of API calls and the JSON bytes sent and received so benchmarks can
+assert budgets. An optional per-call latency simulates the network.
+
+It can also enforce read and write quotas like Google's per-minute ones:
+a call beyond the quota within any window of `period` seconds raises an
+HttpError-like 429, and `error_rate` answers that share of calls with 503.
+Rejected calls are counted in `rejected` and change nothing.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+
+_A1_PART = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def _col_index(letters):
+    index = 0
+    for char in letters:
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index - 1
+
+
+def parse_range(a1):
+    """Split "Sheet!A2:F10" into (sheet, col0, row0, col1, row1), 0-based, None = open"""
+    sheet, _, cells = a1.partition("!")
+    if not cells:
+        return sheet, 0, 0, None, None
+    start, _, end = cells.partition(":")
+    end = end or start
+    start_col, start_row = _A1_PART.match(start).groups()
+    end_col, end_row = _A1_PART.match(end).groups()
+    return (
+        sheet,
+        _col_index(start_col) if start_col else 0,
+        int(start_row) - 1 if start_row else 0,
+        _col_index(end_col) if end_col else None,
+        int(end_row) - 1 if end_row else None,
+    )
+
+
+def _render(value):
+    """Mimic FORMATTED_VALUE rendering: everything comes back as a string"""
+    if isinstance(value, float):
+        return f"{value:.15g}"
+    return str(value)
+
+
+def _cells_to_values(row_data):
+    values = []
+    for cell in row_data.get("values", []):
+        entered = cell.get("userEnteredValue", {})
+        # formulaValue is parsed like typed input; dates read back unchanged
+        for kind in ("numberValue", "formulaValue", "stringValue"):
+            if kind in entered:
+                values.append(entered[kind])
+                break
+        else:
+            values.append("")
+    return values
+
+
+READ_METHODS = ("get", "values.get", "values.batchGet")
+
+
+class _Response(dict):
+    """Headers dict with a .status, like httplib2.Response"""
+
+    def __init__(self, status, headers=None):
+        super().__init__(headers or {})
+        self.status = status
+
+
+class FakeHttpError(Exception):
+    """Stand-in for googleapiclient.errors.HttpError"""
+
+    def __init__(self, status, reason):
+        super().__init__(f"<HttpError {status}: {reason}>")
+        self.resp = _Response(status)
+        self.status_code = status
+
+
+class FakeRequest:
+    def __init__(self, service, name, handler, payload):
+        self._service = service
+        self._name = name
+        self._handler = handler
+        self._payload = payload
+
+    def execute(self, **kwargs):
+        return self._service._execute(self._name, self._handler, self._payload)
+
+
+class FakeSheetsService:
+    """Fake `build("sheets", "v4")` service backed by in-memory grids"""
+
+    def __init__(
+        self,
+        latency_ms=0.0,
+        sheets=("Expenses", "Monthly_Totals", "Daily_Totals"),
+        reads_per_period=0,
+        writes_per_period=0,
+        period=60.0,
+        error_rate=0.0,
+        seed=0,
+    ):
+        """
+        expects:
+        - latency_ms: Simulated network time per call
+        - reads_per_period, writes_per_period: Quotas (0 = unlimited)
+        - period: Quota window in seconds
+        - error_rate: Share of calls answered with 503
+        """
+        self.latency = latency_ms / 1000
+        self.grids = {name: [] for name in sheets}
+        self.lock = threading.Lock()
+        self.quotas = {"read": reads_per_period, "write": writes_per_period}
+        self.period = period
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self._used = {"read": deque(), "write": deque()}
+        self.reset_counters()
+
+    # Counters ---------------------------------------------------------------
+
+    def reset_counters(self):
+        self.calls = 0
+        self.calls_by_method = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rejected = {429: 0, 503: 0}
+
+    def counters(self):
+        return {
+            "calls": self.calls,
+            "by_method": dict(self.calls_by_method),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "rejected": dict(self.rejected),
+        }
+
+    def _check_quota(self, name):
+        """Raise 429 if the call exceeds its quota, or 503 at error_rate"""
+        kind = "read" if name in READ_METHODS else "write"
+        if self.quotas[kind]:
+            now = time.monotonic()
+            used = self._used[kind]
+            while used and used[0] <= now - self.period:
+                used.popleft()
+            if len(used) >= self.quotas[kind]:
+                self.rejected[429] += 1
+                raise FakeHttpError(429, f"Quota exceeded for {kind} requests")
+            used.append(now)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.rejected[503] += 1
+            raise FakeHttpError(503, "The service is currently unavailable")
+
+    def _execute(self, name, handler, payload):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self._check_quota(name)
+            result = handler(**payload)
+            self.calls += 1
+            self.calls_by_method[name] = self.calls_by_method.get(name, 0) + 1
+            self.bytes_sent += len(json.dumps(payload, default=str))
+            self.bytes_received += len(json.dumps(result, default=str))
+        return result
+
+    # Grid helpers -----------------------------------------------------------
+
+    def load(self, sheet, rows):
+        """Replace a sheet's content with rows (list of lists)"""
+        self.grids[sheet] = [list(row) for row in rows]
+
+    def _grid(self, sheet):
+        if sheet not in self.grids:
+            raise KeyError(f"Unable to parse range: {sheet}")
+        return self.grids[sheet]
+
+    def _read(self, a1):
+        sheet, col0, row0, col1, row1 = parse_range(a1)
+        grid = self._grid(sheet)
+        last = len(grid) - 1 if row1 is None else min(row1, len(grid) - 1)
+        rows = []
+        for row in grid[row0 : last + 1]:
+            cells = row[col0 : None if col1 is None else col1 + 1]
+            while cells and cells[-1] in ("", None):
+                cells = cells[:-1]
+            rows.append([_render(cell) for cell in cells])
+        while rows and not rows[-1]:
+            rows.pop()
+        result = {"range": a1, "majorDimension": "ROWS"}
+        if rows:
+            result["values"] = rows
+        return result
+
+    def _write(self, a1, values):
+        sheet, col0, row0, _, _ = parse_range(a1)
+        grid = self._grid(sheet)
+        for offset, row in enumerate(values):
+            index = row0 + offset
+            while len(grid) <= index:
+                grid.append([])
+            target = grid[index]
+            while len(target) < col0 + len(row):
+                target.append("")
+            target[col0 : col0 + len(row)] = row
+        return {"updatedRange": a1, "updatedRows": len(values)}
+
+    def _clear(self, a1):
+        sheet, col0, row0, col1, row1 = parse_range(a1)
+        grid = self._grid(sheet)
+        last = len(grid) - 1 if row1 is None else min(row1, len(grid) - 1)
+        for row in grid[row0 : last + 1]:
+            stop = len(row) if col1 is None else min(col1 + 1, len(row))
+            for col in range(col0, stop):
+                row[col] = ""
+        while grid and not any(cell not in ("", None) for cell in grid[-1]):
+            grid.pop()
+        return {"clearedRange": a1}
+
+    def _append(self, a1, values):
+        sheet, col0, _, _, _ = parse_range(a1)
+        grid = self._grid(sheet)
+        start = len(grid)
+        for row in values:
+            grid.append([""] * col0 + list(row))
+        return {
+            "updates": {
+                "updatedRange": f"{sheet}!A{start + 1}:A{start + len(values)}",
+                "updatedRows": len(values),
+            }
+        }
+
+    # Resource API -----------------------------------------------------------
+
+    def spreadsheets(self):
+        return _Spreadsheets(self)
+
+
+class _Spreadsheets:
+    def __init__(self, service):
+        self._service = service
+
+    def values(self):
+        return _Values(self._service)
+
+    def get(self, spreadsheetId, **kwargs):
+        def handler():
+            return {
+                "spreadsheetId": spreadsheetId,
+                "sheets": [
+                    {"properties": {"sheetId": index, "title": name, "index": index}}
+                    for index, name in enumerate(self._service.grids)
+                ],
+            }
+
+        return FakeRequest(self._service, "get", handler, {})
+
+    def batchUpdate(self, spreadsheetId, body):
+        def handler(body):
+            titles = list(self._service.grids)
+            replies = []
+            for request in body.get("requests", []):
+                if "addSheet" in request:
+                    title = request["addSheet"]["properties"]["title"]
+                    self._service.grids.setdefault(title, [])
+                    titles = list(self._service.grids)
+                elif "appendCells" in request:
+                    append = request["appendCells"]
+                    grid = self._service.grids[titles[append["sheetId"]]]
+                    grid.extend(_cells_to_values(row) for row in append["rows"])
+                elif "updateCells" in request:
+                    update = request["updateCells"]
+                    start = update["start"]
+                    sheet = titles[start["sheetId"]]
+                    values = [_cells_to_values(row) for row in update["rows"]]
+                    col = chr(ord("A") + start.get("columnIndex", 0))
+                    self._service._write(
+                        f"{sheet}!{col}{start.get('rowIndex', 0) + 1}", values
+                    )
+                replies.append({})
+            return {"spreadsheetId": spreadsheetId, "replies": replies}
+
+        return FakeRequest(self._service, "batchUpdate", handler, {"body": body})
+
+
+class _Values:
+    def __init__(self, service):
+        self._service = service
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return FakeRequest(
+            self._service, "values.get", self._service._read, {"a1": range}
+        )
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        def handler(ranges):
+            return {
+                "spreadsheetId": spreadsheetId,
+                "valueRanges": [self._service._read(a1) for a1 in ranges],
+            }
+
+        return FakeRequest(
+            self._service, "values.batchGet", handler, {"ranges": list(ranges)}
+        )
+
+    def update(self, spreadsheetId, range, body, **kwargs):
+        return FakeRequest(
+            self._service,
+            "values.update",
+            self._service._write,
+            {"a1": range, "values": body.get("values", [])},
+        )
+
+    def batchUpdate(self, spreadsheetId, body):
+        def handler(data):
+            responses = [
+                self._service._write(item["range"], item["values"]) for item in data
+            ]
+            return {"spreadsheetId": spreadsheetId, "responses": responses}
+
+        return FakeRequest(
+            self._service, "values.batchUpdate", handler, {"data": body["data"]}
+        )
+
+    def append(self, spreadsheetId, range, body, **kwargs):
+        return FakeRequest(
+            self._service,
+            "values.append",
+            self._service._append,
+            {"a1": range, "values": body.get("values", [])},
+        )
+
+    def clear(self, spreadsheetId, range, **kwargs):
+        return FakeRequest(
+            self._service, "values.clear", self._service._clear, {"a1": range}
+        )
@@ -0,0 +1,139 @@
+"""
+Local stand-in for the Telegram Bot API
+
+Serves /bot<token>/<method> and /file/bot<token>/<path> over HTTP/1.1 with
+keep-alive on a background thread. Records every call and the number of TCP
+connections accepted, and can answer the first N calls with 429 to exercise
+retry handling. Point TelegramClient (or TELEGRAM_API_URL) at `server.url`.
+"""
+
+import json
+import socket
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # Avoid Nagle/delayed-ACK stalls between the header and body writes
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self, status, body, content_type="application/json"):
+        if isinstance(body, dict):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        stub = self.server.stub
+        path = self.path.split("?", 1)[0]
+
+        if path.startswith("/file/"):
+            stub.record("file", body)
+            return self._reply(200, stub.file_content, "application/octet-stream")
+
+        method = path.rsplit("/", 1)[-1]
+        stub.record(method, body)
+
+        if stub.take_rate_limit():
+            return self._reply(
+                429,
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": stub.retry_after},
+                },
+            )
+
+        if stub.latency:
+            stub.sleep()
+
+        if method == "getFile":
+            result = {"file_id": "stub", "file_path": "photos/file_0.jpg"}
+        elif method in ("sendMessage", "sendPhoto"):
+            result = {"message_id": len(stub.calls), "chat": {"id": 1}}
+        else:
+            result = True
+        return self._reply(200, {"ok": True, "result": result})
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class FakeTelegramServer:
+    """Threaded Bot API stub; use as a context manager"""
+
+    def __init__(self, latency_ms=0.0, file_content=b"\xff\xd8stub", certfile=None):
+        self.latency = latency_ms / 1000
+        self.file_content = file_content
+        self.retry_after = 0
+        self.calls = []
+        self._rate_limited = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.stub = self
+        self._server.lock = threading.Lock()
+        self._server.connections = 0
+        scheme = "http"
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile)
+            self._server.socket = context.wrap_socket(
+                self._server.socket, server_side=True
+            )
+            scheme = "https"
+        host, port = self._server.server_address
+        self.url = f"{scheme}://localhost:{port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def connections(self):
+        return self._server.connections
+
+    def rate_limit(self, count, retry_after=0):
+        """Answer the next `count` API calls with 429 retry_after"""
+        self._rate_limited = count
+        self.retry_after = retry_after
+
+    def take_rate_limit(self):
+        with self._lock:
+            if self._rate_limited:
+                self._rate_limited -= 1
+                return True
+        return False
+
+    def record(self, method, body):
+        with self._lock:
+            self.calls.append((method, len(body)))
+
+    def sleep(self):
+        time.sleep(self.latency)
+
+    def reset(self):
+        with self._lock:
+            self.calls = []
+        self._server.connections = 0
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,228 @@
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+from pil_charts import PilBackend
+from sheets_integration import CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# (width inches, height inches, dpi). Telegram stores photos at most 1280 px
+# on the longer side, so anything larger is only extra upload.
+CHART_PROFILES = {
+    "large": (10, 8, 150),
+    "telegram": (8, 6.4, 160),
+    "small": (6, 4.8, 120),
+}
+
+COLORS = [
+    "#FF6B6B",
+    "#4ECDC4",
+    "#45B7D1",
+    "#96CEB4",
+    "#FFEAA7",
+    "#DDA0DD",
+    "#98D8C8",
+]
+
+
+def chart_items(summary):
+    """
+    Non-zero category totals of a monthly summary
+    returns:
+    - List of (category, amount) in CATEGORIES order
+    """
+    items = []
+    for category in CATEGORIES:
+        amount = float(summary.get(category, 0) or 0)
+        if amount > 0:
+            items.append((category, amount))
+    return items
+
+
+def totals_hash(items):
+    """Short hash of the category totals a chart is drawn from"""
+    text = ";".join(f"{category}={amount:.2f}" for category, amount in items)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+class MatplotlibBackend:
+    """Chart backend drawing on explicit matplotlib Figures with an Agg canvas"""
+
+    name = "matplotlib"
+
+    def _figure(self, size):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        figure = Figure(figsize=size[:2])
+        FigureCanvasAgg(figure)
+        return figure
+
+    def _png(self, figure, size):
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format="png", dpi=size[2], bbox_inches="tight")
+        return buffer.getvalue()
+
+    def pie(self, title, items, size, colors, donut=False):
+        figure = self._figure(size)
+        axes = figure.add_subplot()
+        axes.pie(
+            [amount for _, amount in items],
+            labels=[f"{label}\n${amount:.2f}" for label, amount in items],
+            autopct="%1.1f%%",
+            colors=colors,
+            startangle=90,
+            pctdistance=0.78 if donut else 0.6,
+            wedgeprops={"width": 0.45} if donut else None,
+        )
+        axes.set_title(title, fontsize=16, fontweight="bold")
+        axes.axis("equal")
+        return self._png(figure, size)
+
+    def bars(self, title, months, series, size, colors):
+        figure = self._figure(size)
+        axes = figure.add_subplot()
+        bottoms = [0.0] * len(months)
+        for (label, values), color in zip(series, colors):
+            axes.bar(months, values, 0.6, bottom=bottoms, label=label, color=color)
+            bottoms = [bottom + value for bottom, value in zip(bottoms, values)]
+        for index, total in enumerate(bottoms):
+            if total:
+                axes.annotate(f"{total:,.0f}", (index, total), ha="center", va="bottom")
+        axes.set_title(title, fontsize=16, fontweight="bold")
+        axes.spines[["top", "right"]].set_visible(False)
+        axes.legend(loc="upper left", bbox_to_anchor=(1, 1), frameon=False)
+        return self._png(figure, size)
+
+
+# Selectable with CHART_BACKEND; each draws pie(...) and bars(...) to PNG bytes
+CHART_BACKENDS = {"matplotlib": MatplotlibBackend, "pil": PilBackend}
+
+
+class ChartRenderer:
+    """
+    Render expense charts to PNG with a pluggable backend
+
+    The matplotlib backend draws each chart on its own Figure, so no global
+    pyplot state is shared between requests; the PIL backend only needs
+    Pillow. Neither is thread-safe, so rendering is serialized. PNGs are
+    cached by month(s) and a hash of the category totals, and an unchanged
+    chart is returned without drawing.
+    """
+
+    def __init__(
+        self, profile="telegram", cache_size=32, backend="matplotlib", donut=False
+    ):
+        """
+        expects:
+        - profile: Key of CHART_PROFILES or a (width, height, dpi) tuple
+        - cache_size: Number of rendered charts kept
+        - backend: Key of CHART_BACKENDS
+        - donut: Draw monthly charts as donuts instead of pies
+        """
+        if isinstance(profile, str):
+            if profile not in CHART_PROFILES:
+                logger.warning(f"Unknown chart profile {profile}, using telegram")
+                profile = "telegram"
+            profile = CHART_PROFILES[profile]
+        if backend not in CHART_BACKENDS:
+            logger.warning(f"Unknown chart backend {backend}, using matplotlib")
+            backend = "matplotlib"
+        self.size = tuple(profile)
+        self.backend = CHART_BACKENDS[backend]()
+        self.donut = donut
+        self.cache_size = cache_size
+        self.hits = 0
+        self.renders = 0
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._render_lock = threading.Lock()
+
+    def monthly_pie(self, summary):
+        """
+        Pie chart of a month's expenses by category
+        expects:
+        - summary: Monthly summary dictionary with "month" and category totals
+        returns:
+        - PNG bytes, or None if the month has no expenses
+        """
+        items = chart_items(summary)
+        if not items:
+            return None
+
+        month = summary.get("month")
+        return self._render(
+            ("pie", month, totals_hash(items)),
+            self.backend.pie,
+            f"Expenses Breakdown - {month}",
+            [(category.capitalize(), amount) for category, amount in items],
+            self.size,
+            COLORS[: len(items)],
+            donut=self.donut,
+        )
+
+    def monthly_bars(self, summaries):
+        """
+        Stacked bar chart comparing several months
+        expects:
+        - summaries: Monthly summary dictionaries, oldest first
+        returns:
+        - PNG bytes, or None if none of the months has expenses
+        """
+        months = [summary.get("month") for summary in summaries]
+        series = []
+        colors = []
+        for category, color in zip(CATEGORIES, COLORS):
+            values = [float(summary.get(category, 0) or 0) for summary in summaries]
+            if any(values):
+                series.append((category.capitalize(), values))
+                colors.append(color)
+        if not series:
+            return None
+
+        totals = [
+            (f"{summary.get('month')} {category}", amount)
+            for summary in summaries
+            for category, amount in chart_items(summary)
+        ]
+        return self._render(
+            ("bars", tuple(months), totals_hash(totals)),
+            self.backend.bars,
+            f"Expenses by Month - {months[0]} to {months[-1]}",
+            months,
+            series,
+            self.size,
+            colors,
+        )
+
+    def _render(self, key, draw, *args, **kwargs):
+        png = self._cached(key)
+        if png is not None:
+            return png
+
+        with self._render_lock:
+            # Another request may have drawn it while this one waited
+            png = self._cached(key)
+            if png is None:
+                png = draw(*args, **kwargs)
+                self.renders += 1
+                self._store(key, png)
+        return png
+
+    def _cached(self, key):
+        with self._cache_lock:
+            png = self._cache.get(key)
+            if png is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            return png
+
+    def _store(self, key, png):
+        with self._cache_lock:
+            self._cache[key] = png
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
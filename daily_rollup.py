@@ -0,0 +1,93 @@
+import bisect
+import threading
+from datetime import date
+from sheets_integration import CATEGORIES
+
+
+def _ordinal(day):
+    """Day ordinal of a date or "YYYY-MM-DD" string"""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day.toordinal()
+
+
+class DailyRollup:
+    """
+    Per-day category totals with prefix sums over the days
+
+    Holds the Daily_Totals sheet (Date, Total_Amount, one column per
+    category) keyed by day ordinal. The running sums are kept in whole
+    cents, so subtracting two of them is exact, and rebuilt lazily after a
+    change: the total of any date range is two binary searches and one
+    subtraction per column, however long the history is.
+    """
+
+    def __init__(self, rows=()):
+        self._days = {}
+        self._ordinals = []
+        self._prefix = None
+        self._lock = threading.Lock()
+        self.add_rows(rows)
+
+    def __len__(self):
+        return len(self._days)
+
+    def add_rows(self, rows):
+        """
+        Add Daily_Totals rows, or amounts just added to some days; rows
+        without a readable date are skipped and the rows of a day listed
+        twice (appended by two instances at once) add up
+        """
+        width = len(CATEGORIES) + 1
+        for row in rows:
+            try:
+                ordinal = _ordinal(row[0])
+            except (IndexError, TypeError, ValueError):
+                continue
+            amounts = [float(value) if value else 0.0 for value in row[1 : width + 1]]
+            amounts += [0.0] * (width - len(amounts))
+
+            with self._lock:
+                current = self._days.get(ordinal)
+                if current is not None:
+                    amounts = [a + b for a, b in zip(current, amounts)]
+                self._days[ordinal] = amounts
+                self._prefix = None
+
+    @property
+    def first_day(self):
+        with self._lock:
+            return date.fromordinal(min(self._days)) if self._days else None
+
+    @property
+    def last_day(self):
+        with self._lock:
+            return date.fromordinal(max(self._days)) if self._days else None
+
+    def _build(self):
+        self._ordinals = sorted(self._days)
+        running = [0] * (len(CATEGORIES) + 1)
+        self._prefix = [running]
+        for ordinal in self._ordinals:
+            cents = [round(amount * 100) for amount in self._days[ordinal]]
+            running = [a + b for a, b in zip(running, cents)]
+            self._prefix.append(running)
+
+    def totals(self, start, end):
+        """
+        Sum of the days from start to end, both included
+        expects:
+        - start, end: dates or "YYYY-MM-DD" strings
+        returns:
+        - [total, one amount per CATEGORIES]
+        """
+        start, end = _ordinal(start), _ordinal(end)
+        with self._lock:
+            if self._prefix is None:
+                self._build()
+            first = bisect.bisect_left(self._ordinals, start)
+            last = bisect.bisect_right(self._ordinals, end)
+            if last <= first:
+                return [0.0] * (len(CATEGORIES) + 1)
+            before, through = self._prefix[first], self._prefix[last]
+        return [(b - a) / 100 for a, b in zip(before, through)]
@@ -0,0 +1,116 @@
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# How many inserts between trims of the SQLite table
+PRUNE_EVERY = 256
+
+
+class DedupStore:
+    """
+    Bounded record of processed Telegram updates
+
+    An in-memory LRU answers most checks; the optional SQLite file keeps the
+    record across warm Lambda restarts. Both hold at most `capacity` keys.
+    """
+
+    def __init__(self, capacity=10000, path=None):
+        """
+        expects:
+        - capacity: Maximum number of keys remembered
+        - path: Optional SQLite file backing the in-memory LRU
+        """
+        self.capacity = capacity
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()
+        self._conn = None
+        self._inserts = 0
+
+        if path:
+            try:
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                # Losing the last few keys on a crash only risks a re-run
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY)"
+                )
+                self._conn.commit()
+            except Exception as e:
+                logger.error(f"Failed to open dedup store, using memory only: {e}")
+                self._conn = None
+
+    def check_and_add(self, keys):
+        """
+        Record keys as processed
+        expects:
+        - keys: Keys identifying one update
+        returns:
+        - True if any key had already been recorded (a duplicate)
+        """
+        with self._lock:
+            duplicate = False
+            for key in keys:
+                if key in self._recent:
+                    self._recent.move_to_end(key)
+                    duplicate = True
+                    continue
+
+                self._recent[key] = None
+                if len(self._recent) > self.capacity:
+                    self._recent.popitem(last=False)
+
+                if self._conn and not self._persist(key):
+                    duplicate = True
+
+            if duplicate:
+                self.duplicates += 1
+            return duplicate
+
+    def discard(self, keys):
+        """Forget keys, e.g. when an update was refused and will be redelivered"""
+        with self._lock:
+            for key in keys:
+                self._recent.pop(key, None)
+                if self._conn:
+                    try:
+                        with self._conn:
+                            self._conn.execute("DELETE FROM seen WHERE key = ?", (key,))
+                    except Exception as e:
+                        logger.error(f"Error removing dedup key: {e}")
+
+    def _persist(self, key):
+        """Insert a key into SQLite; returns False if it was already there"""
+        try:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO seen (key) VALUES (?)", (key,)
+                )
+                self._inserts += 1
+                if self._inserts % PRUNE_EVERY == 0:
+                    self._conn.execute(
+                        "DELETE FROM seen WHERE rowid <= "
+                        "(SELECT MAX(rowid) FROM seen) - ?",
+                        (self.capacity,),
+                    )
+            return bool(cursor.rowcount)
+        except Exception as e:
+            logger.error(f"Error writing dedup key: {e}")
+            return True
+
+
+def update_keys(data):
+    """Dedup keys for an update: its update_id and the chat's message_id"""
+    keys = []
+    if data.get("update_id") is not None:
+        keys.append(f"u:{data['update_id']}")
+
+    message = data.get("message", {})
+    chat_id = message.get("chat", {}).get("id")
+    if chat_id is not None and message.get("message_id") is not None:
+        keys.append(f"m:{chat_id}:{message['message_id']}")
+    return keys
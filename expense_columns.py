@@ -0,0 +1,266 @@
+import logging
+from array import array
+from datetime import date
+from sheets_integration import CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# Columns group_by can group on
+GROUP_KEYS = ("month", "day", "category", "merchant")
+
+_OTHER = CATEGORIES.index("other")
+
+_numpy = None
+
+
+def _np():
+    """NumPy if installed (it comes with matplotlib), otherwise False"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+def summary_from_totals(month_str, totals):
+    """
+    Monthly summary dictionary as returned by get_monthly_total
+    expects:
+    - totals: [total, one amount per CATEGORIES], or None for an empty month
+    """
+    totals = totals or [0] * (len(CATEGORIES) + 1)
+    summary = {"month": month_str, "total": totals[0]}
+    summary.update(zip(CATEGORIES, totals[1:]))
+    return summary
+
+
+def merge_totals(totals, added):
+    """
+    Add one totals_by result into running totals, in place
+    expects:
+    - totals, added: Dictionaries of key -> [total, one amount per CATEGORIES]
+    returns:
+    - totals
+    """
+    for key, amounts in added.items():
+        current = totals.get(key)
+        if current is None:
+            totals[key] = list(amounts)
+        else:
+            for i, amount in enumerate(amounts):
+                current[i] += amount
+    return totals
+
+
+class ExpenseColumns:
+    """
+    Expenses rows held as typed columns
+
+    Amounts are doubles, dates day ordinals (0 if unparseable), and months,
+    categories and merchants small integer codes into interned name lists,
+    so each sheet string is parsed once per distinct value. Group-bys run as
+    vectorized bincount passes when NumPy is installed and as one loop over
+    the columns otherwise.
+    """
+
+    def __init__(self, rows=()):
+        self.amounts = array("d")
+        self.days = array("i")
+        self.months = array("i")
+        self.categories = array("b")
+        self.merchants = array("i")
+        self.month_names = []
+        self.merchant_names = []
+        self.skipped = 0
+        self._month_codes = {}
+        self._merchant_codes = {}
+        # Blank categories count as "other", like unknown ones
+        self._category_codes = {category: i for i, category in enumerate(CATEGORIES)}
+        self._category_codes[""] = self._category_codes[None] = _OTHER
+        self._day_codes = {}
+        self.add_rows(rows)
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def _codes(self, codes, names, values):
+        """Intern values, returning their codes"""
+        for value in set(values).difference(codes):
+            codes[value] = len(names)
+            names.append(value)
+        return map(codes.__getitem__, values)
+
+    def _amounts(self, rows):
+        """Amounts of rows, dropping the rows whose amount is unreadable"""
+        try:
+            return rows, [float(row[1]) if row[1] else 0.0 for row in rows]
+        except (TypeError, ValueError):
+            pass
+
+        kept, amounts = [], []
+        for row in rows:
+            try:
+                amounts.append(float(row[1]) if row[1] else 0.0)
+            except (TypeError, ValueError):
+                continue
+            kept.append(row)
+
+        skipped = len(rows) - len(kept)
+        self.skipped += skipped
+        logger.warning(f"Skipped {skipped} Expenses rows with bad amounts")
+        return kept, amounts
+
+    def add_rows(self, rows):
+        """
+        Append Expenses rows (Date, Amount, Category, Description, Merchant,
+        Month); rows without a month or with an unreadable amount are skipped
+        Each column is filled in one pass, parsing every distinct date and
+        category once.
+        """
+        rows, amounts = self._amounts([row for row in rows if len(row) >= 6 and row[5]])
+        self.amounts.extend(amounts)
+
+        dates = [row[0] for row in rows]
+        for value in set(dates).difference(self._day_codes):
+            try:
+                self._day_codes[value] = date.fromisoformat(value).toordinal()
+            except (TypeError, ValueError):
+                self._day_codes[value] = 0
+        self.days.extend(map(self._day_codes.__getitem__, dates))
+
+        categories = [row[2] for row in rows]
+        for value in set(categories).difference(self._category_codes):
+            self._category_codes[value] = self._category_codes.get(
+                str(value).lower(), _OTHER
+            )
+        self.categories.extend(map(self._category_codes.__getitem__, categories))
+
+        months = [row[5] for row in rows]
+        self.months.extend(self._codes(self._month_codes, self.month_names, months))
+        merchants = [row[4] or "" for row in rows]
+        self.merchants.extend(
+            self._codes(self._merchant_codes, self.merchant_names, merchants)
+        )
+
+    def _key_column(self, key):
+        """
+        (codes, number of codes, code -> label, offset) for a group key;
+        offset is set for day ordinals, whose code 0 marks an unknown date
+        """
+        if key == "month":
+            return (
+                self.months,
+                len(self.month_names),
+                self.month_names.__getitem__,
+                None,
+            )
+        if key == "category":
+            return self.categories, len(CATEGORIES), CATEGORIES.__getitem__, None
+        if key == "merchant":
+            names = self.merchant_names
+            return self.merchants, len(names), names.__getitem__, None
+        if key == "day":
+            known = [day for day in self._day_codes.values() if day]
+            first = min(known, default=1)
+            last = max(known, default=1)
+
+            def label(code):
+                return date.fromordinal(first + code).isoformat()
+
+            return self.days, last - first + 1, label, first
+        raise ValueError(f"Unknown group key {key}, expected one of {GROUP_KEYS}")
+
+    def group_by(self, keys, agg="sum"):
+        """
+        Aggregate amounts per group
+        expects:
+        - keys: One of GROUP_KEYS, or a tuple of them
+        - agg: "sum", "count" or "mean"
+        returns:
+        - Dictionary of label (or tuple of labels) -> value for non-empty
+          groups; rows with an unparseable date are left out of "day" groups
+        """
+        single = isinstance(keys, str)
+        keys = (keys,) if single else tuple(keys)
+        if agg not in ("sum", "count", "mean"):
+            raise ValueError(f"Unknown aggregation {agg}")
+
+        columns = [self._key_column(key) for key in keys]
+        sums, counts = self._bincount(columns) if _np() else self._loop(columns)
+
+        result = {}
+        for index, count in counts.items():
+            # Split the combined index back into one code per key
+            labels = []
+            remainder = index
+            for _, size, label, _ in reversed(columns):
+                remainder, code = divmod(remainder, size)
+                labels.append(label(code))
+            labels.reverse()
+
+            key = labels[0] if single else tuple(labels)
+            if agg == "sum":
+                result[key] = sums[index]
+            elif agg == "count":
+                result[key] = count
+            else:
+                result[key] = sums[index] / count
+        return result
+
+    def _bincount(self, columns):
+        """Sums and counts per combined group index with NumPy"""
+        np = _np()
+        amounts = np.frombuffer(self.amounts, dtype=np.float64)
+        combined = np.zeros(len(amounts), dtype=np.int64)
+        keep = None
+        for codes, size, _, offset in columns:
+            values = np.frombuffer(codes, dtype=codes.typecode).astype(np.int64)
+            if offset is not None:
+                known = values > 0
+                keep = known if keep is None else keep & known
+                values -= offset
+            combined = combined * size + values
+
+        if keep is not None:
+            combined, amounts = combined[keep], amounts[keep]
+        counts = np.bincount(combined)
+        sums = np.bincount(combined, weights=amounts)
+        groups = np.flatnonzero(counts).tolist()
+        return (
+            dict(zip(groups, sums[groups].tolist())),
+            dict(zip(groups, counts[groups].tolist())),
+        )
+
+    def _loop(self, columns):
+        """Sums and counts per combined group index in one pass without NumPy"""
+        sums, counts = {}, {}
+        for row, amount in enumerate(self.amounts):
+            index = 0
+            for codes, size, _, offset in columns:
+                code = codes[row]
+                if offset is not None:
+                    if not code:
+                        break
+                    code -= offset
+                index = index * size + code
+            else:
+                sums[index] = sums.get(index, 0.0) + amount
+                counts[index] = counts.get(index, 0) + 1
+        return sums, counts
+
+    def totals_by(self, key="month"):
+        """
+        Key -> [total, one amount per CATEGORIES], the layout of Monthly_Totals
+        (key "month") and Daily_Totals (key "day")
+        """
+        totals = {
+            label: [total] + [0] * len(CATEGORIES)
+            for label, total in self.group_by(key).items()
+        }
+        for (label, category), amount in self.group_by((key, "category")).items():
+            totals[label][CATEGORIES.index(category) + 1] = amount
+        return totals
@@ -0,0 +1,116 @@
+import json
+import logging
+from sheets_integration import CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+
+def expense_schema(include_category=True):
+    """
+    Response schema for Gemini's structured-output mode
+    expects:
+    - include_category: Ask the model for a category (an enum of CATEGORIES)
+    returns:
+    - OpenAPI-style schema dictionary accepted as response_schema
+    """
+    properties = {
+        "amount": {"type": "number"},
+        "category": {"type": "string", "format": "enum", "enum": CATEGORIES},
+        "description": {"type": "string"},
+        "date": {"type": "string", "description": "YYYY-MM-DD"},
+        "merchant": {"type": "string"},
+        "error": {"type": "string", "nullable": True},
+    }
+    required = ["amount", "category", "description", "date", "merchant"]
+    if not include_category:
+        del properties["category"]
+        required.remove("category")
+    return {"type": "object", "properties": properties, "required": required}
+
+
+def expense_batch_schema():
+    """Response schema for a JSON array with one expense per input"""
+    return {"type": "array", "items": expense_schema()}
+
+
+class JsonObjectReader:
+    """
+    Find the first complete top-level JSON object (or array) in text fed in
+    pieces
+
+    Tracks bracket depth outside of strings, so the value is returned as soon
+    as its closing bracket arrives, and code fences or prose around it are
+    ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._scanned = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk):
+        """
+        Add streamed text
+        returns:
+        - The parsed object once it is complete, otherwise None
+        raises:
+        - ValueError if the balanced braces do not hold valid JSON
+        """
+        self.text += chunk
+        for index in range(self._scanned, len(self.text)):
+            char = self.text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"' and self._start is not None:
+                self._in_string = True
+            elif char in "{[":
+                if self._start is None:
+                    self._start = index
+                self._depth += 1
+            elif char in "}]" and self._start is not None:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._scanned = index + 1
+                    return json.loads(self.text[self._start : index + 1])
+        self._scanned = len(self.text)
+        return None
+
+
+def parse_expense_json(text):
+    """Parse the first JSON object or array in a model reply, or raise ValueError"""
+    result = JsonObjectReader().feed(text or "")
+    if result is None:
+        raise ValueError("No complete JSON object in response")
+    return result
+
+
+def read_streamed_json(chunks):
+    """
+    Read a streamed Gemini response until the first JSON value is complete
+    expects:
+    - chunks: Iterable of response chunks with a .text attribute
+    returns:
+    - (parsed object or None, last chunk read); the rest of the stream is
+      not consumed, so the last chunk's usage_metadata may be short of the
+      final counts
+    """
+    reader = JsonObjectReader()
+    chunk = None
+    for chunk in chunks:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (finish reason, safety ratings)
+            continue
+        result = reader.feed(text)
+        if result is not None:
+            return result, chunk
+    return None, chunk
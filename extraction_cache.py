@@ -0,0 +1,190 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger(__name__)
+
+CacheKey = namedtuple("CacheKey", ["key", "current_date"])
+
+
+def normalize_text(text):
+    """Lowercase and collapse whitespace so trivial variations share a key"""
+    return " ".join((text or "").lower().split())
+
+
+class ExtractionCache:
+    """
+    Bounded LRU/TTL cache of Gemini extraction results
+
+    Texts are keyed by their normalized form plus the current date, since
+    relative dates ("yesterday") and the default date depend on it. Images are
+    keyed by a SHA-256 of their bytes only: receipts with the same layout look
+    alike to a perceptual hash even when their totals differ, so a
+    re-compressed copy is extracted again rather than risk another receipt's
+    amount. An image result is only reused on another day if its date did not
+    come from the current date. An optional SQLite file keeps entries across
+    restarts.
+    """
+
+    def __init__(self, capacity=1000, ttl=86400, path=None):
+        """
+        expects:
+        - capacity: Maximum number of cached results
+        - ttl: Seconds a result stays valid
+        - path: Optional SQLite file for an on-disk copy of the cache
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.model_seconds = 0.0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._conn = None
+        self._inserts = 0
+
+        if path:
+            try:
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                # Older files also kept perceptual hashes for near matches
+                self._conn.execute("DROP TABLE IF EXISTS extractions")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS extraction_results ("
+                    "key TEXT PRIMARY KEY, result TEXT, cached_date TEXT, "
+                    "expires REAL)"
+                )
+                self._conn.commit()
+            except Exception as e:
+                logger.error(f"Failed to open extraction cache, using memory only: {e}")
+                self._conn = None
+
+    def key_for(self, current_date, text_content=None, image_data=None):
+        """Build the cache key for an extraction request"""
+        if image_data:
+            digest = hashlib.sha256(image_data).hexdigest()
+            return CacheKey(f"image:{digest}", current_date)
+
+        normalized = normalize_text(text_content)
+        digest = hashlib.sha256(f"{current_date}|{normalized}".encode()).hexdigest()
+        return CacheKey(f"text:{digest}", current_date)
+
+    def get(self, cache_key):
+        """Return a copy of the cached result, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(cache_key.key)
+            if entry is None and self._conn:
+                entry = self._load(cache_key.key)
+
+            if entry is not None and not self._usable(entry, cache_key, now):
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(entry["key"])
+            self.hits += 1
+            return dict(entry["result"])
+
+    def put(self, cache_key, result, elapsed=0.0):
+        """
+        Cache a successful extraction
+        expects:
+        - cache_key: Key from key_for
+        - result: Extracted expense data (errors are not cached)
+        - elapsed: Seconds the model call took, for the savings estimate
+        """
+        self.model_seconds += elapsed
+        if not isinstance(result, dict) or "error" in result:
+            return
+
+        entry = {
+            "key": cache_key.key,
+            "result": dict(result),
+            "cached_date": cache_key.current_date,
+            "expires": time.time() + self.ttl,
+        }
+        with self._lock:
+            self._remember(entry)
+            if self._conn:
+                self._save(entry)
+
+    def stats(self):
+        """Hit/miss counters and the estimated model time saved"""
+        calls = self.misses or 1
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "saved_seconds": self.hits * self.model_seconds / calls,
+        }
+
+    def _usable(self, entry, cache_key, now):
+        if entry["expires"] < now:
+            self._entries.pop(entry["key"], None)
+            return False
+        # A date the model defaulted to "today" is wrong on another day
+        if (
+            entry["key"].startswith("image:")
+            and entry["cached_date"] != cache_key.current_date
+            and entry["result"].get("date") == entry["cached_date"]
+        ):
+            return False
+        return True
+
+    def _remember(self, entry):
+        self._entries[entry["key"]] = entry
+        self._entries.move_to_end(entry["key"])
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def _load(self, key):
+        try:
+            row = self._conn.execute(
+                "SELECT result, cached_date, expires FROM extraction_results "
+                "WHERE key = ?",
+                (key,),
+            ).fetchone()
+        except Exception as e:
+            logger.error(f"Error reading extraction cache: {e}")
+            return None
+        if not row:
+            return None
+
+        entry = {
+            "key": key,
+            "result": json.loads(row[0]),
+            "cached_date": row[1],
+            "expires": row[2],
+        }
+        self._remember(entry)
+        return entry
+
+    def _save(self, entry):
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO extraction_results VALUES (?, ?, ?, ?)",
+                    (
+                        entry["key"],
+                        json.dumps(entry["result"]),
+                        entry["cached_date"],
+                        entry["expires"],
+                    ),
+                )
+                self._inserts += 1
+                if self._inserts % 256 == 0:
+                    self._conn.execute(
+                        "DELETE FROM extraction_results WHERE expires < ? OR "
+                        "rowid <= (SELECT MAX(rowid) FROM extraction_results) - ?",
+                        (time.time(), self.capacity),
+                    )
+        except Exception as e:
+            logger.error(f"Error writing extraction cache: {e}")
@@ -0,0 +1,165 @@
+import re
+import threading
+from collections import Counter
+
+# Company suffixes and filler dropped when normalizing merchant names
+_MERCHANT_NOISE = {"sdn", "bhd", "berhad", "plc", "inc", "ltd", "llc", "co", "the"}
+
+# Description words too common to say anything about the category
+_STOPWORDS = {
+    "and",
+    "for",
+    "from",
+    "the",
+    "with",
+    "bill",
+    "payment",
+    "paid",
+    "purchase",
+    "order",
+    "item",
+    "items",
+    "stuff",
+    "misc",
+    "expense",
+    "today",
+    "yesterday",
+}
+
+_WORD = re.compile(r"[a-z0-9&']+")
+
+# Longest merchant name, in words, matched inside a message
+MAX_MERCHANT_WORDS = 4
+
+
+def _normalize_words(text):
+    return [w.strip("'") for w in _WORD.findall((text or "").lower()) if w.strip("'")]
+
+
+def normalize_merchant(name):
+    """Lowercase a merchant name and drop company suffixes and branch numbers"""
+    return " ".join(
+        w
+        for w in _normalize_words(name)
+        if w not in _MERCHANT_NOISE and not w.isdigit()
+    )
+
+
+def description_tokens(text):
+    """Distinct description words worth indexing"""
+    return {
+        w
+        for w in _normalize_words(text)
+        if len(w) >= 3 and w not in _STOPWORDS and not w.replace(".", "").isdigit()
+    }
+
+
+def _count(table, key, category):
+    counts = table.get(key)
+    if counts is None:
+        counts = table[key] = Counter()
+    counts[category] += 1
+
+
+class HistoryIndex:
+    """
+    In-memory index of past categorization decisions
+
+    Maps normalized merchant names and description words of the Expenses sheet
+    to category counts, so a message naming a known merchant can be
+    categorized without asking the model.
+    """
+
+    def __init__(self, min_count=2, min_share=0.8):
+        """
+        expects:
+        - min_count: Expenses needed before a merchant or word is trusted
+        - min_share: Share of them that must agree on one category
+        """
+        self.min_count = min_count
+        self.min_share = min_share
+        self.rows = 0
+        self._merchants = {}
+        self._merchant_names = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def add_rows(self, rows):
+        """
+        Index Expenses rows
+        expects:
+        - rows: Rows of Date, Amount, Category, Description, Merchant, Month
+        """
+        # Sheets repeat the same merchants and descriptions; normalize each once
+        keys = {}
+        tokens = {}
+        with self._lock:
+            for row in rows:
+                if len(row) < 3 or not row[2]:
+                    continue
+                category = str(row[2]).lower()
+                description = row[3] if len(row) > 3 else ""
+                merchant = row[4] if len(row) > 4 else ""
+
+                key = keys.get(merchant)
+                if key is None:
+                    key = keys[merchant] = normalize_merchant(merchant)
+                if key:
+                    _count(self._merchants, key, category)
+                    self._merchant_names[key] = merchant
+
+                row_tokens = tokens.get((description, key))
+                if row_tokens is None:
+                    row_tokens = description_tokens(description) | set(key.split())
+                    tokens[(description, key)] = row_tokens
+                for token in row_tokens:
+                    _count(self._tokens, token, category)
+                self.rows += 1
+
+    def lookup(self, text, min_count=None, min_share=None):
+        """
+        Categorize a message from past expenses
+        expects:
+        - text: Message text (or merchant name)
+        - min_count / min_share: Optional overrides of the trust thresholds
+        returns:
+        - Dictionary with category, merchant ("" for word matches), count,
+          share and the matched words, or None if history is not conclusive
+        """
+        min_count = self.min_count if min_count is None else min_count
+        min_share = self.min_share if min_share is None else min_share
+        words = _normalize_words(text)
+
+        with self._lock:
+            # Known merchant names, longest first
+            for size in range(min(MAX_MERCHANT_WORDS, len(words)), 0, -1):
+                for start in range(len(words) - size + 1):
+                    key = " ".join(words[start : start + size])
+                    counts = self._merchants.get(key)
+                    if counts:
+                        match = self._decide(counts, min_count, min_share)
+                        if match:
+                            match["merchant"] = self._merchant_names[key]
+                            match["words"] = set(words[start : start + size])
+                            return match
+
+            # Otherwise the single best-supported description word; summing
+            # words would count one past expense several times
+            best = None
+            for token in description_tokens(text):
+                match = self._decide(self._tokens.get(token), min_count, min_share)
+                if match and (best is None or match["count"] > best["count"]):
+                    best = match
+                    best["merchant"] = ""
+                    best["words"] = {token}
+            return best
+
+    @staticmethod
+    def _decide(counts, min_count, min_share):
+        if not counts:
+            return None
+        category, count = counts.most_common(1)[0]
+        share = count / sum(counts.values())
+        if count < min_count or share < min_share:
+            return None
+        return {"category": category, "count": count, "share": share}
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from sheets_integration import CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    sheet_row INTEGER PRIMARY KEY,
+    date TEXT,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT,
+    merchant TEXT,
+    month TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS expenses_month ON expenses (month);
+CREATE TABLE IF NOT EXISTS monthly_totals (
+    month TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (month, category)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def row_check(row):
+    """
+    Fingerprint of an Expenses row, kept with the sync cursor
+    Amounts are compared as numbers, so a row mirrored as written (12.5)
+    matches the same row read back from the sheet ("12.5", "12.50").
+    """
+    cells = [str(cell).strip() for cell in row[:6]]
+    try:
+        cells[1] = f"{float(cells[1]):.2f}"
+    except (IndexError, ValueError):
+        pass
+    digest = hashlib.sha256("\x1f".join(cells).encode()).digest()
+    return int.from_bytes(digest[:7], "big")
+
+
+class LedgerMirror:
+    """Local SQLite copy of the Expenses sheet with per-month category totals"""
+
+    def __init__(self, path):
+        """
+        Open (or create) the mirror database
+        expects:
+        - path: SQLite file path, e.g. on /tmp or a persistent volume
+        """
+        self.path = path
+        self.synced_at = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @property
+    def last_row(self):
+        """Sheet row number of the last mirrored Expenses row (1 = header only)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sync_state WHERE key = 'last_row'"
+            ).fetchone()
+        return row[0] if row else 1
+
+    def last_row_matches(self, row):
+        """
+        True if `row`, read from the sheet at last_row, is the row mirrored there
+        A mismatch means rows above the cursor were deleted or the last one
+        edited by hand, so rows past the cursor are no longer the new ones.
+        """
+        with self._lock:
+            stored = self._conn.execute(
+                "SELECT value FROM sync_state WHERE key = 'last_row_check'"
+            ).fetchone()
+        return stored is not None and stored[0] == row_check(row)
+
+    def is_stale(self, max_age):
+        """True if the mirror has not caught up with the sheet within max_age seconds"""
+        return time.monotonic() - self.synced_at > max_age
+
+    def mark_synced(self):
+        self.synced_at = time.monotonic()
+
+    def mark_stale(self):
+        self.synced_at = 0.0
+
+    def add_rows(self, start_row, rows):
+        """
+        Mirror consecutive Expenses rows and advance the sync cursor
+        The cursor keeps a row_check of the row it points at.
+        expects:
+        - start_row: Sheet row number of the first row
+        - rows: Lists of [date, amount, category, description, merchant, month]
+        returns:
+        - Number of expense rows added
+        """
+        added = 0
+        with self._lock, self._conn:
+            for offset, row in enumerate(rows):
+                if len(row) < 6 or not row[5]:
+                    continue
+
+                try:
+                    amount = float(row[1]) if row[1] else 0
+                except (TypeError, ValueError):
+                    logger.warning(f"Skipping Expenses row {start_row + offset}")
+                    continue
+
+                category = str(row[2]).lower() if row[2] else "other"
+                if category not in CATEGORIES:
+                    category = "other"
+
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO expenses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        start_row + offset,
+                        row[0],
+                        amount,
+                        category,
+                        row[3],
+                        row[4],
+                        row[5],
+                    ),
+                )
+                if cursor.rowcount:
+                    self._add_to_totals(row[5], category, amount)
+                    added += 1
+
+            end_row = start_row + len(rows) - 1
+            cursor = self._conn.execute(
+                "SELECT value FROM sync_state WHERE key = 'last_row'"
+            ).fetchone()
+            if rows and (cursor is None or end_row >= cursor[0]):
+                self._conn.executemany(
+                    "INSERT INTO sync_state VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                    [("last_row", end_row), ("last_row_check", row_check(rows[-1]))],
+                )
+        return added
+
+    def _add_to_totals(self, month, category, amount):
+        for key in ("total", category):
+            self._conn.execute(
+                "INSERT INTO monthly_totals VALUES (?, ?, ?) "
+                "ON CONFLICT (month, category) "
+                "DO UPDATE SET amount = amount + excluded.amount",
+                (month, key, amount),
+            )
+
+    def monthly_total(self, month_str):
+        """Get the totals for a month in the same shape as SheetsManager.get_monthly_total"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT category, amount FROM monthly_totals WHERE month = ?",
+                (month_str,),
+            ).fetchall()
+
+        totals = {"month": month_str, "total": 0}
+        totals.update({category: 0 for category in CATEGORIES})
+        totals.update(dict(rows))
+        return totals
+
+    def expense_rows(self):
+        """Mirrored Expenses rows in sheet order and column layout"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, amount, category, description, merchant, month "
+                "FROM expenses ORDER BY sheet_row"
+            ).fetchall()
+        return [list(row) for row in rows]
+
+    def reset(self):
+        """Forget everything so the next sync rebuilds the mirror from row 2"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM expenses")
+            self._conn.execute("DELETE FROM monthly_totals")
+            self._conn.execute("DELETE FROM sync_state")
+        self.mark_stale()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,175 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Time the webhook pipeline stages and Sheets API calls, served at /metrics
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() == "true"
+
+# Also log every span as a JSON line (only while METRICS_ENABLED)
+METRICS_LOG_SPANS = os.environ.get("METRICS_LOG_SPANS", "false").lower() == "true"
+
+# Upper bounds of the span histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+PREFIX = "fintracker"
+
+# Counters kept here; the app passes the ones its components already keep
+COUNTERS = {
+    "sheets_reads_coalesced_total": "Sheets reads served from the update's memo",
+    "updates_duplicate_total": "Telegram redeliveries dropped by the dedup store",
+    "sheets_retries_total": "Sheets calls retried after 429 or 5xx",
+    "sheets_reads_collapsed_total": "Sheets reads that joined an identical one",
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+# span -> [count per bucket, then +Inf], seconds sum, errors
+_histograms = {}
+_counters = {}
+
+
+class _NoSpan:
+    """Shared do-nothing span handed out while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+
+def span(name):
+    """
+    Context manager timing a block into the `name` histogram
+    While metrics are disabled it is one shared object whose enter and exit
+    do nothing.
+    """
+    if not METRICS_ENABLED:
+        return _NO_SPAN
+    return _Span(name)
+
+
+@contextlib.contextmanager
+def _bind(context):
+    previous = getattr(_local, "context", None)
+    _local.context = context
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+
+def update_context(update_id, chat_id):
+    """Tag the spans logged on this thread inside the block with the update"""
+    if not (METRICS_ENABLED and METRICS_LOG_SPANS):
+        return _NO_SPAN
+    return _bind({"update_id": update_id, "chat_id": chat_id})
+
+
+def observe(name, seconds, error=False):
+    """Record one span: add it to its histogram and log it if enabled"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        buckets = histogram[0]
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            index = len(BUCKETS)
+        buckets[index] += 1
+        histogram[1] += seconds
+        histogram[2] += error
+
+    if METRICS_LOG_SPANS:
+        line = {"span": name, "ms": round(seconds * 1000, 3)}
+        line.update(getattr(_local, "context", None) or {})
+        if error:
+            line["error"] = True
+        logger.info(json.dumps(line))
+
+
+def add(name, value=1):
+    """Increase one of COUNTERS"""
+    if METRICS_ENABLED and value:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def reset():
+    """Forget every recorded span and counter"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def render(counters=()):
+    """
+    Spans and counters in the Prometheus text exposition format
+    expects:
+    - counters: (name, help, value) of counters kept elsewhere, e.g. the
+      Gemini token counts of ExpenseTracker.model_stats
+    returns:
+    - The page served at /metrics
+    """
+    with _lock:
+        histograms = {
+            name: (list(buckets), total, errors)
+            for name, (buckets, total, errors) in sorted(_histograms.items())
+        }
+        own = dict(_counters)
+
+    lines = [
+        f"# HELP {PREFIX}_span_seconds Time spent in a pipeline stage or Sheets call",
+        f"# TYPE {PREFIX}_span_seconds histogram",
+    ]
+    for name, (buckets, total, _) in histograms.items():
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), buckets):
+            cumulative += count
+            lines.append(
+                f'{PREFIX}_span_seconds_bucket{{span="{name}",le="{bound}"}} '
+                f"{cumulative}"
+            )
+        lines.append(f'{PREFIX}_span_seconds_sum{{span="{name}"}} {total:.6f}')
+        lines.append(f'{PREFIX}_span_seconds_count{{span="{name}"}} {cumulative}')
+
+    lines += [
+        f"# HELP {PREFIX}_span_errors_total Spans that ended with an exception",
+        f"# TYPE {PREFIX}_span_errors_total counter",
+    ]
+    for name, (_, _, errors) in histograms.items():
+        lines.append(f'{PREFIX}_span_errors_total{{span="{name}"}} {errors}')
+
+    kept_here = [(name, help, own.get(name, 0)) for name, help in COUNTERS.items()]
+    for name, help, value in kept_here + list(counters):
+        lines += [
+            f"# HELP {PREFIX}_{name} {help}",
+            f"# TYPE {PREFIX}_{name} counter",
+            f"{PREFIX}_{name} {value}",
+        ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,242 @@
+import io
+import math
+
+# Charts are drawn this many times larger and downsampled, since ImageDraw
+# does not antialias shapes
+SUPERSAMPLE = 2
+
+BACKGROUND = "white"
+TEXT = "#222222"
+GRID = "#DDDDDD"
+
+
+def _font(size, bold=False):
+    """DejaVu Sans where installed, otherwise Pillow's built-in font"""
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype(
+            "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf", size
+        )
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            return ImageFont.load_default()
+
+
+def _money(amount):
+    return f"${amount:,.2f}"
+
+
+class PilBackend:
+    """
+    Chart backend drawing with PIL.ImageDraw only
+
+    Pillow is already loaded for receipts, so this avoids importing
+    matplotlib (tens of MB and most of a cold start) for a few shapes and
+    labels.
+    """
+
+    name = "pil"
+
+    def _canvas(self, size):
+        from PIL import Image, ImageDraw
+
+        width, height, dpi = size
+        scale = dpi / 100 * SUPERSAMPLE
+        pixels = (round(width * dpi * SUPERSAMPLE), round(height * dpi * SUPERSAMPLE))
+        image = Image.new("RGB", pixels, BACKGROUND)
+        return image, ImageDraw.Draw(image), scale
+
+    def _png(self, image):
+        from PIL import Image
+
+        # Box-filter downsample, then a 256-colour palette: charts are flat
+        # colours, so the PNG encodes faster and comes out smaller
+        image = image.reduce(SUPERSAMPLE).quantize(
+            256, method=Image.Quantize.FASTOCTREE
+        )
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def _title(self, draw, image, title, scale):
+        font = _font(round(22 * scale), bold=True)
+        left, top, right, bottom = draw.textbbox((0, 0), title, font=font)
+        draw.text(
+            ((image.width - (right - left)) / 2, 18 * scale),
+            title,
+            fill=TEXT,
+            font=font,
+        )
+        return 18 * scale + (bottom - top) + 24 * scale
+
+    def _legend(self, draw, x, y, entries, scale):
+        """Colour swatches with labels from (x, y) downwards"""
+        font = _font(round(15 * scale))
+        swatch = 16 * scale
+        for color, label in entries:
+            draw.rectangle([x, y, x + swatch, y + swatch], fill=color)
+            draw.text(
+                (x + swatch + 10 * scale, y + swatch / 2),
+                label,
+                fill=TEXT,
+                font=font,
+                anchor="lm",
+            )
+            y += swatch + 14 * scale
+
+    def pie(self, title, items, size, colors, donut=False):
+        """
+        Pie (or donut) chart with a legend
+        expects:
+        - title: Chart title
+        - items: List of (label, amount) with positive amounts
+        - size: (width inches, height inches, dpi)
+        - colors: Slice colours, one per item
+        - donut: Leave a hole in the middle
+        returns:
+        - PNG bytes
+        """
+        image, draw, scale = self._canvas(size)
+        top = self._title(draw, image, title, scale)
+
+        total = sum(amount for _, amount in items)
+        margin = 20 * scale
+        legend_width = image.width * 0.36
+        diameter = min(
+            image.width - legend_width - 2 * margin, image.height - top - margin
+        )
+        cx = margin + (image.width - legend_width - 2 * margin) / 2
+        cy = top + (image.height - top - margin) / 2
+        radius = diameter / 2
+        box = [cx - radius, cy - radius, cx + radius, cy + radius]
+
+        # Counter-clockwise from twelve o'clock like the matplotlib chart;
+        # ImageDraw angles run clockwise from three o'clock
+        font = _font(round(15 * scale), bold=True)
+        angle = 90.0
+        label_radius = radius * (0.78 if donut else 0.62)
+        for (label, amount), color in zip(items, colors):
+            sweep = 360 * amount / total
+            draw.pieslice(
+                box,
+                -(angle + sweep),
+                -angle,
+                fill=color,
+                outline=BACKGROUND,
+                width=round(2 * scale),
+            )
+            share = amount / total
+            if share >= 0.04:
+                middle = math.radians(angle + sweep / 2)
+                draw.text(
+                    (
+                        cx + label_radius * math.cos(middle),
+                        cy - label_radius * math.sin(middle),
+                    ),
+                    f"{share * 100:.1f}%",
+                    fill=TEXT,
+                    font=font,
+                    anchor="mm",
+                )
+            angle += sweep
+
+        if donut:
+            hole = radius * 0.55
+            draw.ellipse([cx - hole, cy - hole, cx + hole, cy + hole], fill=BACKGROUND)
+            draw.text(
+                (cx, cy),
+                _money(total),
+                fill=TEXT,
+                font=_font(round(20 * scale), bold=True),
+                anchor="mm",
+            )
+
+        entries = [
+            (color, f"{label}  {_money(amount)}")
+            for (label, amount), color in zip(items, colors)
+        ]
+        legend_height = len(entries) * 30 * scale
+        self._legend(
+            draw, image.width - legend_width, cy - legend_height / 2, entries, scale
+        )
+        return self._png(image)
+
+    def bars(self, title, months, series, size, colors):
+        """
+        Stacked bar chart of category totals per month
+        expects:
+        - title: Chart title
+        - months: Month labels along the x axis
+        - series: List of (label, [amount per month])
+        - size: (width inches, height inches, dpi)
+        - colors: One colour per series
+        returns:
+        - PNG bytes
+        """
+        image, draw, scale = self._canvas(size)
+        top = self._title(draw, image, title, scale)
+
+        font = _font(round(13 * scale))
+        totals = [sum(values[i] for _, values in series) for i in range(len(months))]
+        peak = _nice_ceiling(max(totals) or 1)
+
+        legend_width = image.width * 0.24
+        left = 80 * scale
+        right = image.width - legend_width
+        bottom = image.height - 50 * scale
+        plot_top = top + 20 * scale
+        height = bottom - plot_top
+
+        for step in range(5):
+            value = peak * step / 4
+            y = bottom - height * step / 4
+            draw.line([left, y, right, y], fill=GRID, width=round(scale))
+            draw.text(
+                (left - 8 * scale, y),
+                f"{value:,.0f}",
+                fill=TEXT,
+                font=font,
+                anchor="rm",
+            )
+
+        slot = (right - left) / max(len(months), 1)
+        bar_width = slot * 0.6
+        for index, month in enumerate(months):
+            x = left + slot * index + (slot - bar_width) / 2
+            y = bottom
+            for (_, values), color in zip(series, colors):
+                bar = height * values[index] / peak
+                if bar > 0:
+                    draw.rectangle([x, y - bar, x + bar_width, y], fill=color)
+                y -= bar
+            if totals[index]:
+                draw.text(
+                    (x + bar_width / 2, y - 4 * scale),
+                    f"{totals[index]:,.0f}",
+                    fill=TEXT,
+                    font=font,
+                    anchor="md",
+                )
+            draw.text(
+                (x + bar_width / 2, bottom + 8 * scale),
+                month,
+                fill=TEXT,
+                font=font,
+                anchor="mt",
+            )
+
+        entries = [(color, label) for (label, _), color in zip(series, colors)]
+        self._legend(draw, right + 24 * scale, plot_top, entries, scale)
+        return self._png(image)
+
+
+def _nice_ceiling(value):
+    """Round an axis maximum up to 1, 2, 2.5, 4, 5 or 8 times a power of ten"""
+    power = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 2.5, 4, 5, 8, 10):
+        if value <= step * power:
+            return step * power
+    return 10 * power
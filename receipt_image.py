@@ -0,0 +1,114 @@
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Modes that can be written as JPEG without conversion
+JPEG_MODES = ("RGB", "L")
+
+
+def choose_photo_size(photo_sizes, target):
+    """
+    Pick the smallest Telegram PhotoSize whose longer side reaches the target
+    expects:
+    - photo_sizes: The message's "photo" list of PhotoSize dictionaries
+    - target: Desired longer side in pixels
+    returns:
+    - The chosen PhotoSize, or the largest one if none reaches the target
+    """
+    ranked = sorted(
+        photo_sizes, key=lambda size: max(size.get("width", 0), size.get("height", 0))
+    )
+    for size in ranked:
+        if max(size.get("width", 0), size.get("height", 0)) >= target:
+            return size
+    return ranked[-1]
+
+
+def _autocrop(image, threshold=40, margin=0.02):
+    """Trim a uniform border (e.g. the table around a receipt), keeping a margin"""
+    from PIL import Image, ImageChops
+
+    gray = image.convert("L")
+    width, height = gray.size
+    corners = [
+        gray.getpixel((0, 0)),
+        gray.getpixel((width - 1, 0)),
+        gray.getpixel((0, height - 1)),
+        gray.getpixel((width - 1, height - 1)),
+    ]
+    background = sorted(corners)[1]
+
+    # Only crop when the corners agree on a background colour
+    if max(corners) - min(corners) > threshold:
+        return image
+
+    diff = ImageChops.difference(gray, Image.new("L", gray.size, background))
+    bbox = diff.point(lambda value: 255 if value > threshold else 0).getbbox()
+    if not bbox:
+        return image
+
+    left, top, right, bottom = bbox
+    pad_x, pad_y = int(width * margin), int(height * margin)
+    bbox = (
+        max(0, left - pad_x),
+        max(0, top - pad_y),
+        min(width, right + pad_x),
+        min(height, bottom + pad_y),
+    )
+    cropped_area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+    if cropped_area > 0.9 * width * height:
+        return image
+    return image.crop(bbox)
+
+
+def prepare_receipt_image(
+    data,
+    max_side=1280,
+    grayscale=False,
+    autocrop=False,
+    passthrough_bytes=300_000,
+    quality=85,
+):
+    """
+    Turn a downloaded photo or image document into JPEG bytes for the model
+    expects:
+    - data: Raw bytes of the downloaded image
+    - max_side: Longest side in pixels after downscaling
+    - grayscale: Convert to grayscale (receipts rarely need colour)
+    - autocrop: Trim a uniform background around the receipt
+    - passthrough_bytes: Small JPEGs up to this size are sent as they are,
+      without grayscale or autocrop
+    - quality: JPEG quality of re-encoded images
+    returns:
+    - JPEG bytes
+    """
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+
+    # Image.open only reads the header, so small JPEGs are never decoded
+    if (
+        image.format == "JPEG"
+        and image.mode in JPEG_MODES
+        and max(image.size) <= max_side
+        and len(data) <= passthrough_bytes
+    ):
+        return data
+
+    if image.format == "JPEG":
+        # Let the JPEG decoder scale down by 1/2, 1/4 or 1/8 while decoding
+        image.draft("L" if grayscale else "RGB", (max_side, max_side))
+
+    if image.mode not in JPEG_MODES:
+        image = image.convert("RGB")
+    if grayscale and image.mode != "L":
+        image = image.convert("L")
+
+    image.thumbnail((max_side, max_side))
+    if autocrop:
+        image = _autocrop(image)
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
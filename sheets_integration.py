@@ -1,40 +1,283 @@
+import hashlib
 import json
 import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
 import logging
+from write_pipeline import WritePipeline
+from sheets_scope import CoalescingSheets, background_calls, bind_scope
+from sheets_quota import QuotaScheduler
 
 logger = logging.getLogger(__name__)
 
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+# Category columns of Monthly_Totals, in sheet order after Month and Total_Amount
+CATEGORIES = [
+    "food",
+    "transport",
+    "utilities",
+    "shopping",
+    "entertainment",
+    "healthcare",
+    "other",
+]
+
+# Columns of the Expenses sheet (or of each Expenses_YYYY sheet)
+EXPENSE_HEADERS = ["Date", "Amount", "Category", "Description", "Merchant", "Month"]
+
+# Log expenses to one Expenses_YYYY sheet per year instead of one Expenses
+# sheet, so reads of recent months stay the same size as history grows
+EXPENSES_BY_YEAR = os.environ.get("EXPENSES_BY_YEAR", "false").lower() == "true"
+
+# Sheets of per-month and per-day totals: Month or Date, Total_Amount and
+# one column per category
+TOTALS_SHEETS = ("Monthly_Totals", "Daily_Totals")
+
+# Seconds the local ledger mirror may serve reads before catching up with Sheets
+LEDGER_SYNC_SECONDS = float(os.environ.get("LEDGER_SYNC_SECONDS", "60"))
+
+# Milliseconds a write waits for other expenses to share its batchUpdate
+SHEETS_WRITE_WINDOW_MS = float(os.environ.get("SHEETS_WRITE_WINDOW_MS", "0"))
+
+# Seconds the cached daily rollup may answer date-range reports before
+# Daily_Totals is read again (other instances may have logged expenses)
+ROLLUP_SYNC_SECONDS = float(os.environ.get("ROLLUP_SYNC_SECONDS", "60"))
+
+# Expenses rows fetched per read when recalculating all monthly totals, and
+# pages read concurrently
+RECALC_PAGE_ROWS = int(os.environ.get("RECALC_PAGE_ROWS", "5000"))
+RECALC_PARALLEL_READS = int(os.environ.get("RECALC_PARALLEL_READS", "4"))
+
+# Google's default per-user Sheets quotas; calls are paced to stay within
+# them (0 turns pacing off), and calls still rejected with 429 are retried
+SHEETS_READS_PER_MINUTE = int(os.environ.get("SHEETS_READS_PER_MINUTE", "60"))
+SHEETS_WRITES_PER_MINUTE = int(os.environ.get("SHEETS_WRITES_PER_MINUTE", "60"))
+SHEETS_MAX_RETRIES = int(os.environ.get("SHEETS_MAX_RETRIES", "5"))
+
+_UPDATED_ROW = re.compile(r"![A-Z]+(\d+)")
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")
+_YEAR_SHEET = re.compile(r"^Expenses_(\d{4})$")
+
+# Process-wide state shared across webhook invocations
+_discovery_document = None
+_shared_manager = None
+_shared_manager_key = None
+_shared_manager_lock = threading.Lock()
+
 
 def get_malaysia_time():
     return datetime.now(ZoneInfo("Asia/Kuala_Lumpur"))
 
 
+def _get_discovery_document():
+    """Parse the bundled Sheets v4 discovery document once per process"""
+    global _discovery_document
+    if _discovery_document is None:
+        from googleapiclient.discovery_cache import get_static_doc
+
+        doc = get_static_doc("sheets", "v4")
+        if doc:
+            _discovery_document = json.loads(doc)
+    return _discovery_document
+
+
+def _row_data(values):
+    """
+    Convert a list of Python values to a batchUpdate RowData
+    Dates and months ("2025-06-09", "2025-06") go in as formulaValue, which
+    Sheets parses like USER_ENTERED input, so they become date cells like
+    the ones values.append writes instead of text.
+    """
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append({"userEnteredValue": {"numberValue": value}})
+        elif isinstance(value, str) and _ISO_DATE.match(value):
+            cells.append({"userEnteredValue": {"formulaValue": value}})
+        else:
+            text = "" if value is None else str(value)
+            cells.append({"userEnteredValue": {"stringValue": text}})
+    return {"values": cells}
+
+
+def _typed_row(row):
+    """Expenses row as read from Sheets, with the amount as a number again"""
+    try:
+        amount = float(row[1]) if row[1] else 0
+    except ValueError:
+        return list(row)
+    return [row[0], amount] + list(row[2:])
+
+
+def _row_key(row):
+    """Expenses row as a comparable tuple, with the amount to the cent"""
+    row = _typed_row(row)
+    amount = row[1]
+    if isinstance(amount, float):
+        amount = f"{amount:.2f}"
+    return (row[0], amount, *row[2:6])
+
+
+def _config_key(credentials_json, spreadsheet_id):
+    """Fingerprint of the Sheets configuration used to detect changes"""
+    digest = hashlib.sha256()
+    digest.update((credentials_json or "").encode())
+    digest.update(b"\0")
+    digest.update((spreadsheet_id or "").encode())
+    return digest.hexdigest()
+
+
+def get_sheets_manager(credentials_json=None, spreadsheet_id=None):
+    """
+    Get the process-wide SheetsManager
+    expects:
+    - credentials_json: Service account JSON string
+    - spreadsheet_id: Google Sheets document ID
+    returns:
+    - Shared SheetsManager, rebuilt if the credentials or spreadsheet ID changed
+    """
+    global _shared_manager, _shared_manager_key
+
+    key = _config_key(credentials_json, spreadsheet_id)
+    with _shared_manager_lock:
+        if _shared_manager is None or _shared_manager_key != key:
+            _shared_manager = SheetsManager(
+                credentials_json=credentials_json, spreadsheet_id=spreadsheet_id
+            )
+            _shared_manager_key = key
+        return _shared_manager
+
+
+def invalidate_sheets_manager():
+    """Drop the shared SheetsManager so the next call rebuilds it"""
+    global _shared_manager, _shared_manager_key
+    with _shared_manager_lock:
+        _shared_manager = None
+        _shared_manager_key = None
+
+
 class SheetsManager:
     """Class to manage Google Sheets integration for expense tracking"""
 
-    def __init__(self, credentials_json=None, spreadsheet_id=None):
-        """Initialize Google Sheets connection"""
+    def __init__(
+        self,
+        credentials_json=None,
+        spreadsheet_id=None,
+        service=None,
+        incremental_totals=True,
+        ledger_path=None,
+        expenses_by_year=None,
+        scheduler=None,
+    ):
+        """
+        Initialize Google Sheets connection
+        expects:
+        - credentials_json: Optional service account JSON string
+        - spreadsheet_id: Optional Google Sheets document ID
+        - service: Optional prebuilt Sheets API service (skips credential setup)
+        - incremental_totals: Add each new expense to its month's totals row
+          in one batched write instead of rescanning the Expenses sheet
+        - ledger_path: Optional SQLite file for a local mirror of the Expenses
+          sheet that serves monthly totals without calling Sheets
+        - expenses_by_year: Log to Expenses_YYYY sheets (default
+          EXPENSES_BY_YEAR); the ledger mirror only follows a single
+          Expenses sheet and is not used then
+        - scheduler: Optional QuotaScheduler for every API call; by default
+          one is built from SHEETS_*_PER_MINUTE unless a service is given
+        """
         self.spreadsheet_id = spreadsheet_id or os.environ.get("GOOGLE_SHEETS_ID")
+        self.incremental_totals = incremental_totals
+        self.expenses_by_year = (
+            EXPENSES_BY_YEAR if expenses_by_year is None else expenses_by_year
+        )
+        self._sheet_ids = None
+        self._total_rows = {}
+        self._total_rows_end = {}
+        self._history = None
+        self._rollup = None
+        self._rollup_loaded_at = 0.0
+        self._write_pipeline = WritePipeline(
+            self._flush_expense_rows, window=SHEETS_WRITE_WINDOW_MS / 1000
+        )
+
+        self.ledger = None
+        ledger_path = ledger_path or os.environ.get("LEDGER_DB_PATH")
+        if ledger_path and self.expenses_by_year:
+            logger.warning("Ledger mirror is not supported with Expenses_YYYY sheets")
+        elif ledger_path:
+            from ledger_mirror import LedgerMirror
+
+            try:
+                self.ledger = LedgerMirror(ledger_path)
+            except Exception as e:
+                logger.error(f"Failed to open ledger mirror, using Sheets only: {e}")
+
+        self.scheduler = scheduler
+        if service is not None:
+            self.credentials = None
+            self.service = service
+            self.sheet = CoalescingSheets(self.service.spreadsheets(), scheduler)
+            return
+
+        if scheduler is None:
+            self.scheduler = QuotaScheduler(
+                SHEETS_READS_PER_MINUTE,
+                SHEETS_WRITES_PER_MINUTE,
+                max_retries=SHEETS_MAX_RETRIES,
+            )
+
+        # The Google client libraries are only loaded when Sheets is used
+        from google.oauth2.service_account import Credentials
+        from googleapiclient.discovery import build, build_from_document
 
         # Setup credentials
         if credentials_json:
             creds_dict = json.loads(credentials_json)
             self.credentials = Credentials.from_service_account_info(
-                creds_dict, scopes=["https://www.googleapis.com/auth/spreadsheets"]
+                creds_dict, scopes=SCOPES
             )
         else:
             # For local development - use service account file
             self.credentials = Credentials.from_service_account_file(
-                "service_account.json",
-                scopes=["https://www.googleapis.com/auth/spreadsheets"],
+                "service_account.json", scopes=SCOPES
+            )
+
+        # Reuse the parsed discovery document instead of re-reading it per build
+        self._local = threading.local()
+        discovery_document = _get_discovery_document()
+        if discovery_document:
+            self.service = build_from_document(
+                discovery_document,
+                credentials=self.credentials,
+                requestBuilder=self._build_request,
+            )
+        else:
+            self.service = build(
+                "sheets",
+                "v4",
+                credentials=self.credentials,
+                requestBuilder=self._build_request,
             )
+        self.sheet = CoalescingSheets(self.service.spreadsheets(), self.scheduler)
 
-        self.service = build("sheets", "v4", credentials=self.credentials)
-        self.sheet = self.service.spreadsheets()
+    def _build_request(self, http, *args, **kwargs):
+        """Give each thread its own authorized transport (httplib2 is not thread-safe)"""
+        from googleapiclient.http import HttpRequest
+
+        local_http = getattr(self._local, "http", None)
+        if local_http is None:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+
+            local_http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._local.http = local_http
+        return HttpRequest(local_http, *args, **kwargs)
 
     def setup_sheets(self):
         """Create the required sheets if they don't exist"""
@@ -45,20 +288,21 @@ class SheetsManager:
 
             requests = []
 
-            # Create Expenses sheet
-            if "Expenses" not in existing_sheets:
-                requests.append({"addSheet": {"properties": {"title": "Expenses"}}})
+            # Create Expenses sheet (this year's when split by year)
+            expense_sheet = self._expense_sheet(get_malaysia_time().strftime("%Y-%m"))
+            if expense_sheet not in existing_sheets:
+                requests.append({"addSheet": {"properties": {"title": expense_sheet}}})
 
-            # Create Monthly_Totals sheet
-            if "Monthly_Totals" not in existing_sheets:
-                requests.append(
-                    {"addSheet": {"properties": {"title": "Monthly_Totals"}}}
-                )
+            # Create Monthly_Totals and Daily_Totals sheets
+            for title in TOTALS_SHEETS:
+                if title not in existing_sheets:
+                    requests.append({"addSheet": {"properties": {"title": title}}})
 
             if requests:
                 self.sheet.batchUpdate(
                     spreadsheetId=self.spreadsheet_id, body={"requests": requests}
                 ).execute()
+                self._sheet_ids = None
 
             # Setup headers
             self._setup_headers()
@@ -70,15 +314,14 @@ class SheetsManager:
         return True
 
     def _setup_headers(self):
-        """Setup headers for both sheets"""
+        """Setup headers for the expenses and totals sheets"""
         try:
             # Expenses sheet headers
-            expense_headers = [
-                ["Date", "Amount", "Category", "Description", "Merchant", "Month"]
-            ]
+            expense_sheet = self._expense_sheet(get_malaysia_time().strftime("%Y-%m"))
+            expense_headers = [EXPENSE_HEADERS]
             self.sheet.values().update(
                 spreadsheetId=self.spreadsheet_id,
-                range="Expenses!A1:F1",
+                range=f"{expense_sheet}!A1:F1",
                 valueInputOption="RAW",
                 body={"values": expense_headers},
             ).execute()
@@ -104,107 +347,531 @@ class SheetsManager:
                 body={"values": monthly_headers},
             ).execute()
 
+            # Daily totals headers, same columns keyed by date
+            daily_headers = [["Date"] + monthly_headers[0][1:]]
+            self.sheet.values().update(
+                spreadsheetId=self.spreadsheet_id,
+                range="Daily_Totals!A1:I1",
+                valueInputOption="RAW",
+                body={"values": daily_headers},
+            ).execute()
+
         except Exception as e:
             logger.error(f"Error setting up headers: {e}")
 
+    def _expense_sheet(self, month_str):
+        """Sheet that holds the expenses of a "YYYY-MM" month"""
+        if self.expenses_by_year:
+            return f"Expenses_{month_str[:4]}"
+        return "Expenses"
+
+    def _expense_sheets(self, months=None):
+        """
+        Expense sheets to read, oldest first
+        expects:
+        - months: Optional "YYYY-MM" months; only their year sheets are returned
+        """
+        if not self.expenses_by_year:
+            return ["Expenses"]
+        wanted = {self._expense_sheet(m) for m in months} if months else None
+        return sorted(
+            title
+            for title in self._get_sheet_ids()
+            if _YEAR_SHEET.match(title) and (wanted is None or title in wanted)
+        )
+
+    def _rows_by_sheet(self, rows):
+        """Group expense rows by the sheet they belong to"""
+        by_sheet = {}
+        for row in rows:
+            by_sheet.setdefault(self._expense_sheet(row[5]), []).append(row)
+        return dict(sorted(by_sheet.items()))
+
+    def _ensure_expense_sheets(self, titles):
+        """Create missing expense sheets, with headers, before rows are added"""
+        missing = [title for title in titles if title not in self._get_sheet_ids()]
+        if not missing:
+            return
+
+        try:
+            self.sheet.batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={
+                    "requests": [
+                        {"addSheet": {"properties": {"title": title}}}
+                        for title in missing
+                    ]
+                },
+            ).execute()
+        except Exception as e:
+            # Another instance may have added them a moment ago
+            logger.info(f"Could not add {', '.join(missing)}: {e}")
+
+        self._sheet_ids = None
+        sheet_ids = self._get_sheet_ids()
+        if any(title not in sheet_ids for title in missing):
+            raise RuntimeError(f"Could not create {', '.join(missing)}")
+
+        self.sheet.values().batchUpdate(
+            spreadsheetId=self.spreadsheet_id,
+            body={
+                "valueInputOption": "RAW",
+                "data": [
+                    {"range": f"{title}!A1:F1", "values": [EXPENSE_HEADERS]}
+                    for title in missing
+                ],
+            },
+        ).execute()
+        logger.info(f"Created {', '.join(missing)}")
+
+    def _expense_row(self, expense_data):
+        """Build the Expenses row (Date, Amount, Category, Description, Merchant, Month)"""
+        # Use Malaysia timezone for default date
+        date_str = expense_data.get("date", get_malaysia_time().strftime("%Y-%m-%d"))
+        month_str = datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y-%m")
+
+        amount = expense_data.get("amount", 0)
+        return [
+            date_str,
+            float(amount) if amount else 0,
+            expense_data.get("category", "other"),
+            expense_data.get("description", ""),
+            expense_data.get("merchant", ""),
+            month_str,
+        ]
+
     def log_expense(self, expense_data):
         """Log a single expense to the Expenses sheet"""
+        return self.log_expenses([expense_data])[0]
+
+    def log_expenses(self, expenses):
+        """
+        Log several expenses with one Expenses append and totals update
+        expects:
+        - expenses: List of expense data dictionaries
+        returns:
+        - One success flag per expense
+        """
+        results = [False] * len(expenses)
+        rows, positions = [], []
+        for i, expense_data in enumerate(expenses):
+            try:
+                rows.append(self._expense_row(expense_data))
+                positions.append(i)
+            except Exception as e:
+                logger.error(f"Error logging expense: {e}")
+        if not rows:
+            return results
+
         try:
-            # Use Malaysia timezone for default date
-            date_str = expense_data.get(
-                "date", get_malaysia_time().strftime("%Y-%m-%d")
+            # Expense rows and totals go out in one batched write
+            if self.incremental_totals:
+                flags = self._write_pipeline.submit_many(rows)
+            else:
+                # Append to expenses sheet(s)
+                by_sheet = self._rows_by_sheet(rows)
+                self._ensure_expense_sheets(by_sheet)
+                for expense_sheet, sheet_rows in by_sheet.items():
+                    append_result = (
+                        self.sheet.values()
+                        .append(
+                            spreadsheetId=self.spreadsheet_id,
+                            range=f"{expense_sheet}!A:F",
+                            valueInputOption="USER_ENTERED",
+                            body={"values": sheet_rows},
+                        )
+                        .execute()
+                    )
+
+                    if self.ledger:
+                        self._write_through_ledger(append_result, sheet_rows)
+                self._remember_history(rows)
+
+                # Update monthly and daily totals
+                for month_str in sorted({row[5] for row in rows}):
+                    self._update_monthly_totals(month_str)
+                self._update_daily_totals(rows)
+                flags = [True] * len(rows)
+
+        except Exception as e:
+            logger.error(f"Error logging expense: {e}")
+            flags = [False] * len(rows)
+
+        for i, flag in zip(positions, flags):
+            results[i] = flag
+        return results
+
+    def _write_through_ledger(self, append_result, rows):
+        """Mirror freshly appended Expenses rows if they directly follow the cursor"""
+        try:
+            updated_range = append_result.get("updates", {}).get("updatedRange", "")
+            match = _UPDATED_ROW.search(updated_range)
+            if match and int(match.group(1)) == self.ledger.last_row + 1:
+                self.ledger.add_rows(int(match.group(1)), rows)
+            else:
+                # Someone else appended rows; catch up on the next read
+                self.ledger.mark_stale()
+        except Exception as e:
+            logger.error(f"Error writing expense to ledger mirror: {e}")
+            self.ledger.mark_stale()
+
+    def sync_ledger(self):
+        """
+        Fetch only the Expenses rows past the ledger mirror's cursor
+        The read starts one row early, at the cursor's own row. If that row
+        is not the one mirrored there (rows above it were deleted or it was
+        edited in the sheet), the mirror is rebuilt from the whole sheet.
+        """
+        last_row = self.ledger.last_row
+        result = (
+            self.sheet.values()
+            .get(spreadsheetId=self.spreadsheet_id, range=f"Expenses!A{last_row}:F")
+            .execute()
+        )
+
+        values = result.get("values", [])
+        start_row = last_row + 1
+        if last_row > 1 and not (values and self.ledger.last_row_matches(values[0])):
+            logger.info(
+                f"Expenses row {last_row} changed since the ledger mirror "
+                f"synced, rebuilding it"
+            )
+            self.ledger.reset()
+            self._history = None
+            result = (
+                self.sheet.values()
+                .get(spreadsheetId=self.spreadsheet_id, range="Expenses!A2:F")
+                .execute()
+            )
+            values = [None] + result.get("values", [])
+            start_row = 2
+
+        values = values[1:]
+        if values:
+            self.ledger.add_rows(start_row, values)
+        self.ledger.mark_synced()
+        return len(values)
+
+    def get_history_index(self, build=True):
+        """
+        Merchant/description -> category index of the Expenses sheet
+        expects:
+        - build: Build the index if it does not exist yet
+        returns:
+        - HistoryIndex built on first use (from the ledger mirror when there
+          is one, otherwise from one read of the expense sheets) and kept up to date
+          as expenses are logged, or None if not built and build is False
+        """
+        if self._history is None and build:
+            from history_index import HistoryIndex
+
+            if self.ledger:
+                if self.ledger.is_stale(LEDGER_SYNC_SECONDS):
+                    self.sync_ledger()
+                rows = self.ledger.expense_rows()
+            else:
+                result = (
+                    self.sheet.values()
+                    .batchGet(
+                        spreadsheetId=self.spreadsheet_id,
+                        ranges=[f"{title}!A2:F" for title in self._expense_sheets()],
+                    )
+                    .execute()
+                )
+                rows = [
+                    row
+                    for value_range in result.get("valueRanges", [])
+                    for row in value_range.get("values", [])
+                ]
+
+            history = HistoryIndex()
+            history.add_rows(rows)
+            self._history = history
+        return self._history
+
+    def _remember_history(self, rows):
+        """Add freshly written expenses to the history index, if it is built"""
+        if self._history is not None:
+            self._history.add_rows(rows)
+
+    def _get_sheet_ids(self):
+        """Map sheet titles to numeric sheet IDs (cached, needed by batchUpdate)"""
+        if self._sheet_ids is None:
+            result = self.sheet.get(
+                spreadsheetId=self.spreadsheet_id,
+                fields="sheets.properties(sheetId,title)",
+            ).execute()
+            self._sheet_ids = {
+                s["properties"]["title"]: s["properties"]["sheetId"]
+                for s in result["sheets"]
+            }
+        return self._sheet_ids
+
+    def _load_row_index(self, sheets):
+        """Read the key column of totals sheets with one batchGet and index their rows"""
+        result = (
+            self.sheet.values()
+            .batchGet(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=[f"{sheet}!A:A" for sheet in sheets],
+            )
+            .execute()
+        )
+        for sheet, value_range in zip(sheets, result.get("valueRanges", [])):
+            self._index_rows(sheet, value_range.get("values", []))
+
+    def _index_rows(self, sheet, values):
+        """Map each key (month or date) of a totals sheet to its sheet row"""
+        rows = {}
+        for i, row in enumerate(values[1:], 2):
+            if row and row[0] and row[0] not in rows:
+                rows[row[0]] = i
+
+        self._total_rows[sheet] = rows
+        self._total_rows_end[sheet] = max(len(values), 1)
+
+    def _index_appended_rows(self, sheet, keys):
+        """Record keys appended below the last row of a totals sheet"""
+        rows = self._total_rows.get(sheet)
+        if rows is None:
+            return
+        for key in keys:
+            self._total_rows_end[sheet] += 1
+            rows[key] = self._total_rows_end[sheet]
+
+    def _read_month_rows(self, months):
+        """Read only the Monthly_Totals rows of the given months"""
+        return self._read_total_rows({"Monthly_Totals": months})["Monthly_Totals"]
+
+    def _read_total_rows(self, wanted):
+        """
+        Read only the given rows of totals sheets, with one batchGet
+        expects:
+        - wanted: Dictionary of sheet -> keys, months for Monthly_Totals and
+          "YYYY-MM-DD" dates for Daily_Totals
+        returns:
+        - Dictionary of sheet -> key -> (sheet row or None, row values)
+        Months missing from the index rebuild it first (another instance
+        may have added them). Days are not looked up again: rows of the same
+        day add up, so a day appended twice stays correct until /refresh
+        merges it, and the first expense of a day does not re-read the whole
+        date column. The A-column of every fetched row is checked against
+        its key; if a sheet was edited by hand its index is rebuilt and the
+        read retried.
+        """
+        for attempt in range(2):
+            unindexed = [
+                sheet
+                for sheet, keys in wanted.items()
+                if sheet not in self._total_rows
+                or (
+                    sheet != "Daily_Totals"
+                    and any(key not in self._total_rows[sheet] for key in keys)
+                )
+            ]
+            if unindexed:
+                self._load_row_index(unindexed)
+
+            found = {
+                sheet: {key: self._total_rows[sheet].get(key) for key in keys}
+                for sheet, keys in wanted.items()
+            }
+            fetched = {
+                sheet: {key: (None, []) for key, n in rows.items() if not n}
+                for sheet, rows in found.items()
+            }
+            indexed = [
+                (sheet, key, n)
+                for sheet, rows in found.items()
+                for key, n in rows.items()
+                if n
+            ]
+            if not indexed:
+                return fetched
+
+            result = (
+                self.sheet.values()
+                .batchGet(
+                    spreadsheetId=self.spreadsheet_id,
+                    ranges=[f"{sheet}!A{n}:I{n}" for sheet, _, n in indexed],
+                )
+                .execute()
             )
-            month_str = datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y-%m")
-
-            row_data = [
-                date_str,
-                expense_data.get("amount", 0),
-                expense_data.get("category", "other"),
-                expense_data.get("description", ""),
-                expense_data.get("merchant", ""),
-                month_str,
+
+            value_ranges = result.get("valueRanges", [])
+            for (sheet, key, row_number), value_range in zip(indexed, value_ranges):
+                values = value_range.get("values", [])
+                if values and values[0] and values[0][0] == key:
+                    fetched[sheet][key] = (row_number, values[0])
+
+            edited = [
+                sheet for sheet in wanted if len(fetched[sheet]) < len(found[sheet])
             ]
+            if not edited:
+                return fetched
+
+            logger.info(f"{', '.join(edited)} edited, rebuilding row index")
+            for sheet in edited:
+                self._total_rows.pop(sheet, None)
+                self.sheet.forget(self.spreadsheet_id, sheet)
 
-            # Append to expenses sheet
-            self.sheet.values().append(
+        raise RuntimeError("Totals row index is inconsistent")
+
+    def _add_to_totals(self, sheet_ids, added):
+        """
+        batchUpdate requests adding amounts to totals rows
+        expects:
+        - sheet_ids: Sheet title -> ID, as returned by _get_sheet_ids
+        - added: Dictionary of sheet -> key -> [total, one amount per
+          CATEGORIES] to add
+        returns:
+        - (requests, fetched rows as returned by _read_total_rows)
+        Reads only the affected rows, then updates each in place or appends
+        the new keys in sorted order.
+        """
+        fetched = self._read_total_rows(
+            {sheet: sorted(amounts) for sheet, amounts in added.items()}
+        )
+
+        requests = []
+        for sheet, amounts in added.items():
+            new_rows = []
+            for key in sorted(amounts):
+                # Total and one column per category, starting from the sheet values
+                row_number, current = fetched[sheet][key]
+                totals = list(amounts[key])
+                for col in range(1, len(CATEGORIES) + 2):
+                    if len(current) > col and current[col]:
+                        totals[col - 1] += float(current[col])
+
+                row_data = _row_data([key] + totals)
+                if row_number:
+                    requests.append(
+                        {
+                            "updateCells": {
+                                "start": {
+                                    "sheetId": sheet_ids[sheet],
+                                    "rowIndex": row_number - 1,
+                                    "columnIndex": 0,
+                                },
+                                "rows": [row_data],
+                                "fields": "userEnteredValue",
+                            }
+                        }
+                    )
+                else:
+                    new_rows.append(row_data)
+
+            if new_rows:
+                requests.append(
+                    {
+                        "appendCells": {
+                            "sheetId": sheet_ids[sheet],
+                            "rows": new_rows,
+                            "fields": "userEnteredValue",
+                        }
+                    }
+                )
+        return requests, fetched
+
+    def _added_to_totals(self, added, fetched):
+        """Index the totals rows _add_to_totals appended and update the rollup"""
+        for sheet, amounts in added.items():
+            self._index_appended_rows(
+                sheet, [key for key in sorted(amounts) if not fetched[sheet][key][0]]
+            )
+        if self._rollup is not None and "Daily_Totals" in added:
+            self._rollup.add_rows(
+                [day] + amounts for day, amounts in added["Daily_Totals"].items()
+            )
+
+    def _flush_expense_rows(self, rows):
+        """
+        Write queued expense rows and their monthly and daily totals in one
+        batchUpdate
+        expects:
+        - rows: Expense rows as built by log_expense
+        returns:
+        - One success flag per row
+        Adds each expense to its month's and day's totals rows (see
+        _add_to_totals), then appends the expenses and writes the totals
+        rows together.
+        Spreadsheets without a Daily_Totals sheet (set up before it existed)
+        only get monthly totals.
+        """
+        try:
+            from expense_columns import ExpenseColumns
+
+            by_sheet = self._rows_by_sheet(rows)
+            self._ensure_expense_sheets(by_sheet)
+            sheet_ids = self._get_sheet_ids()
+            columns = ExpenseColumns(rows)
+            added = {"Monthly_Totals": columns.totals_by("month")}
+            if "Daily_Totals" in sheet_ids:
+                added["Daily_Totals"] = columns.totals_by("day")
+            totals_requests, fetched = self._add_to_totals(sheet_ids, added)
+
+            requests = [
+                {
+                    "appendCells": {
+                        "sheetId": sheet_ids[expense_sheet],
+                        "rows": [_row_data(row) for row in sheet_rows],
+                        "fields": "userEnteredValue",
+                    }
+                }
+                for expense_sheet, sheet_rows in by_sheet.items()
+            ]
+            self.sheet.batchUpdate(
                 spreadsheetId=self.spreadsheet_id,
-                range="Expenses!A:F",
-                valueInputOption="USER_ENTERED",
-                body={"values": [row_data]},
+                body={"requests": requests + totals_requests},
             ).execute()
 
-            # Update monthly totals
-            self._update_monthly_totals(month_str)
+            self._added_to_totals(added, fetched)
+            self._remember_history(rows)
 
-            return True
+            # appendCells does not report row numbers; catch up on the next read
+            if self.ledger:
+                self.ledger.mark_stale()
+
+            return [True] * len(rows)
 
         except Exception as e:
-            logger.error(f"Error logging expense: {e}")
-            return False
+            logger.error(f"Error writing {len(rows)} expenses: {e}")
+            return [False] * len(rows)
 
     def _update_monthly_totals(self, month_str):
         """Update or create monthly totals for the given month"""
         try:
-            # Get current monthly totals
-            result = (
-                self.sheet.values()
-                .get(spreadsheetId=self.spreadsheet_id, range="Monthly_Totals!A:I")
-                .execute()
-            )
+            # Only the sheet holding this month's expenses is scanned
+            expense_range = f"{self._expense_sheet(month_str)}!A:F"
 
-            values = result.get("values", [])
+            # The month index and the expenses in one batchGet when both are needed
+            if "Monthly_Totals" not in self._total_rows:
+                self.sheet.prefetch(
+                    self.spreadsheet_id, ["Monthly_Totals!A:A", expense_range]
+                )
 
             # Find if month exists
-            month_row = None
-            for i, row in enumerate(values[1:], 2):
-                if row and row[0] == month_str:
-                    month_row = i
-                    break
+            month_row = self._read_month_rows([month_str])[month_str][0]
+
+            from expense_columns import ExpenseColumns
 
             # Calculate totals for this month
             expense_result = (
                 self.sheet.values()
-                .get(spreadsheetId=self.spreadsheet_id, range="Expenses!A:F")
+                .get(spreadsheetId=self.spreadsheet_id, range=expense_range)
                 .execute()
             )
-
             expense_values = expense_result.get("values", [])
-
-            # Calculate category totals
-            totals = {
-                "total": 0,
-                "food": 0,
-                "transport": 0,
-                "utilities": 0,
-                "shopping": 0,
-                "entertainment": 0,
-                "healthcare": 0,
-                "other": 0,
-            }
-
-            for row in expense_values[1:]:
-                if len(row) >= 6 and row[5] == month_str:
-                    amount = float(row[1]) if row[1] else 0
-                    category = row[2].lower() if row[2] else "other"
-
-                    totals["total"] += amount
-                    if category in totals:
-                        totals[category] += amount
-                    else:
-                        totals["other"] += amount
+            month_rows = [
+                row
+                for row in expense_values[1:]
+                if len(row) >= 6 and row[5] == month_str
+            ]
+            totals = ExpenseColumns(month_rows).totals_by().get(month_str)
 
             # Update or insert row
-            new_row = [
-                month_str,
-                totals["total"],
-                totals["food"],
-                totals["transport"],
-                totals["utilities"],
-                totals["shopping"],
-                totals["entertainment"],
-                totals["healthcare"],
-                totals["other"],
-            ]
+            new_row = [month_str] + (totals or [0] * (len(CATEGORIES) + 1))
 
             if month_row:
                 # Update existing row
@@ -222,129 +889,335 @@ class SheetsManager:
                     valueInputOption="USER_ENTERED",
                     body={"values": [new_row]},
                 ).execute()
+                self._index_appended_rows("Monthly_Totals", [month_str])
 
         except Exception as e:
             logger.error(f"Error updating monthly totals: {e}")
 
-    def recalculate_all_monthly_totals(self):
-        """Recalculate all monthly totals based on current expenses"""
+    def _update_daily_totals(self, rows):
+        """Add freshly appended expense rows to their Daily_Totals rows"""
         try:
-            # Get all expenses
-            expense_result = (
-                self.sheet.values()
-                .get(spreadsheetId=self.spreadsheet_id, range="Expenses!A:F")
-                .execute()
+            from expense_columns import ExpenseColumns
+
+            sheet_ids = self._get_sheet_ids()
+            if "Daily_Totals" not in sheet_ids:
+                return
+
+            added = {"Daily_Totals": ExpenseColumns(rows).totals_by("day")}
+            requests, fetched = self._add_to_totals(sheet_ids, added)
+            self.sheet.batchUpdate(
+                spreadsheetId=self.spreadsheet_id, body={"requests": requests}
+            ).execute()
+            self._added_to_totals(added, fetched)
+
+        except Exception as e:
+            logger.error(f"Error updating daily totals: {e}")
+
+    def _read_expense_page(self, expense_sheet, start_row):
+        end_row = start_row + RECALC_PAGE_ROWS - 1
+        result = (
+            self.sheet.values()
+            .get(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{expense_sheet}!A{start_row}:F{end_row}",
+                memoize=False,
             )
+            .execute()
+        )
+        return result.get("values", [])
 
-            expense_values = expense_result.get("values", [])
+    def _expense_pages(self, expense_sheet="Expenses"):
+        """
+        Yield an expense sheet in pages of RECALC_PAGE_ROWS rows
+        returns:
+        - Generator of (first sheet row, rows); a short page ends the sheet
+        Up to RECALC_PARALLEL_READS pages are fetched ahead, so at most that
+        many pages are held at once and the reads overlap their latency.
+        """
+        read_page = bind_scope(self._read_expense_page)
+        with ThreadPoolExecutor(RECALC_PARALLEL_READS) as pool:
+            pending = deque()
+            next_row = 2
+            while True:
+                while len(pending) < RECALC_PARALLEL_READS:
+                    pending.append(
+                        (next_row, pool.submit(read_page, expense_sheet, next_row))
+                    )
+                    next_row += RECALC_PAGE_ROWS
 
-            if len(expense_values) <= 1:
-                logger.info("No expenses found to recalculate")
-                return True
+                start_row, future = pending.popleft()
+                values = future.result()
+                if values:
+                    yield start_row, values
+                if len(values) < RECALC_PAGE_ROWS:
+                    for _, future in pending:
+                        future.cancel()
+                    return
 
-            # Calculate totals for each month
-            monthly_data = {}
-
-            for row in expense_values[1:]:
-                if len(row) >= 6 and row[5]:
-                    month = row[5]
-                    amount = float(row[1]) if row[1] else 0
-                    category = row[2].lower() if row[2] else "other"
-
-                    if month not in monthly_data:
-                        monthly_data[month] = {
-                            "total": 0,
-                            "food": 0,
-                            "transport": 0,
-                            "utilities": 0,
-                            "shopping": 0,
-                            "entertainment": 0,
-                            "healthcare": 0,
-                            "other": 0,
-                        }
+    def recalculate_all_monthly_totals(self):
+        """
+        Recalculate all monthly and daily totals based on current expenses
+        Streams each expense sheet page by page, reducing every page to its
+        per-month and per-day totals (typed ExpenseColumns) before the next
+        one, so memory is bounded by the number of months and days rather
+        than rows. Rewrites Monthly_Totals and Daily_Totals with one
+        batchUpdate of their exact ranges (blanking rows of months or days
+        that disappeared) instead of clearing them first.
+        """
+        with background_calls():
+            try:
+                from expense_columns import ExpenseColumns, merge_totals
 
-                    monthly_data[month]["total"] += amount
-                    if category in monthly_data[month]:
-                        monthly_data[month][category] += amount
-                    else:
-                        monthly_data[month]["other"] += amount
+                if self.ledger:
+                    self.ledger.reset()
+                self._history = None
 
-            if not monthly_data:
-                logger.info("No valid expense data found")
+                keys = {"Monthly_Totals": "month"}
+                if "Daily_Totals" in self._get_sheet_ids():
+                    keys["Daily_Totals"] = "day"
+                totals = {sheet: {} for sheet in keys}
+                for expense_sheet in self._expense_sheets():
+                    for start_row, rows in self._expense_pages(expense_sheet):
+                        page = ExpenseColumns(rows)
+                        for sheet, key in keys.items():
+                            merge_totals(totals[sheet], page.totals_by(key))
+                        if self.ledger:
+                            self._mirror_page(start_row, rows)
+                if self.ledger:
+                    self.ledger.mark_synced()
+
+                if not totals["Monthly_Totals"]:
+                    logger.info("No expenses found to recalculate")
+                    return True
+
+                new_rows = {
+                    sheet: [[key] + added[key] for key in sorted(added)]
+                    for sheet, added in totals.items()
+                }
+                self._rewrite_totals(new_rows)
+
+                if "Daily_Totals" in new_rows:
+                    from daily_rollup import DailyRollup
+
+                    self._rollup = DailyRollup(new_rows["Daily_Totals"])
+                    self._rollup_loaded_at = time.monotonic()
+
+                logger.info(
+                    f"Recalculated totals for {len(new_rows['Monthly_Totals'])} months"
+                )
                 return True
 
-            # Clear existing monthly totals (keep header)
-            self.sheet.values().clear(
-                spreadsheetId=self.spreadsheet_id, range="Monthly_Totals!A2:I"
-            ).execute()
+            except Exception as e:
+                logger.error(f"Error recalculating monthly totals: {e}")
+                return False
 
-            # Prepare new data
-            new_rows = []
-            for month in sorted(monthly_data.keys()):
-                totals = monthly_data[month]
-                new_rows.append(
-                    [
-                        month,
-                        totals["total"],
-                        totals["food"],
-                        totals["transport"],
-                        totals["utilities"],
-                        totals["shopping"],
-                        totals["entertainment"],
-                        totals["healthcare"],
-                        totals["other"],
-                    ]
+    def _rewrite_totals(self, new_rows):
+        """
+        Overwrite totals sheets with one values batchUpdate
+        expects:
+        - new_rows: Dictionary of sheet -> rows sorted by key
+        Rows below the new ones that still hold old keys are blanked rather
+        than cleared first, so readers never see an empty sheet.
+        """
+        self._load_row_index(list(new_rows))
+        data = []
+        for sheet, rows in new_rows.items():
+            stale_rows = max(0, self._total_rows_end[sheet] - 1 - len(rows))
+            values = rows + [[""] * (len(CATEGORIES) + 2)] * stale_rows
+            if values:
+                data.append(
+                    {"range": f"{sheet}!A2:I{len(values) + 1}", "values": values}
                 )
 
-            # Insert all new data
-            if new_rows:
-                self.sheet.values().append(
-                    spreadsheetId=self.spreadsheet_id,
-                    range="Monthly_Totals!A:I",
-                    valueInputOption="USER_ENTERED",
-                    body={"values": new_rows},
-                ).execute()
+        self.sheet.values().batchUpdate(
+            spreadsheetId=self.spreadsheet_id,
+            body={"valueInputOption": "USER_ENTERED", "data": data},
+        ).execute()
 
-            logger.info(f"Recalculated totals for {len(new_rows)} months")
-            return True
+        for sheet, rows in new_rows.items():
+            self._total_rows[sheet] = {row[0]: i for i, row in enumerate(rows, 2)}
+            self._total_rows_end[sheet] = len(rows) + 1
 
+    def _mirror_page(self, start_row, rows):
+        """Add one page of a full Expenses read to the freshly reset ledger"""
+        try:
+            self.ledger.add_rows(start_row, rows)
         except Exception as e:
-            logger.error(f"Error recalculating monthly totals: {e}")
-            return False
+            logger.error(f"Error rebuilding ledger mirror: {e}")
+            self.ledger.mark_stale()
+
+    def migrate_to_year_sheets(self):
+        """
+        Copy the single Expenses sheet into Expenses_YYYY sheets
+        returns:
+        - Dictionary of year sheet -> rows copied, or None on failure
+        Streams Expenses page by page and appends each page's rows to their
+        year sheets with one batchUpdate. Rows already in a year sheet, from a
+        previous run or logged there after EXPENSES_BY_YEAR was switched on,
+        are matched one for one and not copied again, so running it twice
+        copies nothing twice and live rows do not hide a year's history.
+        Expenses itself is kept as a backup; with EXPENSES_BY_YEAR it is no
+        longer read or written.
+        """
+        with background_calls():
+            try:
+                sheet_ids = self._get_sheet_ids()
+                if "Expenses" not in sheet_ids:
+                    return {}
+
+                # Rows each year sheet already holds, counted so that repeated
+                # identical expenses are each matched once
+                present = {}
+                for title in sheet_ids:
+                    if not _YEAR_SHEET.match(title):
+                        continue
+                    counts = present[title] = Counter()
+                    for _, rows in self._expense_pages(title):
+                        counts.update(_row_key(row) for row in rows if len(row) >= 6)
+
+                copied, skipped, already = {}, 0, 0
+                for _, rows in self._expense_pages("Expenses"):
+                    by_sheet = {}
+                    for row in rows:
+                        if len(row) < 6 or not row[5][:4].isdigit():
+                            skipped += 1
+                            continue
+                        title = f"Expenses_{row[5][:4]}"
+                        counts = present.get(title)
+                        key = _row_key(row)
+                        if counts and counts[key]:
+                            counts[key] -= 1
+                            already += 1
+                            continue
+                        by_sheet.setdefault(title, []).append(_typed_row(row))
+                    if not by_sheet:
+                        continue
+
+                    self._ensure_expense_sheets(by_sheet)
+                    sheet_ids = self._get_sheet_ids()
+                    requests = []
+                    for title, sheet_rows in sorted(by_sheet.items()):
+                        requests.append(
+                            {
+                                "appendCells": {
+                                    "sheetId": sheet_ids[title],
+                                    "rows": [_row_data(row) for row in sheet_rows],
+                                    "fields": "userEnteredValue",
+                                }
+                            }
+                        )
+                        copied[title] = copied.get(title, 0) + len(sheet_rows)
+                    self.sheet.batchUpdate(
+                        spreadsheetId=self.spreadsheet_id, body={"requests": requests}
+                    ).execute()
+
+                if already:
+                    logger.info(f"Skipped {already} rows already in year sheets")
+                if skipped:
+                    logger.warning(f"Skipped {skipped} Expenses rows without a month")
+                logger.info(f"Copied expenses into year sheets: {copied}")
+                return copied
+
+            except Exception as e:
+                logger.error(f"Error migrating expenses to year sheets: {e}")
+                return None
 
     def get_monthly_total(self, month_str=None):
         """Get total for current or specified month"""
         if not month_str:
             # Use Malaysia timezone for current month
             month_str = get_malaysia_time().strftime("%Y-%m")
+        return self.get_monthly_totals([month_str])[0]
 
-        try:
-            result = (
-                self.sheet.values()
-                .get(spreadsheetId=self.spreadsheet_id, range="Monthly_Totals!A:I")
-                .execute()
-            )
+    def get_monthly_totals(self, months):
+        """
+        Totals of several months with one Sheets read
+        expects:
+        - months: Month strings in "YYYY-MM" format
+        returns:
+        - List of summaries in the shape of get_monthly_total, in the given order
+        """
+        if self.ledger:
+            try:
+                if self.ledger.is_stale(LEDGER_SYNC_SECONDS):
+                    self.sync_ledger()
+                return [self.ledger.monthly_total(month_str) for month_str in months]
+            except Exception as e:
+                logger.error(f"Ledger mirror read failed, reading Sheets: {e}")
 
-            values = result.get("values", [])
+        from expense_columns import summary_from_totals
 
-            for row in values[1:]:
-                if row and row[0] == month_str:
-                    return {
-                        "month": row[0],
-                        "total": float(row[1]) if len(row) > 1 and row[1] else 0,
-                        "food": float(row[2]) if len(row) > 2 and row[2] else 0,
-                        "transport": float(row[3]) if len(row) > 3 and row[3] else 0,
-                        "utilities": float(row[4]) if len(row) > 4 and row[4] else 0,
-                        "shopping": float(row[5]) if len(row) > 5 and row[5] else 0,
-                        "entertainment": (
-                            float(row[6]) if len(row) > 6 and row[6] else 0
-                        ),
-                        "healthcare": float(row[7]) if len(row) > 7 and row[7] else 0,
-                        "other": float(row[8]) if len(row) > 8 and row[8] else 0,
-                    }
+        # Same shape as the ledger's, so callers can read every category
+        try:
+            fetched = self._read_month_rows(months)
+            totals = []
+            for month_str in months:
+                month_row, row = fetched[month_str]
+                if not month_row:
+                    totals.append(summary_from_totals(month_str, None))
+                    continue
 
-            return {"month": month_str, "total": 0}
+                totals.append(
+                    summary_from_totals(
+                        row[0],
+                        [
+                            float(row[col]) if len(row) > col and row[col] else 0
+                            for col in range(1, len(CATEGORIES) + 2)
+                        ],
+                    )
+                )
+            return totals
 
         except Exception as e:
             logger.error(f"Error getting monthly total: {e}")
-            return {"month": month_str, "total": 0}
+            return [summary_from_totals(month_str, None) for month_str in months]
+
+    def get_daily_rollup(self):
+        """
+        Prefix-summed Daily_Totals for date-range reports
+        returns:
+        - DailyRollup read with one Sheets call and kept up to date as
+          expenses are logged, re-read after ROLLUP_SYNC_SECONDS; None if
+          Daily_Totals cannot be read
+        """
+        stale = time.monotonic() - self._rollup_loaded_at > ROLLUP_SYNC_SECONDS
+        if self._rollup is None or stale:
+            from daily_rollup import DailyRollup
+
+            try:
+                result = (
+                    self.sheet.values()
+                    .get(spreadsheetId=self.spreadsheet_id, range="Daily_Totals!A:I")
+                    .execute()
+                )
+            except Exception as e:
+                logger.error(f"Error reading daily totals: {e}")
+                return None
+
+            values = result.get("values", [])
+            self._index_rows("Daily_Totals", values)
+            self._rollup = DailyRollup(values[1:])
+            self._rollup_loaded_at = time.monotonic()
+        return self._rollup
+
+    def get_range_totals(self, ranges):
+        """
+        Totals of date ranges from the daily rollup
+        expects:
+        - ranges: List of (start, end) dates or "YYYY-MM-DD" strings, both
+          days included
+        returns:
+        - List of summaries with "start", "end", "total" and one key per
+          category, in the given order, or None if Daily_Totals is unavailable
+        """
+        rollup = self.get_daily_rollup()
+        if rollup is None:
+            return None
+
+        summaries = []
+        for start, end in ranges:
+            totals = rollup.totals(start, end)
+            summary = {"start": str(start), "end": str(end), "total": totals[0]}
+            summary.update(zip(CATEGORIES, totals[1:]))
+            summaries.append(summary)
+        return summaries
@@ -0,0 +1,241 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Sheets methods that count against the read quota; everything else is a write
+READ_METHODS = ("get", "values.get", "values.batchGet")
+
+# Writes that add rows (values.append, appendCells in a batchUpdate) are only
+# retried on 429, which Google returns before doing anything; after a 5xx
+# the rows may already be there
+IDEMPOTENT_WRITES = ("values.update", "values.batchUpdate", "values.clear")
+
+
+def http_status(error):
+    """HTTP status of a googleapiclient HttpError (or alike), else None"""
+    resp = getattr(error, "resp", None)
+    status = getattr(resp, "status", None)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(error):
+    """Seconds from an error's Retry-After header, else None"""
+    resp = getattr(error, "resp", None)
+    try:
+        return float(resp.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Per-period request quota as a bucket of `limit` tokens
+
+    Each call takes a token, and a token comes back one period after it was
+    taken. The bucket allows bursts of the whole quota, but never more than
+    `limit` calls in any window of `period` seconds, wherever Google's own
+    minute starts. Not thread-safe; QuotaScheduler locks around it.
+    """
+
+    def __init__(self, limit, period=60.0):
+        self.limit = limit
+        self.period = period
+        self.waiting = 0
+        self._taken = deque()
+
+    def available(self, now):
+        while self._taken and self._taken[0] <= now - self.period:
+            self._taken.popleft()
+        return self.limit - len(self._taken)
+
+    def take(self, now):
+        self._taken.append(now)
+
+    def wait_time(self, now, needed):
+        """Seconds until `needed` tokens are available"""
+        short = needed - self.available(now)
+        if short <= 0:
+            return 0.0
+        if short > len(self._taken):
+            return self.period
+        return self._taken[short - 1] + self.period - now
+
+
+class _Flight:
+    """A read in progress that identical reads wait for instead of repeating"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QuotaScheduler:
+    """
+    Paces Sheets API calls to the per-minute read and write quotas
+
+    Reads and writes take tokens from separate TokenBuckets. Background
+    calls (/refresh, /migrate) leave `reserve` tokens of each bucket to
+    interactive ones and go after any interactive call that is waiting, so
+    logging an expense is not stuck behind a recalculation. A read whose
+    key matches a read already in flight waits for its result instead of
+    calling again; any write starts a new generation of keys, so a read
+    issued after a write never gets a result fetched before it. Calls
+    rejected with 429 (or 5xx, unless they add rows) are retried with
+    jittered exponential backoff, each attempt taking a new token.
+    """
+
+    def __init__(
+        self,
+        reads_per_minute=60,
+        writes_per_minute=60,
+        max_retries=5,
+        base_delay=1.0,
+        max_delay=32.0,
+        period=60.0,
+        reserve=0.2,
+        margin=0.02,
+    ):
+        """
+        expects:
+        - reads_per_minute, writes_per_minute: Quotas per period (0 = unpaced)
+        - max_retries: Retries after 429 or 5xx before the error is raised
+        - base_delay, max_delay: Backoff before the first retry, and its cap
+        - period: Quota period in seconds (benchmarks shorten it)
+        - reserve: Share of each quota background calls leave unused
+        - margin: Share of the period a token is held longer, for the network
+          delay between taking it and Google counting the call
+        """
+        period *= 1 + margin
+        self.buckets = {
+            "read": TokenBucket(reads_per_minute, period) if reads_per_minute else None,
+            "write": (
+                TokenBucket(writes_per_minute, period) if writes_per_minute else None
+            ),
+        }
+        self.reserve = {
+            kind: int(bucket.limit * reserve) if bucket else 0
+            for kind, bucket in self.buckets.items()
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.collapsed = 0
+        self.waited = 0.0
+        self._generation = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def execute(self, method, request, key=None, background=False, **options):
+        """
+        Run request.execute(**options) within the quota
+        expects:
+        - method: Sheets method name, e.g. "values.get"
+        - key: Identity of a read (e.g. its ranges) for collapsing, or None
+        - background: Yield to interactive calls
+        """
+        if method not in READ_METHODS:
+            with self._lock:
+                self._generation += 1
+            try:
+                return self._attempts("write", method, request, background, options)
+            finally:
+                with self._lock:
+                    self._generation += 1
+
+        if key is None or options:
+            return self._attempts("read", method, request, background, options)
+
+        with self._lock:
+            key = (self._generation, method, key)
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.collapsed += 1
+        if not leader:
+            metrics.add("sheets_reads_collapsed_total")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._attempts("read", method, request, background, {})
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def _acquire(self, kind, background):
+        """Take a token of the kind's bucket, waiting as long as needed"""
+        bucket = self.buckets[kind]
+        if bucket is None:
+            return
+        needed = 1 + (self.reserve[kind] if background else 0)
+        start = time.monotonic()
+        with self._changed:
+            queued = False
+            while True:
+                now = time.monotonic()
+                free = bucket.available(now) >= needed
+                if free and not (background and bucket.waiting):
+                    bucket.take(now)
+                    break
+                if not (queued or background):
+                    bucket.waiting += 1
+                    queued = True
+                wait = bucket.wait_time(now, needed) if not free else 0.05
+                self._changed.wait(max(wait, 0.001))
+            if queued:
+                bucket.waiting -= 1
+                self._changed.notify_all()
+
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            self.waited += waited
+            if metrics.METRICS_ENABLED:
+                metrics.observe(f"sheets.quota_wait.{kind}", waited)
+
+    def _attempts(self, kind, method, request, background, options):
+        retry_5xx = kind == "read" or method in IDEMPOTENT_WRITES
+        for attempt in range(self.max_retries + 1):
+            self._acquire(kind, background)
+            try:
+                return request.execute(**options)
+            except Exception as e:
+                status = http_status(e)
+                retryable = status == 429 or (
+                    retry_5xx and status is not None and status >= 500
+                )
+                if not retryable or attempt == self.max_retries:
+                    raise
+
+                # Equal jitter: half the backoff is fixed, half random
+                backoff = min(self.max_delay, self.base_delay * 2**attempt)
+                delay = backoff / 2 + random.uniform(0, backoff / 2)
+                delay = max(delay, _retry_after(e) or 0)
+                logger.warning(
+                    f"Sheets {method} returned {status}, retry {attempt + 1} "
+                    f"in {delay:.1f}s"
+                )
+                with self._lock:
+                    self.retries += 1
+                metrics.add("sheets_retries_total")
+                time.sleep(delay)
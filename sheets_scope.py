@@ -0,0 +1,351 @@
+import contextlib
+import re
+import threading
+from metrics import span
+
+_A1_PART = re.compile(r"^\$?([A-Za-z]*)\$?(\d*)$")
+
+_local = threading.local()
+_scopes = set()
+_scopes_lock = threading.Lock()
+
+
+def _col_index(letters):
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index - 1
+
+
+def parse_a1(a1):
+    """
+    Split an A1 range into its sheet and cell bounds
+    returns:
+    - (sheet, first col, first row, last col, last row), 0-based, None = open
+    """
+    sheet, bang, cells = a1.rpartition("!")
+    if not bang:
+        return a1.strip("'"), 0, 0, None, None
+    sheet = sheet.strip("'")
+
+    start, _, end = cells.partition(":")
+    start_match = _A1_PART.match(start)
+    end_match = _A1_PART.match(end or start)
+    if not (start_match and end_match):
+        return sheet, 0, 0, None, None
+    start_col, start_row = start_match.groups()
+    end_col, end_row = end_match.groups()
+    return (
+        sheet,
+        _col_index(start_col) if start_col else 0,
+        int(start_row) - 1 if start_row else 0,
+        _col_index(end_col) if end_col else None,
+        int(end_row) - 1 if end_row else None,
+    )
+
+
+def ranges_overlap(a, b):
+    """Whether two A1 ranges share any cell"""
+    sheet_a, col0_a, row0_a, col1_a, row1_a = parse_a1(a)
+    sheet_b, col0_b, row0_b, col1_b, row1_b = parse_a1(b)
+    if sheet_a != sheet_b:
+        return False
+    cols = (col1_a is None or col0_b <= col1_a) and (col1_b is None or col0_a <= col1_b)
+    rows = (row1_a is None or row0_b <= row1_a) and (row1_b is None or row0_a <= row1_b)
+    return cols and rows
+
+
+class ReadScope:
+    """
+    Sheets reads and API calls of one Telegram update
+
+    Value ranges read while the scope is active are memoized by range, so
+    reading the same range again costs no API call until a write touches
+    it. `calls` and `calls_by_method` count the requests that did reach
+    the API.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.calls_by_method = {}
+        self.hits = 0
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def count(self, method):
+        with self._lock:
+            self.calls += 1
+            self.calls_by_method[method] = self.calls_by_method.get(method, 0) + 1
+
+    def lookup(self, spreadsheet_id, a1):
+        with self._lock:
+            value_range = self._values.get((spreadsheet_id, a1))
+            if value_range is not None:
+                self.hits += 1
+            return value_range
+
+    def remember(self, spreadsheet_id, a1, value_range):
+        with self._lock:
+            self._values[(spreadsheet_id, a1)] = value_range
+
+    def invalidate(self, spreadsheet_id, a1=None):
+        """Forget memoized ranges overlapping a1 (all of the spreadsheet if None)"""
+        with self._lock:
+            for key in list(self._values):
+                if key[0] == spreadsheet_id and (
+                    a1 is None or ranges_overlap(a1, key[1])
+                ):
+                    del self._values[key]
+
+
+def current_scope():
+    """The ReadScope of the update being handled on this thread, or None"""
+    return getattr(_local, "scope", None)
+
+
+def in_background():
+    """Whether Sheets calls on this thread yield to interactive ones"""
+    return getattr(_local, "background", False)
+
+
+@contextlib.contextmanager
+def background_calls():
+    """Mark the Sheets calls of the block as background work, e.g. /refresh"""
+    previous = in_background()
+    _local.background = True
+    try:
+        yield
+    finally:
+        _local.background = previous
+
+
+def bind_scope(func):
+    """
+    Wrap func so it runs in the calling thread's scope (and background
+    mark), e.g. on a worker pool
+    """
+    scope = current_scope()
+    background = in_background()
+
+    def bound(*args, **kwargs):
+        previous = current_scope(), in_background()
+        _local.scope, _local.background = scope, background
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.scope, _local.background = previous
+
+    return bound
+
+
+@contextlib.contextmanager
+def request_scope():
+    """
+    Memoize Sheets reads and count API calls until the block exits
+
+    Scopes nest: an inner block reuses the outer scope. Writes made under
+    any scope invalidate overlapping ranges in every active scope.
+    """
+    scope = current_scope()
+    if scope is not None:
+        yield scope
+        return
+
+    scope = ReadScope()
+    _local.scope = scope
+    with _scopes_lock:
+        _scopes.add(scope)
+    try:
+        yield scope
+    finally:
+        _local.scope = None
+        with _scopes_lock:
+            _scopes.discard(scope)
+
+
+def _invalidate(spreadsheet_id, a1=None):
+    with _scopes_lock:
+        scopes = list(_scopes)
+    for scope in scopes:
+        scope.invalidate(spreadsheet_id, a1)
+
+
+class _Request:
+    """Deferred call with the .execute() interface of googleapiclient requests"""
+
+    def __init__(self, run):
+        self._run = run
+
+    def execute(self, **kwargs):
+        return self._run(**kwargs)
+
+
+class CoalescingSheets:
+    """
+    Read-through wrapper around the Sheets `spreadsheets()` resource
+
+    Inside a request_scope, values().get and values().batchGet are served
+    from the scope's memo where possible (values().get(..., memoize=False)
+    opts out, e.g. for paged reads of a large sheet), and the ranges still missing from
+    a batchGet go out in one call. Writes invalidate the ranges they touch:
+    update and clear their own range, append the whole sheet, and a
+    spreadsheet batchUpdate (which addresses sheets by id) everything.
+    Outside a scope every call passes straight through, or through the
+    QuotaScheduler if one is given.
+    """
+
+    def __init__(self, resource, scheduler=None):
+        self._resource = resource
+        self._scheduler = scheduler
+
+    def _call(self, method, request, key=None, **kwargs):
+        scope = current_scope()
+        if scope is not None:
+            scope.count(method)
+        with span(f"sheets.{method}"):
+            if self._scheduler is None:
+                return request.execute(**kwargs)
+            return self._scheduler.execute(
+                method, request, key=key, background=in_background(), **kwargs
+            )
+
+    def values(self):
+        return _CoalescingValues(self, self._resource.values())
+
+    def get(self, spreadsheetId, **kwargs):
+        request = self._resource.get(spreadsheetId=spreadsheetId, **kwargs)
+        key = None if kwargs else (spreadsheetId,)
+        return _Request(lambda **options: self._call("get", request, key, **options))
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        request = self._resource.batchUpdate(
+            spreadsheetId=spreadsheetId, body=body, **kwargs
+        )
+
+        def run(**options):
+            _invalidate(spreadsheetId)
+            try:
+                return self._call("batchUpdate", request, **options)
+            finally:
+                _invalidate(spreadsheetId)
+
+        return _Request(run)
+
+    def forget(self, spreadsheetId, range=None):
+        """Drop memoized ranges, e.g. when the sheet was changed by hand"""
+        _invalidate(spreadsheetId, range)
+
+    def prefetch(self, spreadsheetId, ranges):
+        """Read several ranges into the current scope with one batchGet"""
+        if current_scope() is not None:
+            self.values().batchGet(spreadsheetId=spreadsheetId, ranges=ranges).execute()
+
+
+class _CoalescingValues:
+    def __init__(self, sheets, resource):
+        self._sheets = sheets
+        self._resource = resource
+
+    def get(self, spreadsheetId, range, memoize=True, **kwargs):
+        def run(**options):
+            scope = current_scope()
+            if scope is None or kwargs or not memoize:
+                request = self._resource.get(
+                    spreadsheetId=spreadsheetId, range=range, **kwargs
+                )
+                key = None if kwargs else (spreadsheetId, range)
+                return self._sheets._call("values.get", request, key, **options)
+
+            value_range = scope.lookup(spreadsheetId, range)
+            if value_range is None:
+                request = self._resource.get(spreadsheetId=spreadsheetId, range=range)
+                value_range = self._sheets._call(
+                    "values.get", request, (spreadsheetId, range), **options
+                )
+                scope.remember(spreadsheetId, range, value_range)
+            return value_range
+
+        return _Request(run)
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        ranges = list(ranges)
+
+        def run(**options):
+            scope = current_scope()
+            if scope is None or kwargs:
+                request = self._resource.batchGet(
+                    spreadsheetId=spreadsheetId, ranges=ranges, **kwargs
+                )
+                key = None if kwargs else (spreadsheetId, tuple(ranges))
+                return self._sheets._call("values.batchGet", request, key, **options)
+
+            found = {a1: scope.lookup(spreadsheetId, a1) for a1 in ranges}
+            missing = [a1 for a1 in dict.fromkeys(ranges) if found[a1] is None]
+            if missing:
+                if len(missing) == 1:
+                    request = self._resource.get(
+                        spreadsheetId=spreadsheetId, range=missing[0]
+                    )
+                    key = (spreadsheetId, missing[0])
+                    fetched = [
+                        self._sheets._call("values.get", request, key, **options)
+                    ]
+                else:
+                    request = self._resource.batchGet(
+                        spreadsheetId=spreadsheetId, ranges=missing
+                    )
+                    key = (spreadsheetId, tuple(missing))
+                    result = self._sheets._call(
+                        "values.batchGet", request, key, **options
+                    )
+                    fetched = result.get("valueRanges", [])
+                for a1, value_range in zip(missing, fetched):
+                    scope.remember(spreadsheetId, a1, value_range)
+                    found[a1] = value_range
+
+            return {
+                "spreadsheetId": spreadsheetId,
+                "valueRanges": [found[a1] for a1 in ranges],
+            }
+
+        return _Request(run)
+
+    def _write(self, method, spreadsheetId, touched, request):
+        def run(**options):
+            # Before and after: a read racing the write must not stay memoized
+            for a1 in touched:
+                _invalidate(spreadsheetId, a1)
+            try:
+                return self._sheets._call(method, request, **options)
+            finally:
+                for a1 in touched:
+                    _invalidate(spreadsheetId, a1)
+
+        return _Request(run)
+
+    def update(self, spreadsheetId, range, **kwargs):
+        request = self._resource.update(
+            spreadsheetId=spreadsheetId, range=range, **kwargs
+        )
+        return self._write("values.update", spreadsheetId, [range], request)
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        request = self._resource.batchUpdate(
+            spreadsheetId=spreadsheetId, body=body, **kwargs
+        )
+        touched = [item["range"] for item in body.get("data", [])]
+        return self._write("values.batchUpdate", spreadsheetId, touched, request)
+
+    def append(self, spreadsheetId, range, **kwargs):
+        request = self._resource.append(
+            spreadsheetId=spreadsheetId, range=range, **kwargs
+        )
+        # Appended rows land below the table, wherever that is
+        touched = [parse_a1(range)[0]]
+        return self._write("values.append", spreadsheetId, touched, request)
+
+    def clear(self, spreadsheetId, range, **kwargs):
+        request = self._resource.clear(
+            spreadsheetId=spreadsheetId, range=range, **kwargs
+        )
+        return self._write("values.clear", spreadsheetId, [range], request)
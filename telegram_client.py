@@ -0,0 +1,162 @@
+import io
+import logging
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+
+def _never_sent(error):
+    """True if a request failed before reaching Telegram, so it can be resent"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class TelegramClient:
+    """
+    Telegram Bot API client on one pooled keep-alive session
+
+    Every call has connect/read timeouts, and all attempts of one call share
+    a deadline. 429 responses are retried after the `retry_after` Telegram
+    asks for, and 5xx responses with exponential backoff. GETs are also
+    retried after connection errors and timeouts; POSTs (sendMessage,
+    sendPhoto, ...) only when the connection was never made, since after a
+    read timeout Telegram may already have sent the message.
+    """
+
+    def __init__(
+        self,
+        token,
+        base_url="https://api.telegram.org",
+        connect_timeout=3.05,
+        read_timeout=10,
+        deadline=15,
+        max_retries=3,
+        max_retry_wait=10,
+        pool_size=10,
+    ):
+        """
+        expects:
+        - token: Bot token from @BotFather
+        - base_url: Bot API server URL (override for a local stub)
+        - connect_timeout / read_timeout: Seconds per HTTP call
+        - deadline: Seconds all attempts of one call may take together
+        - max_retries: Retries after 429, 5xx or connection errors
+        - max_retry_wait: Longest sleep between retries in seconds
+        - pool_size: Keep-alive connections kept per host
+        """
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self.retries = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _request(self, http_method, url, files=None, **kwargs):
+        """Send a request, retrying on 429, 5xx and connection errors"""
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.max_retries + 1):
+            if files:
+                # Rewind uploads so a retry sends the full file again
+                for file_tuple in files.values():
+                    file_tuple[1].seek(0)
+            remaining = deadline - time.monotonic()
+            timeout = (
+                min(self.connect_timeout, remaining),
+                min(self.read_timeout, remaining),
+            )
+            try:
+                response = self.session.request(
+                    http_method, url, files=files, timeout=timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retryable = http_method == "GET" or _never_sent(e)
+                wait = min(0.5 * 2**attempt, self.max_retry_wait)
+                if (
+                    not retryable
+                    or attempt == self.max_retries
+                    or time.monotonic() + wait >= deadline
+                ):
+                    raise
+                logger.warning(f"Telegram request failed ({e}), retrying in {wait}s")
+            else:
+                if response.status_code == 429:
+                    try:
+                        retry_after = response.json()["parameters"]["retry_after"]
+                    except (ValueError, KeyError, TypeError):
+                        retry_after = 2**attempt
+                    wait = min(retry_after, self.max_retry_wait)
+                elif response.status_code >= 500:
+                    wait = min(0.5 * 2**attempt, self.max_retry_wait)
+                else:
+                    return response
+
+                if attempt == self.max_retries or time.monotonic() + wait >= deadline:
+                    return response
+                logger.warning(
+                    f"Telegram returned {response.status_code}, retrying in {wait}s"
+                )
+
+            self.retries += 1
+            time.sleep(wait)
+
+    def call(self, method, data=None, files=None, params=None):
+        """
+        Call a Bot API method
+        expects:
+        - method: Bot API method name, e.g. "sendMessage"
+        - data: Optional JSON body (or form fields when files are given)
+        - files: Optional multipart files
+        - params: Optional query parameters (sent as a GET)
+        returns:
+        - JSON response from Telegram API
+        """
+        url = f"{self.base_url}/bot{self.token}/{method}"
+        if params is not None:
+            response = self._request("GET", url, params=params)
+        elif files:
+            response = self._request("POST", url, data=data, files=files)
+        else:
+            response = self._request("POST", url, json=data)
+        return response.json()
+
+    def send_message(self, chat_id, text):
+        data = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+        return self.call("sendMessage", data)
+
+    def send_photo(self, chat_id, photo_data, caption=None):
+        files = {"photo": ("chart.png", io.BytesIO(photo_data), "image/png")}
+        data = {"chat_id": chat_id}
+        if caption:
+            data["caption"] = caption
+            data["parse_mode"] = "HTML"
+        return self.call("sendPhoto", data, files=files)
+
+    def send_chat_action(self, chat_id, action="typing"):
+        return self.call("sendChatAction", {"chat_id": chat_id, "action": action})
+
+    def download_file(self, file_id):
+        """Resolve a file_id with getFile and download its content"""
+        file_info = self.call("getFile", params={"file_id": file_id})
+        if not file_info.get("ok"):
+            return None
+
+        file_path = file_info["result"]["file_path"]
+        file_url = f"{self.base_url}/file/bot{self.token}/{file_path}"
+        response = self._request("GET", file_url)
+        return response.content if response.ok else None
+
+    def set_webhook(self, webhook_url):
+        return self.call("setWebhook", {"url": webhook_url})
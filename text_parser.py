@@ -0,0 +1,539 @@
+import re
+from datetime import date, timedelta
+from sheets_integration import CATEGORIES
+
+# Keywords per category besides the category name itself; multi-word entries
+# match as phrases
+CATEGORY_KEYWORDS = {
+    "food": [
+        "lunch",
+        "dinner",
+        "breakfast",
+        "brunch",
+        "supper",
+        "meal",
+        "snack",
+        "coffee",
+        "kopi",
+        "tea",
+        "teh",
+        "boba",
+        "bubble tea",
+        "drinks",
+        "nasi lemak",
+        "nasi",
+        "roti canai",
+        "roti",
+        "mee",
+        "mamak",
+        "makan",
+        "restaurant",
+        "cafe",
+        "bakery",
+        "groceries",
+        "grocery",
+        "pizza",
+        "burger",
+        "sushi",
+        "ramen",
+        "grab food",
+        "grabfood",
+        "foodpanda",
+        "mcd",
+        "mcdonalds",
+        "kfc",
+        "starbucks",
+        "tealive",
+        "zus",
+        "subway",
+        "domino's",
+        "dominos",
+        "pizza hut",
+        "marrybrown",
+    ],
+    "transport": [
+        "grab",
+        "taxi",
+        "uber",
+        "ride",
+        "petrol",
+        "fuel",
+        "gas",
+        "diesel",
+        "parking",
+        "toll",
+        "tng",
+        "touch n go",
+        "lrt",
+        "mrt",
+        "bus",
+        "train",
+        "ktm",
+        "ets",
+        "flight",
+        "airasia",
+        "shell",
+        "petronas",
+        "caltex",
+        "car wash",
+        "service car",
+    ],
+    "utilities": [
+        "utility",
+        "gas bill",
+        "electricity",
+        "electric",
+        "tnb",
+        "water",
+        "indah water",
+        "sewerage",
+        "internet",
+        "wifi",
+        "unifi",
+        "maxis",
+        "celcom",
+        "digi",
+        "umobile",
+        "phone bill",
+        "mobile bill",
+        "postpaid",
+        "prepaid",
+        "reload",
+        "topup",
+        "top up",
+        "astro",
+    ],
+    "shopping": [
+        "shopee",
+        "lazada",
+        "amazon",
+        "clothes",
+        "shirt",
+        "shoes",
+        "pants",
+        "dress",
+        "uniqlo",
+        "h&m",
+        "zara",
+        "ikea",
+        "mr diy",
+        "mrdiy",
+        "watch",
+        "bag",
+        "gift",
+        "furniture",
+        "electronics",
+        "gadget",
+    ],
+    "entertainment": [
+        "movie",
+        "movies",
+        "cinema",
+        "gsc",
+        "tgv",
+        "netflix",
+        "spotify",
+        "youtube premium",
+        "disney",
+        "game",
+        "games",
+        "steam",
+        "playstation",
+        "concert",
+        "karaoke",
+        "bowling",
+        "tickets",
+        "ticket",
+    ],
+    "healthcare": [
+        "health",
+        "doctor",
+        "clinic",
+        "hospital",
+        "pharmacy",
+        "medicine",
+        "medication",
+        "panadol",
+        "dental",
+        "dentist",
+        "checkup",
+        "vitamins",
+        "guardian",
+        "watsons",
+        "caring",
+        "physio",
+    ],
+}
+
+# Keywords that also name the merchant
+MERCHANTS = {
+    "grab": "Grab",
+    "grab food": "GrabFood",
+    "grabfood": "GrabFood",
+    "foodpanda": "foodpanda",
+    "mcd": "McDonald's",
+    "mcdonalds": "McDonald's",
+    "kfc": "KFC",
+    "starbucks": "Starbucks",
+    "tealive": "Tealive",
+    "zus": "ZUS Coffee",
+    "subway": "Subway",
+    "domino's": "Domino's",
+    "dominos": "Domino's",
+    "pizza hut": "Pizza Hut",
+    "marrybrown": "Marrybrown",
+    "airasia": "AirAsia",
+    "shell": "Shell",
+    "petronas": "Petronas",
+    "caltex": "Caltex",
+    "tnb": "TNB",
+    "indah water": "Indah Water",
+    "unifi": "Unifi",
+    "maxis": "Maxis",
+    "celcom": "Celcom",
+    "digi": "Digi",
+    "umobile": "U Mobile",
+    "astro": "Astro",
+    "shopee": "Shopee",
+    "lazada": "Lazada",
+    "amazon": "Amazon",
+    "uniqlo": "Uniqlo",
+    "h&m": "H&M",
+    "zara": "Zara",
+    "ikea": "IKEA",
+    "mr diy": "MR DIY",
+    "mrdiy": "MR DIY",
+    "gsc": "GSC",
+    "tgv": "TGV",
+    "netflix": "Netflix",
+    "spotify": "Spotify",
+    "steam": "Steam",
+    "guardian": "Guardian",
+    "watsons": "Watsons",
+    "caring": "Caring Pharmacy",
+}
+
+CURRENCIES = {
+    "rm": "MYR",
+    "myr": "MYR",
+    "ringgit": "MYR",
+    "usd": "USD",
+    "us$": "USD",
+    "sgd": "SGD",
+    "s$": "SGD",
+    "$": "$",
+    "dollar": "$",
+    "dollars": "$",
+    "bucks": "$",
+    "€": "EUR",
+    "eur": "EUR",
+    "£": "GBP",
+    "gbp": "GBP",
+    "¥": "JPY",
+    "jpy": "JPY",
+}
+
+# Words that make a message more than "what, how much, when"
+AMBIGUOUS_WORDS = {
+    "refund",
+    "refunded",
+    "split",
+    "owe",
+    "owes",
+    "lent",
+    "borrow",
+    "borrowed",
+    "each",
+    "per",
+    "income",
+    "salary",
+    "received",
+    "paid back",
+    "cashback",
+}
+
+# Words besides keywords and fillers (people, places, unknown merchants) the
+# model is better at placing
+MAX_UNKNOWN_WORDS = 2
+
+WEEKDAYS = [
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+]
+
+RELATIVE_DAYS = {
+    "day before yesterday": 2,
+    "kelmarin": 2,
+    "yesterday": 1,
+    "semalam": 1,
+    "last night": 1,
+    "today": 0,
+    "hari ini": 0,
+    "tonight": 0,
+    "this morning": 0,
+}
+
+# Date words the parser does not resolve (future or vague days); a message
+# holding one goes to the model
+UNRESOLVED_DATE_WORDS = {
+    "next",
+    "this",
+    "coming",
+    "last",
+    "week",
+    "weekend",
+    "tomorrow",
+    "tmrw",
+    "tmr",
+    "esok",
+    "lusa",
+}
+
+_CURRENCY_TOKEN = r"rm|myr|usd|us\$|sgd|s\$|eur|gbp|jpy|\$|€|£|¥"
+
+_AMOUNT = re.compile(
+    rf"(?<![\w.$])(?P<pre>{_CURRENCY_TOKEN})?\s?"
+    r"(?P<num>\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)"
+    r"(?P<k>k\b)?"
+    rf"(?:\s?(?P<post>{_CURRENCY_TOKEN}|ringgit|dollars?|bucks)\b)?"
+    r"(?![\w.])",
+    re.IGNORECASE,
+)
+
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+_DAY_MONTH = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?\b")
+_TIME = re.compile(r"\b\d{1,2}(?::\d{2}|[.:]\d{2}\s?[ap]m|\s?[ap]m)\b", re.I)
+_DAYS_AGO = re.compile(r"\b(\d+)\s+days?\s+ago\b", re.I)
+_WEEKDAY = re.compile(rf"\b(?:(last|on)\s+)?({'|'.join(WEEKDAYS)})\b", re.I)
+_RELATIVE = re.compile(
+    r"\b(" + "|".join(sorted(RELATIVE_DAYS, key=len, reverse=True)) + r")\b",
+    re.I,
+)
+_QUANTITY = re.compile(r"\b(?:\d+\s?x|x\s?\d+)\b", re.I)
+_FILLER = {
+    "for",
+    "on",
+    "at",
+    "@",
+    "-",
+    "the",
+    "a",
+    "an",
+    "in",
+    "and",
+    "paid",
+    "spent",
+    "bought",
+    "buy",
+    "pay",
+}
+
+
+def _keyword_pattern(keywords):
+    ordered = sorted(keywords, key=len, reverse=True)
+    return re.compile(
+        r"(?<![\w&'])(" + "|".join(re.escape(k) for k in ordered) + r")s?(?![\w&'])",
+        re.IGNORECASE,
+    )
+
+
+_KEYWORD_CATEGORY = {category: category for category in CATEGORIES}
+_KEYWORD_CATEGORY.update(
+    (keyword, category)
+    for category, keywords in CATEGORY_KEYWORDS.items()
+    for keyword in keywords
+)
+_KEYWORDS = _keyword_pattern(_KEYWORD_CATEGORY)
+_AMBIGUOUS = _keyword_pattern(AMBIGUOUS_WORDS)
+_UNRESOLVED_DATE = _keyword_pattern(UNRESOLVED_DATE_WORDS)
+
+
+def _blank(text, match):
+    """Replace a match with spaces so later patterns keep their offsets"""
+    start, end = match.span()
+    return text[:start] + " " * (end - start) + text[end:]
+
+
+def _find_dates(text, today):
+    """Return (dates found, text with the date phrases blanked out)"""
+    found = []
+
+    for match in list(_ISO_DATE.finditer(text)):
+        year, month, day = (int(g) for g in match.groups())
+        found.append((year, month, day))
+        text = _blank(text, match)
+
+    for match in list(_DAY_MONTH.finditer(text)):
+        day, month, year = match.groups()
+        if year is None:
+            year = today.year
+        elif len(year) == 2:
+            year = 2000 + int(year)
+        found.append((int(year), int(month), int(day)))
+        text = _blank(text, match)
+
+    for match in list(_DAYS_AGO.finditer(text)):
+        found.append(today - timedelta(days=int(match.group(1))))
+        text = _blank(text, match)
+
+    for match in list(_RELATIVE.finditer(text)):
+        found.append(today - timedelta(days=RELATIVE_DAYS[match.group(1).lower()]))
+        text = _blank(text, match)
+
+    for match in list(_WEEKDAY.finditer(text)):
+        back = (today.weekday() - WEEKDAYS.index(match.group(2).lower())) % 7
+        if match.group(1) and match.group(1).lower() == "last" and back == 0:
+            back = 7
+        found.append(today - timedelta(days=back))
+        text = _blank(text, match)
+
+    dates = []
+    for value in found:
+        if isinstance(value, tuple):
+            try:
+                value = date(*value)
+            except ValueError:
+                value = None
+        dates.append(value)
+    return dates, text
+
+
+def _words(text):
+    """Words of the text left after removing fillers and punctuation"""
+    return [
+        word
+        for word in (w.strip(",.;:!") for w in text.split())
+        if word and word.lower() not in _FILLER
+    ]
+
+
+def split_expense_lines(text, today):
+    """
+    Split a message holding one expense per line
+    expects:
+    - text: The message text
+    - today: As for parse_expense_text
+    returns:
+    - The non-empty lines if there are several and each carries its own
+      amount and description, otherwise a list holding just the text.
+      Lines are not required to parse confidently: the ones that do are
+      logged locally and the rest go to the model together, which can
+      still reject a line that is not an expense ("Meeting at 10").
+    """
+    lines = [line.strip() for line in (text or "").splitlines() if line.strip()]
+    if len(lines) < 2:
+        return [text]
+    for line in lines:
+        expense_data, _ = parse_expense_text(line, today)
+        if not expense_data:
+            return [text]
+    return lines
+
+
+def parse_expense_text(text, today, history=None):
+    """
+    Parse a simple text expense ("Grab 12.50", "Lunch RM15 yesterday") locally
+    expects:
+    - text: The message text
+    - today: Current date, for relative dates and the default date
+    - history: Optional HistoryIndex; a known merchant overrides the keyword
+      table, known description words stand in when no keyword matches
+    returns:
+    - (expense_data, confidence); expense_data has the same keys as a Gemini
+      extraction (plus "currency" when one was given) or is None when no
+      single amount was found. Confidence is between 0 and 1.
+    """
+    if not text or len(text) > 200:
+        return None, 0.0
+
+    dates, rest = _find_dates(text, today)
+    for match in list(_TIME.finditer(rest)):
+        rest = _blank(rest, match)
+
+    amounts = list(_AMOUNT.finditer(rest))
+    if not amounts:
+        return None, 0.0
+    confidence = 1.0 if len(amounts) == 1 else 0.3
+
+    match = amounts[0]
+    start = match.end() - len(match.group().lstrip())
+    if rest[:start].endswith("-"):
+        # "Lunch -15" is a correction or refund, not a 15 expense
+        return None, 0.0
+    number = match.group("num").replace(",", "")
+    if match.group("k") and "." in number:
+        # "15.5k" could be a typo as much as 15500
+        return None, 0.0
+    amount = float(number)
+    if match.group("k"):
+        # "dinner 15k" is a thousand times more than the same text without it
+        amount *= 1000
+        confidence = min(confidence, 0.6)
+    if amount <= 0:
+        return None, 0.0
+    token = (match.group("pre") or match.group("post") or "").lower()
+    rest = _blank(rest, match)
+
+    if any(value is None for value in dates):
+        return None, 0.0
+    if len(set(dates)) > 1:
+        confidence = min(confidence, 0.3)
+    expense_date = dates[0] if dates else today
+    if expense_date > today or _UNRESOLVED_DATE.search(rest):
+        confidence = min(confidence, 0.3)
+
+    if _QUANTITY.search(rest) or _AMBIGUOUS.search(rest):
+        confidence = min(confidence, 0.4)
+
+    categories = set()
+    merchant = ""
+    unknown = rest
+    for keyword in _KEYWORDS.finditer(rest):
+        name = keyword.group(1).lower()
+        categories.add(_KEYWORD_CATEGORY[name])
+        merchant = merchant or MERCHANTS.get(name, "")
+        unknown = _blank(unknown, keyword)
+
+    known = history.lookup(rest) if history else None
+    if known and (known["merchant"] or not categories):
+        categories = {known["category"]}
+        merchant = known["merchant"] or merchant
+        unknown = " ".join(
+            word
+            for word in _words(unknown)
+            if word.lower().strip("'") not in known["words"]
+        )
+
+    if len(categories) == 1:
+        category = categories.pop()
+        confidence = min(confidence, 0.95 if merchant else 0.9)
+    else:
+        # Unknown or conflicting keywords: the model knows more merchants
+        category = "other"
+        merchant = ""
+        confidence = min(confidence, 0.5 if not categories else 0.4)
+
+    words = _words(rest)
+    if not words:
+        return None, 0.0
+    if len(_words(unknown)) > MAX_UNKNOWN_WORDS:
+        confidence = min(confidence, 0.6)
+
+    description = " ".join(words)
+    if description[:1].islower() and words[0] == words[0].lower():
+        description = description[:1].upper() + description[1:]
+    expense_data = {
+        "amount": round(amount, 2),
+        "category": category,
+        "description": description,
+        "date": expense_date.strftime("%Y-%m-%d"),
+        "merchant": merchant,
+    }
+    if token:
+        expense_data["currency"] = CURRENCIES[token]
+    return expense_data, round(confidence, 2)
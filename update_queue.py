@@ -0,0 +1,104 @@
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateQueue:
+    """
+    Bounded worker pool for Telegram updates
+
+    Updates are queued per chat. At most `per_chat` updates of the same chat
+    run at once (1 keeps a chat's messages in order), and `submit` refuses new
+    work once `max_pending` updates are queued or running.
+    """
+
+    def __init__(self, handler, workers=4, max_pending=100, per_chat=1):
+        """
+        expects:
+        - handler: Callable run on a worker thread with each queued update
+        - workers: Number of worker threads
+        - max_pending: Maximum updates queued or running before submit refuses
+        - per_chat: Maximum updates of one chat processed concurrently
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.per_chat = per_chat
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._ready = deque()
+        self._has_ready = threading.Semaphore(0)
+        self._chats = {}
+        self._running = {}
+        self._pending = 0
+        self._threads = []
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def submit(self, chat_id, update):
+        """
+        Queue an update for background processing
+        returns:
+        - True if queued, False if the queue is full
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+
+            self._pending += 1
+            self._chats.setdefault(chat_id, deque()).append(update)
+
+            # Reserve a processing slot for the chat if it has one free
+            if self._running.get(chat_id, 0) < self.per_chat:
+                self._running[chat_id] = self._running.get(chat_id, 0) + 1
+                self._ready.append(chat_id)
+                self._has_ready.release()
+
+            if len(self._threads) < self.workers:
+                self._start_worker()
+
+        return True
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued update has been processed"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _start_worker(self):
+        thread = threading.Thread(
+            target=self._work, name=f"update-worker-{len(self._threads)}", daemon=True
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _work(self):
+        while True:
+            self._has_ready.acquire()
+            with self._lock:
+                chat_id = self._ready.popleft()
+
+            # Drain the chat's updates while holding its slot
+            while True:
+                with self._lock:
+                    updates = self._chats.get(chat_id)
+                    if not updates:
+                        self._running[chat_id] -= 1
+                        if not self._running[chat_id]:
+                            del self._running[chat_id]
+                            self._chats.pop(chat_id, None)
+                        break
+                    update = updates.popleft()
+
+                try:
+                    self.handler(update)
+                except Exception as e:
+                    logger.error(f"Error processing queued update: {e}")
+                finally:
+                    with self._lock:
+                        self._pending -= 1
+                        if not self._pending:
+                            self._idle.notify_all()
@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingWrite:
+    def __init__(self, item):
+        self.item = item
+        self.result = False
+        self.lead = False
+        self.ready = threading.Event()
+
+
+class WritePipeline:
+    """
+    Group commit for writes that arrive close together
+
+    The first caller becomes the leader, optionally waits `window` seconds for
+    more writes to queue up, then hands every queued item to `flush` in one
+    call. Writes submitted while a flush is in flight are queued and flushed
+    together by the next leader.
+    """
+
+    def __init__(self, flush, window=0.0):
+        """
+        expects:
+        - flush: Callable taking a list of items and returning one result per item
+        - window: Seconds the leader waits for more writes before flushing
+        """
+        self._flush = flush
+        self.window = window
+        self.flushes = 0
+        self._lock = threading.Lock()
+        self._pending = []
+        self._flushing = False
+
+    def submit(self, item):
+        """Queue an item and block until the flush containing it has finished"""
+        return self.submit_many([item])[0]
+
+    def submit_many(self, items):
+        """
+        Queue several items for the same flush and block until it has finished
+        returns:
+        - One result per item
+        """
+        entries = [_PendingWrite(item) for item in items]
+        if not entries:
+            return []
+
+        with self._lock:
+            self._pending.extend(entries)
+            lead = not self._flushing
+            self._flushing = True
+
+        # The entries were queued together, so one flush takes all of them
+        if not lead:
+            entries[0].ready.wait()
+            if not entries[0].lead:
+                return [entry.result for entry in entries]
+
+        self._flush_pending()
+        return [entry.result for entry in entries]
+
+    def _flush_pending(self):
+        if self.window:
+            time.sleep(self.window)
+
+        with self._lock:
+            batch, self._pending = self._pending, []
+
+        try:
+            results = self._flush([entry.item for entry in batch])
+        except Exception as e:
+            logger.error(f"Error flushing {len(batch)} queued writes: {e}")
+            results = [False] * len(batch)
+        self.flushes += 1
+
+        for entry, result in zip(batch, results):
+            entry.result = result
+            entry.ready.set()
+
+        # Hand leadership to the oldest write that queued up during the flush
+        with self._lock:
+            if self._pending:
+                self._pending[0].lead = True
+                self._pending[0].ready.set()
+            else:
+                self._flushing = False